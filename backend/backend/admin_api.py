@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from typing import Optional
+import hmac
+import os
+from query_stats import query_stats, SLOW_QUERY_MS, QUERY_STATS_ENABLED
+from profiler import profiler, ProfilerBusy, format_collapsed, MAX_PROFILE_SECONDS
+from sync_scheduler import get_sync_runs
+
+# Admin endpoint'leri X-Admin-Token başlığıyla korunur; ADMIN_TOKEN tanımlı değilse kapalıdır
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """X-Admin-Token başlığını ADMIN_TOKEN ile karşılaştıran dependency"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoint'leri devre dışı (ADMIN_TOKEN tanımlı değil)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Geçersiz admin token")
+
+
+# 📊 Sorgu istatistikleri (GET işlemi - loglanmaz)
+@router.get("/query_stats", dependencies=[Depends(require_admin)])
+def get_query_stats(
+    sort: str = Query("total", description="Sıralama: total, avg, max, count, p95, errors"),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    try:
+        return {
+            "success": True,
+            "enabled": QUERY_STATS_ENABLED,
+            "slow_query_ms": SLOW_QUERY_MS,
+            "dropped": query_stats.dropped,
+            "queries": query_stats.report(sort=sort, limit=limit)
+        }
+    except ValueError as e:
+        return {"success": False, "message": f"❌ {e}"}
+
+
+@router.delete("/query_stats", dependencies=[Depends(require_admin)])
+def reset_query_stats():
+    query_stats.reset()
+    return {"success": True, "message": "✅ Sorgu istatistikleri sıfırlandı"}
+
+
+# 🔥 Örnekleme profiler'ı (collapsed stack çıktısı: flamegraph.pl, speedscope)
+@router.post("/profile", dependencies=[Depends(require_admin)])
+def run_profile(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS, description="Profil süresi (saniye)"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Örnekleme aralığı (ms)"),
+    route: Optional[str] = Query(None, description="Sadece bu route şablonunu işleyen thread'ler (ör. /list_users_by_domain/{domain_id})"),
+    include_idle: bool = Query(False, description="Boşta bekleyen thread'leri de say")
+):
+    code_filter = None
+    if route:
+        code_filter = {
+            r.endpoint.__code__ for r in request.app.routes
+            if getattr(r, "path", None) == route and hasattr(getattr(r, "endpoint", None), "__code__")
+        }
+        if not code_filter:
+            raise HTTPException(status_code=404, detail=f"Route bulunamadı: {route}")
+
+    try:
+        stacks, rounds = profiler.profile(seconds, interval_ms, code_filter, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return Response(
+        content=format_collapsed(stacks),
+        media_type="text/plain",
+        headers={"X-Profile-Rounds": str(rounds), "X-Profile-Samples": str(sum(stacks.values()))}
+    )
+
+
+# 🔄 Senkronizasyon geçmişi (GET işlemi - loglanmaz)
+@router.get("/sync_runs", dependencies=[Depends(require_admin)])
+def list_sync_runs(
+    domain_id: Optional[int] = Query(None, description="Sadece bu domain'in çalışmaları"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    return {"success": True, "runs": get_sync_runs(domain_id=domain_id, limit=limit)}
@@ -0,0 +1,150 @@
+"""
+🛡️ Giriş hızlı yolu ve deneme sınırlaması
+
+- Doğrulanmış kimlik önbelleği: başarılı bir bcrypt doğrulamasından sonra
+  HMAC-SHA256(süreç anahtarı, domain + kullanıcı adı + şifre) anahtarıyla, o anki şifre
+  hash'i AUTH_CACHE_TTL saniye saklanır. Düz metin şifre saklanmaz; süreç anahtarı her
+  başlangıçta rastgele üretilir. Kayıt sadece kullanıcının güncel hash'i aynıysa geçerlidir,
+  yani şifre değişince kendiliğinden geçersiz olur.
+- Token bucket: önbellekte olmayan her deneme bcrypt'ten önce kullanıcı ve IP bazında bir
+  jeton harcar; jeton yoksa LoginThrottled fırlatılır.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from metrics import registry
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Kullanıcı başına: en fazla AUTH_USER_BURST ardışık deneme, dakikada AUTH_USER_PER_MINUTE yenilenir
+AUTH_USER_BURST = float(os.getenv("AUTH_USER_BURST", "5"))
+AUTH_USER_PER_MINUTE = float(os.getenv("AUTH_USER_PER_MINUTE", "5"))
+# IP başına
+AUTH_IP_BURST = float(os.getenv("AUTH_IP_BURST", "20"))
+AUTH_IP_PER_MINUTE = float(os.getenv("AUTH_IP_PER_MINUTE", "60"))
+# Bellekte tutulan en fazla bucket sayısı (en eski kullanılanlar atılır)
+AUTH_RATE_MAX_KEYS = int(os.getenv("AUTH_RATE_MAX_KEYS", "100000"))
+
+AUTH_CACHE_LOOKUPS = registry.counter("odie_auth_cache_lookups_total", "Doğrulanmış kimlik önbelleği sorguları",
+                                      ("result",))
+AUTH_THROTTLED = registry.counter("odie_auth_throttled_total", "Deneme sınırına takılan girişler", ("scope",))
+
+
+class LoginThrottled(Exception):
+    """Deneme sınırı aşıldı; retry_after saniye sonra tekrar denenebilir"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f"Çok fazla giriş denemesi, {int(retry_after) + 1} sn sonra tekrar deneyin")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class VerifiedCredentialCache:
+    """HMAC anahtarı -> (şifre hash'i, son geçerlilik) LRU önbelleği"""
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, max_entries=AUTH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, domain_id, username, password):
+        message = f"{domain_id}\x00{username.lower()}\x00{password}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def get(self, key):
+        """Kayıtlı şifre hash'ini döndürür (yoksa/süresi dolduysa None)"""
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                AUTH_CACHE_LOOKUPS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        AUTH_CACHE_LOOKUPS.labels("hit").inc()
+        return entry[0]
+
+    def put(self, key, password_hash):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (password_hash, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class TokenBuckets:
+    """Anahtar başına token bucket (burst kapasite, dakikalık yenilenme)"""
+
+    def __init__(self, burst, per_minute, max_keys=AUTH_RATE_MAX_KEYS):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Bir jeton harcar
+
+        Returns:
+            float: 0 ise izin verildi, değilse bir sonraki jetona kalan saniye
+        """
+        if self.burst <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                return (1 - tokens) / self.rate if self.rate > 0 else float("inf")
+            self._buckets[key] = (tokens - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0.0
+
+
+credential_cache = VerifiedCredentialCache()
+user_buckets = TokenBuckets(AUTH_USER_BURST, AUTH_USER_PER_MINUTE)
+ip_buckets = TokenBuckets(AUTH_IP_BURST, AUTH_IP_PER_MINUTE)
+
+registry.gauge_callback("odie_auth_cache_entries", "Doğrulanmış kimlik önbelleğindeki kayıt sayısı",
+                        credential_cache.size)
+
+
+def check_rate_limit(domain_id, username, client_ip=None):
+    """bcrypt'ten önce çağrılır; sınır aşıldıysa LoginThrottled fırlatır"""
+    if client_ip:
+        wait = ip_buckets.take(client_ip)
+        if wait:
+            AUTH_THROTTLED.labels("ip").inc()
+            raise LoginThrottled("ip", wait)
+    wait = user_buckets.take((domain_id, username.lower()))
+    if wait:
+        AUTH_THROTTLED.labels("user").inc()
+        raise LoginThrottled("user", wait)
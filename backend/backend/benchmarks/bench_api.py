@@ -0,0 +1,89 @@
+"""
+⏱️ API benchmark'ları (pytest-benchmark)
+
+Yerel Postgres ve ldap3 MOCK_SYNC dizini üzerinde FastAPI uygulamasını
+TestClient ile çalıştırır. Ortam ayarları için conftest.py'ye bakın.
+
+Kullanım (backend/backend içinden):
+    python -m pytest benchmarks/ --benchmark-save=baseline           # baseline kaydet
+    python -m pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+import itertools
+
+import pytest
+
+ADD_USER_ROUNDS = 20
+_usernames = (f"bench{i:06d}" for i in itertools.count(1))
+
+
+def bench_add_user(benchmark, client, app_env):
+    def setup():
+        payload = {
+            "username": next(_usernames),
+            "first_name": "Bench",
+            "last_name": "User",
+            "password": "BenchPass123!",
+            "role_id": 2,
+            "domain_id": app_env["domain_id"],
+            "created_by": "bench-user",
+        }
+        return (payload,), {}
+
+    def add_user(payload):
+        response = client.post("/add_user", json=payload)
+        assert response.status_code == 200
+        return response.json()
+
+    result = benchmark.pedantic(add_user, setup=setup, rounds=ADD_USER_ROUNDS, iterations=1)
+    assert result["success"], result
+
+
+def bench_bulk_sync(benchmark, app_env, directory):
+    from db_ops import get_db_connection, sync_ldap_users_to_supabase
+
+    conn = get_db_connection()
+    try:
+        benchmark.pedantic(
+            sync_ldap_users_to_supabase,
+            args=(conn, directory, app_env["domain_id"], app_env["base_dn"]),
+            rounds=5,
+            iterations=1,
+        )
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("params", [
+    pytest.param({}, id="all"),
+    pytest.param({"limit": 50}, id="page50"),
+    pytest.param({"limit": 50, "sort": "last_name", "order": "desc"}, id="page50-last_name"),
+    pytest.param({"limit": 50, "search": "user0001"}, id="search"),
+    pytest.param({"format": "compact"}, id="all-compact"),
+])
+def bench_list_users_by_domain(benchmark, client, app_env, params):
+    url = f"/list_users_by_domain/{app_env['domain_id']}"
+
+    def list_users():
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        return response
+
+    response = benchmark(list_users)
+    assert response.json().get("success") is not False
+
+
+@pytest.mark.parametrize("params", [
+    pytest.param({"limit": 50}, id="limit50"),
+    pytest.param({"limit": 1000}, id="limit1000"),
+    pytest.param({"limit": 1000, "format": "fast"}, id="limit1000-fast"),
+    pytest.param({"limit": 50, "offset": 15000}, id="deep-offset"),
+])
+def bench_logs(benchmark, client, params):
+    def get_logs():
+        response = client.get("/logs", params=params)
+        assert response.status_code == 200
+        return response
+
+    response = benchmark(get_logs)
+    assert response.json()["success"]
@@ -0,0 +1,97 @@
+"""
+⏱️ Prepared statement benchmark'ı
+
+Aynı bağlantı üzerinde sık çalışan sorguları önce düz SQL ile, sonra
+PREPARE + EXECUTE ile çalıştırır ve çağrı başına süreleri karşılaştırır:
+  - users    : domain kullanıcı sayfası (list_users_page sorgusu)
+  - domains  : get_ldap_connection_by_domain_id domain sorgusu
+  - api_logs : APILogger INSERT (transaction sonunda geri alınır, tabloya yazılmaz)
+
+.env'deki veritabanına bağlanır. Supabase pooler transaction modunda
+(port 6543) prepared statement çalışmaz; doğrudan 5432 portunu kullanın.
+
+Kullanım:
+    python benchmarks/bench_prepared.py [domain_id] [tekrar_sayısı]
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prepared_statements  # noqa: E402
+from prepared_statements import register_query, execute_prepared  # noqa: E402
+from db_ops import get_db_connection  # noqa: E402
+from ldap_handler import SELECT_DOMAIN_LDAP  # noqa: E402
+from log_system import APILogger  # noqa: E402
+
+USERS_PAGE = register_query("bench_users_page", """
+    SELECT id, username, first_name, last_name, role_id, department_id, status, username
+    FROM users
+    WHERE domain_id = %s
+    ORDER BY username ASC, id ASC
+    LIMIT %s
+""")
+
+
+def measure(cursor, name, params, repeat, fetch):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        execute_prepared(cursor, name, params)
+        if fetch:
+            cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def run(domain_id, repeat):
+    conn = get_db_connection()
+    if conn is None:
+        sys.exit(1)
+    cursor = conn.cursor()
+
+    log_params = (
+        "/bench", "POST", "user", None, domain_id,
+        json.dumps({"username": "bench", "domain_id": domain_id}),
+        json.dumps({"success": True}), True, None
+    )
+    cases = [
+        ("users", USERS_PAGE, (domain_id, 51), True),
+        ("domains", SELECT_DOMAIN_LDAP, (domain_id,), True),
+        ("api_logs", APILogger.INSERT_LOG, log_params, False),
+    ]
+
+    print(f"🧪 Prepared statement benchmark'ı - domain_id={domain_id}, {repeat} tekrar")
+    print("=" * 72)
+    print(f"{'Sorgu':10} {'Düz ort.':>10} {'Düz p50':>10} {'Prep ort.':>10} {'Prep p50':>10} {'Kazanç':>8}")
+
+    try:
+        for label, name, params, fetch in cases:
+            # Isınma: bağlantı ve katalog önbellekleri dolsun
+            prepared_statements.DB_PREPARED_STATEMENTS = False
+            measure(cursor, name, params, 5, fetch)
+            plain = measure(cursor, name, params, repeat, fetch)
+
+            prepared_statements.DB_PREPARED_STATEMENTS = True
+            measure(cursor, name, params, 5, fetch)
+            prepared = measure(cursor, name, params, repeat, fetch)
+
+            plain_mean, prepared_mean = statistics.mean(plain), statistics.mean(prepared)
+            gain = (1 - prepared_mean / plain_mean) * 100 if plain_mean else 0.0
+            print(f"{label:10} {plain_mean:10.3f} {statistics.median(plain):10.3f} "
+                  f"{prepared_mean:10.3f} {statistics.median(prepared):10.3f} {gain:7.1f}%")
+    finally:
+        # api_logs satırları kalıcı olmasın
+        conn.rollback()
+        conn.close()
+
+    print("\nSüreler milisaniyedir; kazanç parse/plan adımının atlanmasından gelir.")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500)
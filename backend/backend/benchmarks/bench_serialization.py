@@ -0,0 +1,128 @@
+"""
+⏱️ Liste endpoint'leri için serileştirme ve sıkıştırma benchmark'ı
+
+10.000 satırlık kullanıcı ve log yükü üzerinde şu yolları karşılaştırır:
+  - baseline : satır başına dict + jsonable_encoder + stdlib json (FastAPI varsayılanı)
+  - orjson   : satır başına dict + fast_json.dumps
+  - fast     : fast_json.encode_payload (tuple satırlardan, nesne biçimi)
+  - compact  : fast_json.encode_payload (kolon + satır dizisi biçimi)
+
+Kullanım:
+    python benchmarks/bench_serialization.py [satır_sayısı]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_json import HAS_ORJSON, dumps, encode_payload  # noqa: E402
+from compression import HAS_BROTLI, compress  # noqa: E402
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+USER_COLUMNS = ["id", "username", "first_name", "last_name", "role_id", "department_id", "status"]
+LOG_COLUMNS = ["id", "endpoint", "method", "operation_type", "user_id", "domain_id", "request_data",
+               "response_data", "success", "error_message", "created_at"]
+
+
+def make_user_rows(count):
+    return [
+        (i, f"user{i:06d}", f"Ad{i}", f"Soyad{i}", 2, i % 40 or None, "devrede" if i % 7 else "devre dışı")
+        for i in range(1, count + 1)
+    ]
+
+
+def make_log_rows(count):
+    start = datetime(2024, 12, 26, 10, 30)
+    rows = []
+    for i in range(1, count + 1):
+        request_data = {"username": f"user{i}", "first_name": "Ad", "last_name": "Soyad",
+                        "role_id": 2, "department_id": i % 40, "domain_id": 1}
+        response_data = {"success": True, "status": "devrede", "message": "Kullanıcı başarıyla eklendi"}
+        rows.append((i, "/add_user", "POST", "user", "user-uuid-123", 1,
+                     json.dumps(request_data, ensure_ascii=False), json.dumps(response_data, ensure_ascii=False),
+                     True, None, start + timedelta(seconds=i)))
+    return rows
+
+
+def timeit(func, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def baseline_users(rows):
+    users = [dict(zip(USER_COLUMNS, r)) for r in rows]
+    payload = {"users": users}
+    if jsonable_encoder:
+        payload = jsonable_encoder(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def baseline_logs(rows):
+    logs = []
+    for r in rows:
+        item = dict(zip(LOG_COLUMNS, r))
+        # get_logs() JSONB alanlarını Python nesnesi olarak döndürür
+        item["request_data"] = json.loads(item["request_data"])
+        item["response_data"] = json.loads(item["response_data"])
+        item["created_at"] = item["created_at"].isoformat()
+        logs.append(item)
+    payload = {"success": True, "logs": logs, "total_count": len(logs), "limit": len(logs), "offset": 0}
+    if jsonable_encoder:
+        payload = jsonable_encoder(payload)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def run(count):
+    print(f"🧪 Serileştirme benchmark'ı - {count} satır")
+    print(f"   orjson: {'var' if HAS_ORJSON else 'yok'} | brotli: {'var' if HAS_BROTLI else 'yok'} | "
+          f"jsonable_encoder: {'var' if jsonable_encoder else 'yok'}")
+    print("=" * 72)
+
+    user_rows = make_user_rows(count)
+    log_rows = make_log_rows(count)
+    log_meta = {"success": True, "total_count": count, "limit": count, "offset": 0}
+
+    cases = [
+        ("users / baseline", lambda: baseline_users(user_rows)),
+        ("users / orjson", lambda: dumps({"users": [dict(zip(USER_COLUMNS, r)) for r in user_rows]})),
+        ("users / fast", lambda: encode_payload({}, "users", USER_COLUMNS, user_rows)),
+        ("users / compact", lambda: encode_payload({}, "users", USER_COLUMNS, user_rows, compact=True)),
+        ("logs / baseline", lambda: baseline_logs(log_rows)),
+        ("logs / fast", lambda: encode_payload(log_meta, "logs", LOG_COLUMNS, log_rows,
+                                               raw_json_columns=("request_data", "response_data"))),
+        ("logs / compact", lambda: encode_payload(log_meta, "logs", LOG_COLUMNS, log_rows,
+                                                  raw_json_columns=("request_data", "response_data"),
+                                                  compact=True)),
+    ]
+
+    print(f"{'Yol':20} {'Süre (ms)':>10} {'Boyut':>10} {'gzip':>10} {'gzip ms':>8} {'br':>10} {'br ms':>8}")
+    for name, func in cases:
+        elapsed, body = timeit(func)
+        gzip_ms, gz = timeit(lambda: compress(body, "gzip"), repeat=3)
+        line = f"{name:20} {elapsed:10.1f} {len(body):10,} {len(gz):10,} {gzip_ms:8.1f}"
+        if HAS_BROTLI:
+            br_ms, br = timeit(lambda: compress(body, "br"), repeat=3)
+            line += f" {len(br):10,} {br_ms:8.1f}"
+        print(line)
+
+    # Hızlı yolun aynı veriyi ürettiğini doğrula
+    assert json.loads(cases[2][1]())["users"] == json.loads(baseline_users(user_rows))["users"]
+    assert json.loads(cases[5][1]())["logs"] == json.loads(baseline_logs(log_rows))["logs"]
+    print("\n✅ Hızlı yol çıktıları baseline ile aynı")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
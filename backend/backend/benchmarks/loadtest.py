@@ -0,0 +1,302 @@
+"""
+🚦 API yük testi sürücüsü
+
+Çalışan bir `server:app` örneğine hedef RPS'te (open-loop) gerçekçi bir istek karışımı gönderir:
+  - list_users : /list_users_by_domain okumaları (tam liste, sayfalar, arama)
+  - add_user   : /add_user istekleri, ani yükler (burst) halinde
+  - logs       : /logs log görüntüleyici sayfalama
+
+Gecikme, isteğin planlandığı andan yanıtın geldiği ana kadar ölçülür; sunucu
+yavaşladığında biriken bekleme de sonuçlara yansır (coordinated omission yok).
+Endpoint bazında p50/p95/p99, hata oranı ve gerçekleşen RPS raporlanır.
+--sweep ile eşzamanlılık, --sweep-rps ile hedef RPS kademeli artırılarak doyma
+noktası (SLO'yu sağlayan en yüksek RPS) aranır.
+
+Kullanım:
+    python benchmarks/loadtest.py --rps 50 --duration 60 --concurrency 32 --domain-id 1
+    python benchmarks/loadtest.py --rps 200 --duration 30 --sweep 4,8,16,32,64 --slo-p99-ms 1000
+    python benchmarks/loadtest.py --sweep-rps 10,20,40,80,160 --concurrency 64 --mix list_users=80,logs=20
+    python benchmarks/loadtest.py --mix list_users=80,logs=20          # add_user olmadan (yazma yok)
+
+Not: add_user senaryosu LDAP'e ve veritabanına gerçek kullanıcı ekler
+("lt<çalıştırma>_<n>" adlarıyla); --cleanup ile test sonunda silinir.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import requests
+except ImportError:
+    print("❌ requests paketi gerekli: pip install requests")
+    sys.exit(1)
+
+DEFAULT_MIX = "list_users=70,add_user=10,logs=20"
+
+
+class Scenario:
+    """Karışımdaki senaryoların istek üreticileri"""
+
+    def __init__(self, args):
+        self.args = args
+        self.run_id = int(time.time()) % 100000
+        self._counter = 0
+        self._lock = threading.Lock()
+        self.created_users = []
+
+    def _next_username(self):
+        with self._lock:
+            self._counter += 1
+            username = f"lt{self.run_id}_{self._counter}"
+            self.created_users.append(username)
+            return username
+
+    def list_users(self, session):
+        domain_id = self.args.domain_id
+        kind = random.random()
+        if kind < 0.5:
+            params = {"limit": 50, "sort": random.choice(["username", "last_name"])}
+        elif kind < 0.8:
+            params = {}
+        else:
+            params = {"limit": 50, "search": random.choice(["a", "ad", "user", "test"])}
+        return session.get(f"{self.args.base_url}/list_users_by_domain/{domain_id}", params=params,
+                           timeout=self.args.timeout)
+
+    def add_user(self, session):
+        payload = {
+            "username": self._next_username(),
+            "first_name": "Load",
+            "last_name": "Test",
+            "password": "LoadTest123!",
+            "role_id": 2,
+            "domain_id": self.args.domain_id,
+            "created_by": self.args.user_id,
+        }
+        return session.post(f"{self.args.base_url}/add_user", json=payload, timeout=self.args.timeout)
+
+    def logs(self, session):
+        # Log görüntüleyici: çoğunlukla ilk sayfalar, arada derin sayfalar
+        page = min(int(random.expovariate(0.3)), 200)
+        params = {"limit": 50, "offset": page * 50}
+        return session.get(f"{self.args.base_url}/logs", params=params, timeout=self.args.timeout)
+
+    def cleanup(self, session):
+        for username in self.created_users:
+            try:
+                session.delete(f"{self.args.base_url}/delete_user",
+                               json={"username": username, "domain_id": self.args.domain_id,
+                                     "user_id": self.args.user_id},
+                               timeout=self.args.timeout)
+            except requests.RequestException:
+                pass
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("list_users", "add_user", "logs"):
+            raise ValueError(f"Bilinmeyen senaryo: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def build_schedule(mix, rps, duration, burst_size):
+    """
+    (planlanan_an, senaryo) listesini üretir.
+    add_user istekleri tek tek değil, burst_size'lık gruplar halinde aynı anda planlanır.
+    """
+    total = int(rps * duration)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    schedule = []
+    pending_adds = 0
+    for i in range(total):
+        at = i / rps
+        name = random.choices(names, weights)[0]
+        if name == "add_user" and burst_size > 1:
+            pending_adds += 1
+            if pending_adds < burst_size:
+                continue
+            schedule.extend((at, "add_user") for _ in range(pending_adds))
+            pending_adds = 0
+            continue
+        schedule.append((at, name))
+    return schedule
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_load(args, scenario, rps, concurrency):
+    mix = parse_mix(args.mix)
+    schedule = build_schedule(mix, rps, args.duration, args.burst_size)
+    results = defaultdict(lambda: {"latencies": [], "errors": 0, "status": defaultdict(int)})
+    results_lock = threading.Lock()
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def execute(scheduled_at, name):
+        error = False
+        status = "exception"
+        try:
+            response = getattr(scenario, name)(session())
+            status = response.status_code
+            error = response.status_code >= 400
+            if not error and response.headers.get("content-type", "").startswith("application/json"):
+                body = response.json()
+                error = isinstance(body, dict) and body.get("success") is False
+        except requests.RequestException:
+            error = True
+        latency_ms = (time.perf_counter() - scheduled_at) * 1000
+        with results_lock:
+            entry = results[name]
+            entry["latencies"].append(latency_ms)
+            entry["status"][status] += 1
+            if error:
+                entry["errors"] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for offset, name in schedule:
+            scheduled_at = started + offset
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(execute, scheduled_at, name)
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    summary = {}
+    all_latencies = []
+    total_errors = 0
+    for name, entry in sorted(results.items()):
+        latencies = entry["latencies"]
+        all_latencies.extend(latencies)
+        total_errors += entry["errors"]
+        summary[name] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "error_rate": round(entry["errors"] / len(latencies), 4) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "mean_ms": round(statistics.mean(latencies), 1),
+            "status": dict(entry["status"]),
+        }
+    if all_latencies:
+        summary["_total"] = {
+            "requests": len(all_latencies),
+            "rps": round(len(all_latencies) / elapsed, 2),
+            "error_rate": round(total_errors / len(all_latencies), 4),
+            "p50_ms": round(percentile(all_latencies, 0.50), 1),
+            "p95_ms": round(percentile(all_latencies, 0.95), 1),
+            "p99_ms": round(percentile(all_latencies, 0.99), 1),
+            "mean_ms": round(statistics.mean(all_latencies), 1),
+        }
+    return summary
+
+
+def print_summary(summary, title):
+    print(f"\n📊 {title}")
+    print(f"{'Senaryo':12} {'İstek':>7} {'RPS':>8} {'Hata %':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in summary.items():
+        print(f"{name:12} {row['requests']:7} {row['rps']:8.1f} {row['error_rate'] * 100:7.2f} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+
+
+def is_saturated(summary, args, rps):
+    total = summary.get("_total")
+    if not total:
+        return True
+    return (total["p99_ms"] > args.slo_p99_ms
+            or total["error_rate"] > args.max_error_rate
+            or total["rps"] < rps * 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ODIE API yük testi")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--domain-id", type=int, default=1)
+    parser.add_argument("--user-id", default="loadtest-user", help="created_by / user_id olarak gönderilen UUID")
+    parser.add_argument("--rps", type=float, default=20, help="Hedef istek/saniye")
+    parser.add_argument("--duration", type=float, default=30, help="Her kademenin süresi (saniye)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Eşzamanlı istemci thread sayısı")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Senaryo ağırlıkları (varsayılan {DEFAULT_MIX})")
+    parser.add_argument("--burst-size", type=int, default=5, help="add_user isteklerinin gruplanma boyutu")
+    parser.add_argument("--sweep", help="Virgülle ayrılmış eşzamanlılık kademeleri (ör. 4,8,16,32)")
+    parser.add_argument("--sweep-rps", help="Virgülle ayrılmış hedef RPS kademeleri (ör. 10,20,40,80)")
+    parser.add_argument("--slo-p99-ms", type=float, default=1000, help="Doyma kriteri: toplam p99 üst sınırı")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Doyma kriteri: hata oranı üst sınırı")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--cleanup", action="store_true", help="add_user ile eklenen kullanıcıları sonunda sil")
+    parser.add_argument("--json", help="Sonuçları bu dosyaya JSON olarak yaz")
+    args = parser.parse_args()
+
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    scenario = Scenario(args)
+    concurrency_levels = [int(c) for c in args.sweep.split(",")] if args.sweep else [args.concurrency]
+    rps_levels = [float(r) for r in args.sweep_rps.split(",")] if args.sweep_rps else [args.rps]
+    levels = [(rps, concurrency) for rps in rps_levels for concurrency in concurrency_levels]
+    report = []
+
+    print(f"🚦 Yük testi: {args.base_url} | {args.duration}s/kademe | karışım {args.mix}")
+    try:
+        for rps, concurrency in levels:
+            results, elapsed = run_load(args, scenario, rps, concurrency)
+            summary = summarize(results, elapsed)
+            saturated = is_saturated(summary, args, rps)
+            print_summary(summary, f"Hedef {rps:g} RPS, eşzamanlılık {concurrency} ({elapsed:.1f}s)"
+                                   f"{' - ⚠️ doydu' if saturated else ''}")
+            report.append({"rps": rps, "concurrency": concurrency, "elapsed_s": round(elapsed, 2),
+                           "saturated": saturated, "summary": summary})
+            if args.sweep_rps and not args.sweep and saturated:
+                # RPS taramasında doyma noktası bulundu; daha yüksek kademeler anlamsız
+                break
+
+        if args.sweep or args.sweep_rps:
+            healthy = [r for r in report if not r["saturated"]]
+            if not healthy:
+                print("\n⚠️ Hiçbir kademe SLO'yu sağlamadı; yük bu yapılandırmanın doyma noktasının üzerinde.")
+            elif args.sweep_rps:
+                best = max(healthy, key=lambda r: r["rps"])
+                print(f"\n✅ SLO'yu sağlayan en yüksek RPS: {best['rps']:g} (eşzamanlılık {best['concurrency']})")
+            else:
+                print(f"\n✅ SLO'yu sağlayan en düşük eşzamanlılık: {min(r['concurrency'] for r in healthy)}")
+    finally:
+        if args.cleanup and scenario.created_users:
+            print(f"\n🧹 {len(scenario.created_users)} test kullanıcısı siliniyor...")
+            scenario.cleanup(requests.Session())
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "levels": report}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Sonuçlar yazıldı: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+-- Benchmark veritabanı şeması (Supabase'deki tabloların yerel eşleniği)
+-- conftest.py her oturum başında bu dosyayı, ardından ../migrations/*.sql dosyalarını çalıştırır.
+
+DROP TABLE IF EXISTS api_logs, users, departments, domains CASCADE;
+
+CREATE TABLE domains (
+    id SERIAL PRIMARY KEY,
+    domain_name VARCHAR(255) NOT NULL,
+    domain_ip VARCHAR(255) NOT NULL,
+    domain_port INTEGER DEFAULT 389,
+    domain_component VARCHAR(255) NOT NULL,
+    ldap_user VARCHAR(255) NOT NULL,
+    ldap_password VARCHAR(255) NOT NULL,
+    domain_type VARCHAR(10) DEFAULT 'ms',
+    status VARCHAR(20) DEFAULT 'devrede',
+    created_by VARCHAR(255),
+    CONSTRAINT unique_ip_per_user UNIQUE (domain_ip, created_by)
+);
+
+CREATE TABLE departments (
+    id SERIAL PRIMARY KEY,
+    department_name VARCHAR(255) NOT NULL,
+    domain_id INTEGER REFERENCES domains (id) ON DELETE CASCADE,
+    created_by VARCHAR(255)
+);
+
+CREATE TABLE users (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(255) NOT NULL UNIQUE,
+    password VARCHAR(255),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    role_id INTEGER DEFAULT 2,
+    department_id INTEGER REFERENCES departments (id) ON DELETE SET NULL,
+    status VARCHAR(20) DEFAULT 'devrede',
+    domain_id INTEGER REFERENCES domains (id) ON DELETE CASCADE
+);
+
+CREATE TABLE api_logs (
+    id SERIAL PRIMARY KEY,
+    endpoint VARCHAR(255) NOT NULL,
+    method VARCHAR(10) NOT NULL,
+    operation_type VARCHAR(50),
+    user_id VARCHAR(255),
+    domain_id INTEGER,
+    request_data JSONB,
+    response_data JSONB,
+    success BOOLEAN DEFAULT true,
+    error_message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX idx_api_logs_created_at ON api_logs (created_at DESC);
+CREATE INDEX idx_api_logs_user_id ON api_logs (user_id);
+CREATE INDEX idx_api_logs_endpoint ON api_logs (endpoint);
+CREATE INDEX idx_api_logs_success ON api_logs (success);
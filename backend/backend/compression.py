@@ -0,0 +1,149 @@
+import gzip
+import os
+import anyio
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:  # brotli opsiyoneldir, yoksa sadece gzip sunulur
+    brotli = None
+    HAS_BROTLI = False
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# Bu boyuttan büyük gövdeler thread havuzunda sıkıştırılır; event loop diğer istekleri bekletmez
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", "65536"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def parse_accept_encoding(header):
+    """
+    Accept-Encoding başlığını {encoding: q} sözlüğüne çevirir
+
+    Args:
+        header (str): Ör. "br;q=1.0, gzip;q=0.8, *;q=0.1"
+    """
+    result = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name.strip().lower()] = q
+    return result
+
+
+def choose_encoding(header):
+    """İstemcinin kabul ettiği en uygun sıkıştırmayı seçer (br > gzip), yoksa None"""
+    accepted = parse_accept_encoding(header or "")
+    wildcard = accepted.get("*", 0.0)
+    candidates = []
+    if HAS_BROTLI:
+        candidates.append(("br", accepted.get("br", wildcard), 1))
+    candidates.append(("gzip", accepted.get("gzip", wildcard), 0))
+    candidates = [c for c in candidates if c[1] > 0]
+    if not candidates:
+        return None
+    # Eşit q değerinde brotli tercih edilir
+    return max(candidates, key=lambda c: (c[1], c[2]))[0]
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def weak_etag(etag):
+    """
+    Sıkıştırılmış gövdenin ETag'i zayıf yapılır: byte'lar sıkıştırılmamış gövdeden farklıdır,
+    içerik aynıdır. If-None-Match zayıf karşılaştırma yaptığından 304 akışı değişmez.
+    """
+    return etag if etag.startswith(b"W/") else b"W/" + etag
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encoding'e göre brotli/gzip sıkıştırma yapan ASGI middleware.
+    Yanıt gövdesi tamponlanır; minimum boyutun altındaki, zaten sıkıştırılmış
+    veya JSON/metin olmayan yanıtlar olduğu gibi geçer. Büyük gövdeler thread
+    havuzunda sıkıştırılır.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE, thread_min_size=COMPRESSION_THREAD_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict((k.lower(), v) for k, v in scope.get("headers", []))
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict((k.lower(), v) for k, v in message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in response_headers
+                        or message["status"] in (204, 304)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] == "http.response.body":
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+
+                body = b"".join(body_parts)
+                vary = [v for k, v in start_message.get("headers", []) if k.lower() == b"vary"]
+                raw_headers = [
+                    (k, v) for k, v in start_message.get("headers", [])
+                    if k.lower() not in (b"content-length", b"vary")
+                ]
+                if len(body) >= self.minimum_size:
+                    if len(body) >= self.thread_min_size:
+                        body = await anyio.to_thread.run_sync(compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    raw_headers = [(k, weak_etag(v) if k.lower() == b"etag" else v) for k, v in raw_headers]
+                    raw_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                raw_headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+                raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+                start_message["headers"] = raw_headers
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,19 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from ldap3 import SUBTREE
+from ldap_cache import cache_ldap_records
+from response_cache import response_cache
+from prepared_statements import register_query, execute_prepared
+from query_stats import InstrumentedCursor
+from metrics import registry
+import timing
+import hashlib
 import os
+import threading
+import time
 
 # Load environment variables from .env
 load_dotenv()
@@ -12,6 +25,29 @@ HOST = os.getenv("host")
 PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
 
+# Bağlantı havuzu ayarları
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Havuz doluyken boş bağlantı için en fazla bekleme süresi (saniye); aşılırsa PoolTimeout (API'de 503)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+class OdieConnection(psycopg2.extensions.connection):
+    """Commit sonrası çalışacak callback'leri tutabilen bağlantı sınıfı"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Tüm cursor'lar süre/satır/çağrı yeri istatistiği toplar (query_stats.py)
+        self.cursor_factory = InstrumentedCursor
+        self.after_commit_callbacks = []
+        # Bu bağlantıda PREPARE edilmiş statement adları
+        self.prepared_statements = set()
+
+    def rollback(self):
+        # Geri alınan transaction'ın commit sonrası işleri de iptal edilir
+        self.after_commit_callbacks.clear()
+        super().rollback()
+
 
 def get_db_connection():
     try:
@@ -20,7 +56,8 @@ def get_db_connection():
             password=PASSWORD,
             host=HOST,
             port=PORT,
-            dbname=DBNAME
+            dbname=DBNAME,
+            connection_factory=OdieConnection
         )
         print("✅ Supabase veritabanına bağlanıldı.")
         return conn
@@ -28,265 +65,652 @@ def get_db_connection():
         print("❌ Veritabanı bağlantı hatası:", e)
         return None
 
-def sync_ldap_users_to_supabase(conn_db, conn_ldap):
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool dolduğunda hata fırlatır; semaphore ile beklemeye çeviriyoruz
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+DB_POOL_IN_USE = registry.gauge("odie_db_pool_connections_in_use", "Havuzdan alınmış bağlantı sayısı")
+DB_POOL_WAITING = registry.gauge("odie_db_pool_waiting", "Havuzda boş bağlantı bekleyen istek sayısı")
+DB_POOL_WAIT = registry.histogram("odie_db_pool_wait_ms", "Havuzdan bağlantı alma bekleme süresi (ms)")
+DB_POOL_TIMEOUTS = registry.counter("odie_db_pool_timeouts_total",
+                                    "DB_POOL_TIMEOUT içinde bağlantı alınamayan istek sayısı")
+registry.gauge_callback("odie_db_pool_connections_max", "Havuzdaki en fazla bağlantı sayısı", lambda: DB_POOL_MAX)
+
+
+def get_db_pool():
+    """Uygulama genelinde paylaşılan bağlantı havuzunu (ilk çağrıda) oluşturur"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    user=USER,
+                    password=PASSWORD,
+                    host=HOST,
+                    port=PORT,
+                    dbname=DBNAME,
+                    connection_factory=OdieConnection
+                )
+                print(f"✅ Supabase bağlantı havuzu oluşturuldu (min={DB_POOL_MIN}, max={DB_POOL_MAX}).")
+    return _pool
+
+
+class PoolTimeout(Exception):
+    """Havuzdan DB_POOL_TIMEOUT süresi içinde bağlantı alınamadı"""
+
+
+def _checkout():
+    """Havuzdan bağlantı alır; havuz DB_POOL_TIMEOUT boyunca doluysa PoolTimeout fırlatır"""
+    db_pool = get_db_pool()
+    DB_POOL_WAITING.inc()
+    started = time.perf_counter()
+    try:
+        acquired = _pool_slots.acquire(timeout=DB_POOL_TIMEOUT if DB_POOL_TIMEOUT > 0 else None)
+    finally:
+        DB_POOL_WAITING.dec()
+    if not acquired:
+        DB_POOL_TIMEOUTS.inc()
+        raise PoolTimeout(f"Veritabanı bağlantı havuzu dolu ({DB_POOL_TIMEOUT:g} sn beklendi)")
+    DB_POOL_IN_USE.inc()
+    try:
+        conn = db_pool.getconn()
+    except Exception:
+        DB_POOL_IN_USE.dec()
+        _pool_slots.release()
+        raise
+    wait_ms = (time.perf_counter() - started) * 1000
+    DB_POOL_WAIT.observe(wait_ms)
+    timing.record("db_acquire", wait_ms)
+    return conn
+
+
+def _checkin(conn):
+    try:
+        get_db_pool().putconn(conn, close=bool(conn.closed))
+    finally:
+        DB_POOL_IN_USE.dec()
+        _pool_slots.release()
+
+
+class LazyConnection:
+    """
+    get_db'nin verdiği istek bağlantısı. Havuzdan ilk kullanımda (cursor, prepared_statements
+    vb.) alınır; böylece LDAP işlemleri ve bekleme süreleri boyunca havuzda yer tutulmaz.
+    Commit sonrası callback'ler bağlantı alınmadan da kaydedilebilir.
+    """
+
+    def __init__(self):
+        self._conn = None
+        # Bağlantı alınamadıysa aynı istekte tekrar beklenmez
+        self._error = None
+        self.after_commit_callbacks = []
+
+    @property
+    def acquired(self):
+        return self._conn is not None
+
+    @property
+    def closed(self):
+        return self._conn.closed if self._conn is not None else 0
+
+    def __getattr__(self, name):
+        # Sadece bu sınıfta tanımlı olmayan özellikler için çağrılır
+        if self._conn is None:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._conn = _checkout()
+            except PoolTimeout as e:
+                self._error = e
+                raise
+        return getattr(self._conn, name)
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    def rollback(self):
+        self.after_commit_callbacks.clear()
+        if self._conn is not None and not self._conn.closed:
+            self._conn.rollback()
+
+    def release(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            _checkin(conn)
+
+
+def after_commit(conn, func, *args):
+    """
+    func'ı bağlantının transaction'ı commit edildikten sonra çalıştırır.
+    Callback desteklemeyen bağlantılarda hemen çalıştırılır.
+    """
+    callbacks = getattr(conn, "after_commit_callbacks", None)
+    if callbacks is None:
+        func(*args)
+    else:
+        callbacks.append((func, args))
+
+
+def _run_after_commit(conn):
+    callbacks = conn.after_commit_callbacks[:]
+    conn.after_commit_callbacks.clear()
+    for func, args in callbacks:
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"❌ Commit sonrası işlem hatası: {e}")
+
+
+@contextmanager
+def db_session(conn=None):
+    """
+    Veritabanı unit-of-work'ü.
+
+    conn verilmişse (ör. istek kapsamındaki bağlantı) aynı bağlantı kullanılır, commit
+    edilmez; hata durumunda tüm transaction geri alınır ve hata yukarı fırlatılır.
+    conn verilmemişse havuzdan bağlantı alınır, başarıyla biterse commit edilir ve
+    bağlantı havuza geri verilir.
+
+    Kullanım:
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
+            ...
+    """
+    if conn is not None:
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            if hasattr(conn, "after_commit_callbacks"):
+                conn.after_commit_callbacks.clear()
+            raise
+        return
+
+    conn = _checkout()
+    try:
+        yield conn
+        with timing.span("db_commit"):
+            conn.commit()
+        _run_after_commit(conn)
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        conn.after_commit_callbacks.clear()
+        raise
+    finally:
+        _checkin(conn)
+
+
+def get_db():
+    """
+    FastAPI dependency: istek boyunca tüm yardımcı fonksiyonlara tek bağlantı/transaction verir.
+    Endpoint hatasız dönerse transaction commit edilir.
+
+    Bağlantı havuzdan ilk veritabanı işleminde alınır (LazyConnection); veritabanına hiç
+    gitmeyen veya önce LDAP işlemi yapan istekler o süre boyunca havuzda yer tutmaz.
+
+    Kullanım:
+        def endpoint(..., db=Depends(get_db)):
+    """
+    conn = LazyConnection()
+    try:
+        yield conn
+        with timing.span("db_commit"):
+            conn.commit()
+        _run_after_commit(conn)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.release()
+
+# Senkronizasyon ayarları (.env üzerinden değiştirilebilir)
+# LDAP'te artık bulunmayan kullanıcılar: disable (devre dışı bırak), delete (sil), keep (dokunma)
+SYNC_DELETE_MODE = os.getenv("SYNC_DELETE_MODE", "disable")
+# Tek ifadede yazılan en fazla satır sayısı
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "1000"))
+# LDAP sayfalı arama boyutu (AD varsayılan MaxPageSize: 1000)
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+# 1'den büyükse dizin parçalara bölünüp ayrı süreçlerde senkronize edilir (sync_shards.py)
+SYNC_SHARDS = int(os.getenv("SYNC_SHARDS", "1"))
+
+SYNC_USER_FILTER = '(objectClass=user)'
+SYNC_USER_ATTRIBUTES = ['sAMAccountName', 'givenName', 'sn', 'userAccountControl', 'distinguishedName']
+
+SYNC_SELECT_EXISTING = register_query("users_sync_existing", """
+    SELECT id, username, domain_id, content_hash
+    FROM users
+    WHERE username = ANY(%s)
+""")
+
+# Daha önce bu domain'den senkronize edilmiş kullanıcılar (silinen kullanıcı tespiti)
+SYNC_SELECT_SYNCED = register_query("users_sync_synced", """
+    SELECT id, username FROM users WHERE domain_id = %s AND content_hash IS NOT NULL
+""")
+
+# Yeni kullanıcılar: şifre ve rol sadece ilk eklemede verilir
+SYNC_INSERT_USERS = register_query("users_sync_insert", """
+    INSERT INTO users (username, password, first_name, last_name, role_id, status, domain_id,
+                       distinguished_name, content_hash)
+    SELECT u.username, 'default123', u.first_name, u.last_name, 2, u.status, %s::int, u.dn, u.content_hash
+    FROM unnest(%s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[])
+         AS u(username, first_name, last_name, status, dn, content_hash)
+    ON CONFLICT (username) DO NOTHING
+""")
+
+# Özeti değişen kullanıcılar: şifre, rol ve departman uygulamada yönetilir, üzerine yazılmaz
+SYNC_UPDATE_USERS = register_query("users_sync_update", """
+    UPDATE users
+    SET first_name = u.first_name,
+        last_name = u.last_name,
+        status = u.status,
+        distinguished_name = u.dn,
+        content_hash = u.content_hash,
+        domain_id = COALESCE(users.domain_id, %s::int)
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[])
+         AS u(id, first_name, last_name, status, dn, content_hash)
+    WHERE users.id = u.id AND users.content_hash IS DISTINCT FROM u.content_hash
+""")
+
+# Devre dışı bırakılan satırın özeti silinir; kullanıcı LDAP'e geri gelirse yeniden yazılır
+SYNC_DISABLE_USERS = register_query("users_sync_disable", """
+    UPDATE users SET status = 'devre dışı', content_hash = NULL WHERE id = ANY(%s)
+""")
+
+SYNC_DELETE_USERS = register_query("users_sync_delete", """
+    DELETE FROM users WHERE id = ANY(%s)
+""")
+
+
+def ldap_content_hash(username, first_name, last_name, status, dn):
+    """Senkronize edilen alanların özeti (users.content_hash)"""
+    content = "\x1f".join((username, first_name, last_name, status, dn or ""))
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def _batches(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _columns(rows):
+    """Satır listesini unnest parametreleri için sütun listelerine çevirir"""
+    return [list(column) for column in zip(*rows)]
+
+
+def _attribute(attributes, name):
+    value = attributes.get(name)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+def iter_ldap_user_records(conn_ldap, search_base, search_filter=SYNC_USER_FILTER, search_scope=SUBTREE):
+    """
+    Sayfalı arama ile LDAP kullanıcılarını okur (sunucu boyut sınırına takılmaz)
+
+    Yields:
+        tuple: (username, (first_name, last_name, status, dn, user_control, content_hash))
+    """
+    responses = conn_ldap.extend.standard.paged_search(
+        search_base, search_filter, search_scope=search_scope, attributes=SYNC_USER_ATTRIBUTES,
+        paged_size=SYNC_PAGE_SIZE, generator=True
+    )
+    for response in responses:
+        if response.get('type') != 'searchResEntry':
+            continue
+        attributes = response.get('attributes') or {}
+        username = _attribute(attributes, 'sAMAccountName')
+        if not username:
+            continue
+
+        # givenName ve sn hem varsa hem boş değilse kullan
+        first_name = _attribute(attributes, 'givenName') or ''
+        last_name = _attribute(attributes, 'sn') or ''
+
+        uac = _attribute(attributes, 'userAccountControl')
+        user_control = int(uac) if uac is not None else 512
+        status = 'devre dışı' if user_control == 514 else 'devrede'
+        dn = _attribute(attributes, 'distinguishedName') or response.get('dn')
+
+        content_hash = ldap_content_hash(username, first_name, last_name, status, dn)
+        yield username, (first_name, last_name, status, dn, user_control, content_hash)
+
+
+def write_user_diff(cursor, domain_id, ldap_users):
+    """
+    LDAP kayıtlarını users tablosuyla karşılaştırıp sadece yeni ve değişen satırları yazar
+    (commit etmez)
+
+    Args:
+        ldap_users (dict): iter_ldap_user_records çıktısı (username -> kayıt)
+
+    Returns:
+        dict: {"inserted", "updated", "unchanged", "conflicts"}
+    """
+    existing = {}
+    usernames = list(ldap_users)
+    for batch in _batches(usernames, SYNC_BATCH_SIZE * 10):
+        execute_prepared(cursor, SYNC_SELECT_EXISTING, (batch,))
+        for user_id, username, row_domain_id, content_hash in cursor.fetchall():
+            existing[username] = (user_id, row_domain_id, content_hash)
+
+    to_insert, to_update = [], []
+    unchanged = conflicts = 0
+    for username, (first_name, last_name, status, dn, _, content_hash) in ldap_users.items():
+        row = existing.get(username)
+        if row is None:
+            to_insert.append((username, first_name, last_name, status, dn, content_hash))
+        elif row[1] is not None and domain_id is not None and row[1] != domain_id:
+            # Aynı kullanıcı adı başka bir domain'e ait; o domain'in kaydına dokunulmaz
+            conflicts += 1
+        elif row[2] == content_hash:
+            unchanged += 1
+        else:
+            to_update.append((row[0], first_name, last_name, status, dn, content_hash))
+
+    inserted = updated = 0
+    for batch in _batches(to_insert, SYNC_BATCH_SIZE):
+        execute_prepared(cursor, SYNC_INSERT_USERS, (domain_id, *_columns(batch)))
+        inserted += cursor.rowcount
+    for batch in _batches(to_update, SYNC_BATCH_SIZE):
+        execute_prepared(cursor, SYNC_UPDATE_USERS, (domain_id, *_columns(batch)))
+        updated += cursor.rowcount
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "conflicts": conflicts}
+
+
+def apply_ldap_deletions(cursor, domain_id, seen_usernames):
+    """
+    Bu domain'den senkronize edilip LDAP'te görülmeyen kullanıcılara SYNC_DELETE_MODE uygular
+    (commit etmez)
+
+    Returns:
+        int: Devre dışı bırakılan/silinen satır sayısı
+    """
+    if SYNC_DELETE_MODE not in ("disable", "delete"):
+        return 0
+    execute_prepared(cursor, SYNC_SELECT_SYNCED, (domain_id,))
+    missing = [user_id for user_id, username in cursor.fetchall() if username not in seen_usernames]
+    query = SYNC_DISABLE_USERS if SYNC_DELETE_MODE == "disable" else SYNC_DELETE_USERS
+    deleted = 0
+    for batch in _batches(missing, SYNC_BATCH_SIZE):
+        execute_prepared(cursor, query, (batch,))
+        deleted += cursor.rowcount
+    return deleted
+
+
+def sync_ldap_users_to_supabase(conn_db, conn_ldap, domain_id=None, base_dn='DC=odieproje,DC=local', shards=None):
+    """
+    LDAP kullanıcılarını users tablosuna aktarır.
+
+    Her kullanıcı için içerik özeti hesaplanır; sadece yeni veya özeti değişen satırlar
+    yazılır. Daha önce bu domain'den senkronize edilip LDAP'te artık bulunmayan
+    kullanıcılara SYNC_DELETE_MODE uygulanır.
+
+    shards (varsayılan SYNC_SHARDS) 1'den büyükse dizin parçalara bölünür ve her parça
+    kendi LDAP ve veritabanı bağlantısıyla ayrı bir süreçte yazılır (sync_shards.py);
+    parçalar kendi yazdıklarını commit eder, silme tespiti tüm parçalar bitince yapılır.
+
+    Returns:
+        dict: {"users_seen", "inserted", "updated", "unchanged", "deleted", "conflicts",
+               "rows_changed"}; hata durumunda None
+    """
+    shards = SYNC_SHARDS if shards is None else shards
     try:
         cursor = conn_db.cursor()
 
-        # LDAP'ten user'ları al
-        conn_ldap.search('DC=odieproje,DC=local', '(objectClass=user)', attributes=[
-            'sAMAccountName', 'givenName', 'sn', 'userAccountControl'
-        ])
-
-        for entry in conn_ldap.entries:
-            username = entry.sAMAccountName.value
-
-            # givenName ve sn hem varsa hem boş değilse kullan
-            first_name = entry.givenName.value if 'givenName' in entry and entry.givenName.value else ''
-            last_name = entry.sn.value if 'sn' in entry and entry.sn.value else ''
-
-            user_control = int(entry.userAccountControl.value) if 'userAccountControl' in entry else 512
-            status = 'devre dışı' if user_control == 514 else 'devrede'
-
-            password = 'default123'  # Supabase'e eklemeden önce hashleyebilirsin
-            role_id = 2  # varsayılan: user
-            department_id = None  # departman eşleşmesi yapılmadıysa boş bırak
-
-            insert_query = """
-                INSERT INTO users (username, password, first_name, last_name, role_id, department_id, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (username) DO UPDATE
-                SET first_name = EXCLUDED.first_name,
-                    last_name = EXCLUDED.last_name,
-                    password = EXCLUDED.password,
-                    role_id = EXCLUDED.role_id,
-                    status = EXCLUDED.status
-            """
-            cursor.execute(insert_query, (username, password, first_name, last_name, role_id, department_id, status))
+        if shards > 1 and domain_id is not None:
+            from sync_shards import sync_sharded
+            counts, records = sync_sharded(conn_ldap, domain_id, base_dn, shards)
+        else:
+            ldap_users = dict(iter_ldap_user_records(conn_ldap, base_dn))
+            counts = write_user_diff(cursor, domain_id, ldap_users)
+            records = [(username, record[3], record[4]) for username, record in ldap_users.items()]
+
+        # DN önbelleğini doldur, sonraki kullanıcı işlemleri subtree araması yapmasın
+        if domain_id is not None:
+            cache_ldap_records(domain_id, records)
+
+        # LDAP boş döndüyse (yanlış base DN, yetki sorunu) toplu silme yapılmaz
+        deleted = 0
+        if domain_id is not None and records:
+            deleted = apply_ldap_deletions(cursor, domain_id, {username for username, _, _ in records})
 
         conn_db.commit()
-        print("✅ LDAP kullanıcıları Supabase'deki `users` tablosuna başarıyla senkronize edildi.")
+        rows_changed = counts["inserted"] + counts["updated"] + deleted
+        if rows_changed:
+            response_cache.bump("users", domain_id)
+            # Toplu değişiklik: kullanıcı okuma modeli bir sonraki okumada yeniden yüklenir
+            from user_index import user_index
+            user_index.invalidate()
+        print(f"✅ LDAP senkronizasyonu: {counts['inserted']} eklendi, {counts['updated']} güncellendi, "
+              f"{counts['unchanged']} değişmedi, {deleted} silindi ({SYNC_DELETE_MODE})")
+        return {"users_seen": len(records), **counts, "deleted": deleted, "rows_changed": rows_changed}
     except Exception as e:
         print("❌ Senkronizasyon hatası:", e)
         conn_db.rollback()
+        return None
 
-def get_users_by_department(department_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, username, first_name, last_name, role_id, department_id, status
-        FROM users
-        WHERE department_id = %s
-    """, (department_id,))
-    users = cursor.fetchall()
-    conn.close()
-    return users
-
-def get_users_by_role(role_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, username, first_name, last_name, role_id, department_id, status
-        FROM users
-        WHERE role_id = %s
-    """, (role_id,))
-    users = cursor.fetchall()
-    conn.close()
-    return users
-
-def get_departments_by_domain(domain_id):
+def _index_tuples(rows):
+    return [(r.id, r.username, r.first_name, r.last_name, r.role_id, r.department_id, r.status) for r in rows]
+
+def get_users_by_department(department_id, conn=None):
+    from user_index import user_index
+    if user_index.available(conn):
+        return _index_tuples(user_index.by_department(department_id))
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, username, first_name, last_name, role_id, department_id, status
+            FROM users
+            WHERE department_id = %s
+        """, (department_id,))
+        return cursor.fetchall()
+
+def get_users_by_role(role_id, conn=None):
+    from user_index import user_index
+    if user_index.available(conn):
+        return _index_tuples(user_index.by_role(role_id))
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, username, first_name, last_name, role_id, department_id, status
+            FROM users
+            WHERE role_id = %s
+        """, (role_id,))
+        return cursor.fetchall()
+
+def get_departments_by_domain(domain_id, conn=None):
     """
-    Bir domain'e ait departmanları listeler
+    Bir domain'e ait departmanları kullanıcı sayılarıyla birlikte listeler.
+    Sayılar users trigger'ı ile güncel tutulan kolonlardan okunur (migrations/004).
     
     Args:
         domain_id (int): Domain ID
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
         
     Returns:
-        list: (id, department_name) tuplelarından oluşan liste
+        list: (id, department_name, user_count, active_count, disabled_count) tuplelarından oluşan liste
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return []
-            
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, department_name FROM departments WHERE domain_id = %s ORDER BY department_name",
-            (domain_id,)
-        )
-        departments = cursor.fetchall()
-        conn.close()
-        return departments
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT id, department_name, user_count, active_count, disabled_count
+                FROM departments WHERE domain_id = %s ORDER BY department_name
+                """,
+                (domain_id,)
+            )
+            return cursor.fetchall()
     except Exception as e:
         print(f"❌ Departman listeleme hatası: {e}")
         return []
 
-def add_department(domain_id, department_name, created_by):
+# Departman adı domain içinde büyük/küçük harf duyarsız benzersizdir (migrations/005)
+DEPARTMENT_NAME_UNIQUE_INDEX = "uq_departments_domain_lower_name"
+_DOMAIN_ACCESS_DENIED = "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."
+
+def add_department(domain_id, department_name, created_by, owner=None, conn=None):
     """
-    Yeni bir departman ekler
+    Yeni bir departman ekler. Sahiplik kontrolü, benzersizlik kontrolü ve ekleme tek sorguda yapılır.
     
     Args:
         domain_id (int): Domain ID
         department_name (str): Departman adı
         created_by (str): Oluşturan kullanıcının UUID'si
+        owner (str, optional): Verilirse domain'in bu kullanıcıya ait olduğu kontrol edilir
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
         
     Returns:
         tuple: (bool, str, int) - İşlem başarılı mı, mesaj, departman ID'si (başarılıysa)
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False, "Veritabanı bağlantısı kurulamadı", None
-            
-        cursor = conn.cursor()
-        
-        # Aynı domain'de aynı isimle departman var mı kontrol et
-        cursor.execute(
-            "SELECT COUNT(*) FROM departments WHERE domain_id = %s AND LOWER(department_name) = LOWER(%s)",
-            (domain_id, department_name)
-        )
-        count = cursor.fetchone()[0]
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                WITH owned AS (
+                    SELECT id FROM domains
+                    WHERE id = %(domain_id)s AND (%(owner)s IS NULL OR created_by = %(owner)s)
+                ), inserted AS (
+                    INSERT INTO departments (department_name, domain_id, created_by)
+                    SELECT %(name)s, id, %(created_by)s FROM owned
+                    ON CONFLICT (domain_id, (LOWER(department_name))) DO NOTHING
+                    RETURNING id
+                )
+                SELECT EXISTS (SELECT 1 FROM owned), (SELECT id FROM inserted)
+                """,
+                {"domain_id": domain_id, "owner": owner, "name": department_name, "created_by": created_by}
+            )
+            domain_ok, department_id = cursor.fetchone()
         
-        if count > 0:
-            conn.close()
+        if not domain_ok:
+            return False, _DOMAIN_ACCESS_DENIED, None
+        if department_id is None:
             return False, f"❌ '{department_name}' departmanı bu domain'de zaten mevcut", None
-        
-        # Yeni departman ekle
-        cursor.execute(
-            """
-            INSERT INTO departments (department_name, domain_id, created_by) 
-            VALUES (%s, %s, %s) RETURNING id
-            """,
-            (department_name, domain_id, created_by)
-        )
-        department_id = cursor.fetchone()[0]
-        conn.commit()
-        conn.close()
-        
         return True, f"✅ '{department_name}' departmanı başarıyla eklendi", department_id
     except Exception as e:
         print(f"❌ Departman ekleme hatası: {e}")
         return False, f"❌ Departman eklenirken hata oluştu: {e}", None
 
-def update_department(department_id, department_name, domain_id=None):
+def update_department(department_id, department_name, domain_id=None, owner=None, conn=None):
     """
-    Departman bilgilerini günceller
+    Departman bilgilerini günceller. Sahiplik, domain ve isim çakışması kontrolleri
+    güncellemeyle aynı sorguda yapılır.
     
     Args:
         department_id (int): Departman ID
         department_name (str): Yeni departman adı
         domain_id (int, optional): Domain ID kontrolü için
+        owner (str, optional): Verilirse domain'in bu kullanıcıya ait olduğu kontrol edilir
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
         
     Returns:
         tuple: (bool, str) - İşlem başarılı mı, mesaj
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False, "Veritabanı bağlantısı kurulamadı"
-            
-        cursor = conn.cursor()
-        
-        # Departman var mı ve domain'e ait mi kontrol et
-        if domain_id:
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                "SELECT COUNT(*) FROM departments WHERE id = %s AND domain_id = %s",
-                (department_id, domain_id)
+                """
+                WITH owned AS (
+                    SELECT id FROM domains
+                    WHERE id = %(domain_id)s AND (%(owner)s IS NULL OR created_by = %(owner)s)
+                ), target AS (
+                    SELECT id, domain_id FROM departments
+                    WHERE id = %(department_id)s
+                      AND (%(domain_id)s IS NULL OR domain_id IN (SELECT id FROM owned))
+                ), conflict AS (
+                    SELECT 1 FROM departments d JOIN target t ON d.domain_id = t.domain_id
+                    WHERE LOWER(d.department_name) = LOWER(%(name)s) AND d.id <> t.id
+                ), updated AS (
+                    UPDATE departments SET department_name = %(name)s
+                    WHERE id IN (SELECT id FROM target) AND NOT EXISTS (SELECT 1 FROM conflict)
+                    RETURNING id
+                )
+                SELECT %(domain_id)s IS NULL OR EXISTS (SELECT 1 FROM owned),
+                       EXISTS (SELECT 1 FROM target),
+                       EXISTS (SELECT 1 FROM updated)
+                """,
+                {"domain_id": domain_id, "owner": owner, "department_id": department_id, "name": department_name}
             )
-            count = cursor.fetchone()[0]
-            
-            if count == 0:
-                conn.close()
-                return False, "❌ Bu departman bulunamadı veya bu domain'e ait değil"
-        
-        # Aynı isimli başka departman var mı kontrol et (aynı id hariç)
-        cursor.execute(
-            """
-            SELECT COUNT(*) FROM departments 
-            WHERE id != %s AND domain_id = (SELECT domain_id FROM departments WHERE id = %s)
-            AND LOWER(department_name) = LOWER(%s)
-            """,
-            (department_id, department_id, department_name)
-        )
-        count = cursor.fetchone()[0]
+            domain_ok, found, updated = cursor.fetchone()
         
-        if count > 0:
-            conn.close()
+        if not domain_ok:
+            return False, _DOMAIN_ACCESS_DENIED
+        if not found:
+            return False, "❌ Bu departman bulunamadı veya bu domain'e ait değil"
+        if not updated:
             return False, f"❌ '{department_name}' isimli başka bir departman zaten mevcut"
-        
-        # Departmanı güncelle
-        cursor.execute(
-            "UPDATE departments SET department_name = %s WHERE id = %s",
-            (department_name, department_id)
-        )
-        conn.commit()
-        conn.close()
-        
         return True, f"✅ Departman başarıyla güncellendi: '{department_name}'"
+    except psycopg2.IntegrityError as e:
+        # Eşzamanlı aynı isimli güncelleme: kontrolü geçse de benzersiz indeks engeller
+        if DEPARTMENT_NAME_UNIQUE_INDEX in str(e):
+            return False, f"❌ '{department_name}' isimli başka bir departman zaten mevcut"
+        print(f"❌ Departman güncelleme hatası: {e}")
+        return False, f"❌ Departman güncellenirken hata oluştu: {e}"
     except Exception as e:
         print(f"❌ Departman güncelleme hatası: {e}")
         return False, f"❌ Departman güncellenirken hata oluştu: {e}"
 
-def delete_department(department_id, domain_id=None):
+def delete_department(department_id, domain_id=None, owner=None, conn=None):
     """
-    Departmanı siler ve bağlı kullanıcıların departman bilgisini null yapar
+    Departmanı siler ve bağlı kullanıcıların departman bilgisini null yapar.
+    Kontroller, kullanıcıların ayrılması ve silme tek sorguda yapılır.
     
     Args:
         department_id (int): Departman ID
         domain_id (int, optional): Domain ID kontrolü için
+        owner (str, optional): Verilirse domain'in bu kullanıcıya ait olduğu kontrol edilir
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
         
     Returns:
         tuple: (bool, str) - İşlem başarılı mı, mesaj
     """
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False, "Veritabanı bağlantısı kurulamadı"
-            
-        cursor = conn.cursor()
-        
-        # Departman var mı ve domain'e ait mi kontrol et
-        if domain_id:
-            cursor.execute(
-                "SELECT COUNT(*), (SELECT department_name FROM departments WHERE id = %s) FROM departments WHERE id = %s AND domain_id = %s",
-                (department_id, department_id, domain_id)
-            )
-            result = cursor.fetchone()
-            
-            if result[0] == 0:
-                conn.close()
-                return False, "❌ Bu departman bulunamadı veya bu domain'e ait değil"
-                
-            department_name = result[1]
-        else:
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
             cursor.execute(
-                "SELECT department_name FROM departments WHERE id = %s",
-                (department_id,)
+                """
+                WITH owned AS (
+                    SELECT id FROM domains
+                    WHERE id = %(domain_id)s AND (%(owner)s IS NULL OR created_by = %(owner)s)
+                ), target AS (
+                    SELECT id FROM departments
+                    WHERE id = %(department_id)s
+                      AND (%(domain_id)s IS NULL OR domain_id IN (SELECT id FROM owned))
+                ), detached AS (
+                    UPDATE users SET department_id = NULL
+                    WHERE department_id IN (SELECT id FROM target)
+                    RETURNING id
+                ), deleted AS (
+                    DELETE FROM departments WHERE id IN (SELECT id FROM target)
+                    RETURNING department_name
+                )
+                SELECT %(domain_id)s IS NULL OR EXISTS (SELECT 1 FROM owned),
+                       (SELECT department_name FROM deleted),
+                       (SELECT COUNT(*) FROM detached)
+                """,
+                {"domain_id": domain_id, "owner": owner, "department_id": department_id}
             )
-            result = cursor.fetchone()
-            
-            if not result:
-                conn.close()
-                return False, "❌ Bu departman bulunamadı"
-                
-            department_name = result[0]
-        
-        # Önce bu departmana bağlı kullanıcıların departman_id'sini null yap
-        cursor.execute(
-            "UPDATE users SET department_id = NULL WHERE department_id = %s",
-            (department_id,)
-        )
+            domain_ok, department_name, detached_count = cursor.fetchone()
+            if department_name is not None:
+                from user_index import user_index
+                after_commit(conn, user_index.clear_department, department_id)
         
-        # Sonra departmanı sil
-        cursor.execute(
-            "DELETE FROM departments WHERE id = %s",
-            (department_id,)
-        )
-        
-        conn.commit()
-        conn.close()
-        
-        return True, f"✅ '{department_name}' departmanı başarıyla silindi"
+        if not domain_ok:
+            return False, _DOMAIN_ACCESS_DENIED
+        if department_name is None:
+            if domain_id:
+                return False, "❌ Bu departman bulunamadı veya bu domain'e ait değil"
+            return False, "❌ Bu departman bulunamadı"
+        return True, f"✅ '{department_name}' departmanı başarıyla silindi ({detached_count} kullanıcının departmanı kaldırıldı)"
     except Exception as e:
         print(f"❌ Departman silme hatası: {e}")
         return False, f"❌ Departman silinirken hata oluştu: {e}"
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Request, Depends
 from pydantic import BaseModel, validator, Field, IPvAnyAddress
-from db_ops import get_db_connection
+from db_ops import get_db, db_session, after_commit
 from ldap3 import Server, Connection
 from enum import Enum
 from typing import Optional
 import re
 import psycopg2
 from log_system import APILogger
+from ldap_cache import dn_cache
+from response_cache import response_cache, cached_json_response
+from fast_json import encode_payload
 
 router = APIRouter()
 
@@ -57,7 +60,7 @@ class DomainUpdateRequest(BaseModel):
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from enum import Enum
-from db_ops import get_db_connection
+from db_ops import get_db, db_session, after_commit
 from ldap3 import Server, Connection
 from typing import Optional
 
@@ -82,10 +85,10 @@ class DomainCreateRequest(BaseModel):
     domain_type: DomainType = DomainType.MS
     created_by: str
 @router.post("/add_domain")
-def add_domain(domain: DomainCreateRequest):
+def add_domain(domain: DomainCreateRequest, db=Depends(get_db)):
     try:
         # 🔍 IP benzersizlik kontrolü (uygulama seviyesi)
-        if check_user_ip_exists(domain.domain_ip, domain.created_by):
+        if check_user_ip_exists(domain.domain_ip, domain.created_by, conn=db):
             return {
                 "success": False,
                 "message": f"❌ Bu IP adresi ({domain.domain_ip}) ile zaten bir domain'iniz bulunmaktadır. Aynı kullanıcı aynı IP ile birden fazla domain oluşturamaz."
@@ -105,8 +108,7 @@ def add_domain(domain: DomainCreateRequest):
         conn.unbind()
 
         # ✅ Veritabanına kaydet
-        conn_db = get_db_connection()
-        cursor = conn_db.cursor()
+        cursor = db.cursor()
         cursor.execute("""
             INSERT INTO domains (domain_name, domain_ip, domain_port, domain_component, ldap_user, ldap_password, domain_type, status, created_by)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -121,8 +123,7 @@ def add_domain(domain: DomainCreateRequest):
             "devrede",
             domain.created_by
         ))
-        conn_db.commit()
-        conn_db.close()
+        after_commit(db, response_cache.bump, "domains")
 
         response = {"success": True, "message": "✅ Domain başarıyla eklendi"}
         
@@ -134,11 +135,13 @@ def add_domain(domain: DomainCreateRequest):
             user_id=domain.created_by,
             request_data=domain.dict(),
             response_data=response,
-            success=True
+            success=True,
+            conn=db
         )
 
         return response
     except psycopg2.IntegrityError as e:
+        db.rollback()
         # 🛡️ Veritabanı constraint violation yakalandı
         if "unique_ip_per_user" in str(e):
             error_response = {
@@ -158,11 +161,13 @@ def add_domain(domain: DomainCreateRequest):
             request_data=domain.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Hata: {e}")
         error_response = {"success": False, "message": f"❌ Hata: {e}"}
         
@@ -175,7 +180,8 @@ def add_domain(domain: DomainCreateRequest):
             request_data=domain.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
@@ -199,10 +205,10 @@ def add_domain(domain: DomainCreateRequest):
            - Sadece IP değiştirmek için: {"domain_ip": "192.168.1.100"}
            - Sadece isim değiştirmek için: {"domain_name": "yeni-domain"}
            """)
-def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional[str] = Query(None)):
+def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional[str] = Query(None),
+                  db=Depends(get_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         # Önce domainin kullanıcıya ait olup olmadığını kontrol et
         if user_id:
@@ -219,8 +225,7 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
             
             if current_ip != domain.domain_ip:
                 # Yeni IP ile kullanıcının başka domain'i var mı kontrol et
-                if check_user_ip_exists(domain.domain_ip, user_id):
-                    conn.close()
+                if check_user_ip_exists(domain.domain_ip, user_id, conn=db):
                     return {
                         "success": False,
                         "message": f"❌ Bu IP adresi ({domain.domain_ip}) ile zaten bir domain'iniz bulunmaktadır. Aynı kullanıcı aynı IP ile birden fazla domain oluşturamaz."
@@ -273,7 +278,10 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
         params.append(domain_id)
         
         cursor.execute(query, params)
-        conn.commit()
+        
+        # Domain bilgileri değişti, eski DN kayıtları geçersiz olabilir
+        dn_cache.invalidate_domain(domain_id)
+        after_commit(db, response_cache.bump, "domains")
         
         # Güncellenen domain bilgilerini al
         cursor.execute("""
@@ -281,7 +289,6 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
             FROM domains WHERE id = %s
         """, (domain_id,))
         updated_domain = cursor.fetchone()
-        conn.close()
         
         if updated_domain:
             response = {
@@ -307,7 +314,8 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
                 user_id=user_id,
                 request_data=domain.dict(),
                 response_data=response,
-                success=True
+                success=True,
+                conn=db
             )
             
             return response
@@ -323,11 +331,13 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
                 request_data=domain.dict(),
                 response_data=error_response,
                 success=False,
-                error_message="Domain güncellenemedi"
+                error_message="Domain güncellenemedi",
+                conn=db
             )
             
             return error_response
     except psycopg2.IntegrityError as e:
+        db.rollback()
         # 🛡️ Veritabanı constraint violation yakalandı
         if "unique_ip_per_user" in str(e):
             error_response = {
@@ -347,11 +357,13 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
             request_data=domain.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Güncelleme hatası: {e}")
         error_response = {"success": False, "message": f"❌ Güncelleme hatası: {e}"}
         
@@ -364,31 +376,34 @@ def update_domain(domain_id: int, domain: DomainUpdateRequest, user_id: Optional
             request_data=domain.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 📌 Domainleri listeleme
 @router.get("/list_domains")
-def list_domains(user_id: Optional[str] = Query(None)):
+def list_domains(request: Request, user_id: Optional[str] = Query(None)):
+    return cached_json_response(request, [("domains", None)], lambda: _list_domains(user_id))
+
+def _list_domains(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if user_id:
-            # Kullanıcıya ait domainleri filtrele
-            cursor.execute("""
-                SELECT id, domain_name, domain_type, status, domain_ip, domain_component, ldap_user, ldap_password
-                FROM domains 
-                WHERE created_by = %s
-            """, (user_id,))
-        else:
-            # Admin için tüm domainleri listele
-            cursor.execute("SELECT id, domain_name, domain_type, status, domain_ip, domain_component, ldap_user, ldap_password FROM domains")
+        with db_session() as conn:
+            cursor = conn.cursor()
             
-        domains = cursor.fetchall()
-        conn.close()
+            if user_id:
+                # Kullanıcıya ait domainleri filtrele
+                cursor.execute("""
+                    SELECT id, domain_name, domain_type, status, domain_ip, domain_component, ldap_user, ldap_password
+                    FROM domains 
+                    WHERE created_by = %s
+                """, (user_id,))
+            else:
+                # Admin için tüm domainleri listele
+                cursor.execute("SELECT id, domain_name, domain_type, status, domain_ip, domain_component, ldap_user, ldap_password FROM domains")
+                
+            domains = cursor.fetchall()
 
         domain_list = [
             {
@@ -417,10 +432,9 @@ def list_domains(user_id: Optional[str] = Query(None)):
 
 # 📌 Domain silme
 @router.delete("/delete_domain/{domain_id}")
-def delete_domain(domain_id: int, user_id: Optional[str] = Query(None)):
+def delete_domain(domain_id: int, user_id: Optional[str] = Query(None), db=Depends(get_db)):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        cursor = db.cursor()
         
         # Önce domainin kullanıcıya ait olup olmadığını kontrol et
         if user_id:
@@ -438,15 +452,18 @@ def delete_domain(domain_id: int, user_id: Optional[str] = Query(None)):
                     domain_id=domain_id,
                     response_data=error_response,
                     success=False,
-                    error_message="Domain erişim yetkisi yok"
+                    error_message="Domain erişim yetkisi yok",
+                    conn=db
                 )
                 
                 return error_response
         
         # Domain kullanıcıya aitse veya admin ise silme işlemi yap
         cursor.execute("DELETE FROM domains WHERE id = %s", (domain_id,))
-        conn.commit()
-        conn.close()
+        dn_cache.invalidate_domain(domain_id)
+        after_commit(db, response_cache.bump, "domains")
+        after_commit(db, response_cache.bump, "departments", domain_id)
+        after_commit(db, response_cache.bump, "users", domain_id)
         
         response = {"success": True, "message": "✅ Domain silindi"}
         
@@ -458,12 +475,14 @@ def delete_domain(domain_id: int, user_id: Optional[str] = Query(None)):
             user_id=user_id,
             domain_id=domain_id,
             response_data=response,
-            success=True
+            success=True,
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "message": f"❌ Silme hatası: {e}"}
         
         # Hata log'u kaydet
@@ -475,55 +494,76 @@ def delete_domain(domain_id: int, user_id: Optional[str] = Query(None)):
             domain_id=domain_id,
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
-# 📌 Domain'deki kullanıcıları listeleme
+# 📌 Domain'deki kullanıcıları listeleme (cursor sayfalama, sıralama, alan seçimi, arama)
 @router.get("/list_users_by_domain/{domain_id}")
-def list_users_by_domain(domain_id: int, status: Optional[UserStatus] = None):
+def list_users_by_domain(
+    request: Request,
+    domain_id: int,
+    status: Optional[UserStatus] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Sayfa boyutu (boş ise tüm kullanıcılar)"),
+    cursor: Optional[str] = Query(None, description="Önceki sayfanın next_cursor değeri"),
+    sort: str = Query("username", description="Sıralama: username, first_name, last_name, status, id"),
+    order: str = Query("asc", description="Sıralama yönü: asc veya desc"),
+    fields: Optional[str] = Query(None, description="Virgülle ayrılmış alan listesi (ör. username,status)"),
+    search: Optional[str] = Query(None, description="Kullanıcı adı, ad veya soyad içinde arama"),
+    format: Optional[str] = Query(None, description="Hızlı serileştirme: fast (nesne) veya compact (kolon + satır dizisi)")
+):
+    return cached_json_response(
+        request,
+        [("users", domain_id)],
+        lambda: _list_users_by_domain(domain_id, status, limit, cursor, sort, order, fields, search, format)
+    )
+
+def _list_users_by_domain(domain_id, status, limit, cursor, sort, order, fields, search, format=None):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            # Belirli bir duruma sahip kullanıcıları getir
-            cursor.execute("""
-                SELECT id, username, first_name, password, last_name, role_id, department_id, status
-                FROM users 
-                WHERE domain_id = %s AND status = %s
-                ORDER BY username
-            """, (domain_id, status.value))
-        else:
-            # Tüm kullanıcıları getir
-            cursor.execute("""
-                SELECT id, username, first_name, password, last_name, role_id, department_id, status
-                FROM users 
-                WHERE domain_id = %s
-                ORDER BY username
-            """, (domain_id,))
-            
-        users = cursor.fetchall()
-        conn.close()
-        
-        user_list = [
-            {
-                "id": u[0],
-                "username": u[1],
-                "first_name": u[2],
-                "password": u[3],
-                "last_name": u[4],
-                "role_id": u[5],
-                "department_id": u[6],
-                "status": u[7]
-            }
-            for u in users
-        ]
-        return {"users": user_list}
+        from user_ops import list_users_page
+
+        field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        page = list_users_page(
+            domain_id,
+            status=status,
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            order=order,
+            fields=field_list,
+            search=search.strip() if search else None,
+            as_rows=format in ("fast", "compact")
+        )
+        if format in ("fast", "compact"):
+            # Satır başına dict oluşturmadan tuple'lardan doğrudan JSON üret
+            return encode_payload(
+                {"next_cursor": page["next_cursor"], "has_more": page["has_more"]},
+                "users", page["columns"], page["rows"], compact=(format == "compact")
+            )
+        return page
+    except ValueError as e:
+        return {"success": False, "message": f"❌ {e}"}
     except Exception as e:
         return {"success": False, "message": f"❌ Kullanıcı listeleme hatası: {e}"}
 
+# 📌 Tek kullanıcı getirme (düzenleme formu)
+@router.get("/get_user/{domain_id}/{username}")
+def get_user_endpoint(request: Request, domain_id: int, username: str):
+    return cached_json_response(request, [("users", domain_id)], lambda: _get_user(domain_id, username))
+
+def _get_user(domain_id, username):
+    try:
+        from user_ops import get_user
+
+        user = get_user(domain_id, username)
+        if user is None:
+            return {"success": False, "message": "❌ Kullanıcı bulunamadı"}
+        return {"success": True, "user": user}
+    except Exception as e:
+        return {"success": False, "message": f"❌ Kullanıcı getirme hatası: {e}"}
+
 # 📌 Kullanıcı güncelleme modeli
 class UserUpdateRequest(BaseModel):
     first_name: Optional[str] = None
@@ -534,49 +574,26 @@ class UserUpdateRequest(BaseModel):
 
 # 📌 Kullanıcı güncelleme
 @router.put("/update_user/{domain_id}/{username}")
-def update_user_endpoint(domain_id: int, username: str, user_data: UserUpdateRequest, user_id: Optional[str] = Query(None)):
+def update_user_endpoint(domain_id: int, username: str, user_data: UserUpdateRequest, user_id: Optional[str] = Query(None),
+                         db=Depends(get_db)):
     try:
         from user_ops import update_user
         
-        success, message = update_user(
+        success, message, user = update_user(
             domain_id=domain_id,
             username=username,
             first_name=user_data.first_name,
             last_name=user_data.last_name,
             password=user_data.password,
             role_id=user_data.role_id,
-            department_id=user_data.department_id
+            department_id=user_data.department_id,
+            conn=db
         )
         
         if success:
-            # Güncellenen kullanıcı bilgilerini getir
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, username, first_name, last_name, role_id, department_id, status
-                FROM users 
-                WHERE username = %s AND domain_id = %s
-            """, (username, domain_id))
-            
-            user = cursor.fetchone()
-            conn.close()
-            
-            if user:
-                response = {
-                    "success": True,
-                    "message": message,
-                    "user": {
-                        "id": user[0],
-                        "username": user[1],
-                        "first_name": user[2],
-                        "last_name": user[3],
-                        "role_id": user[4],
-                        "department_id": user[5],
-                        "status": user[6]
-                    }
-                }
-            else:
-                response = {"success": True, "message": message}
+            after_commit(db, response_cache.bump, "users", domain_id)
+            # Güncel kullanıcı UPDATE ... RETURNING ile geldi; ayrıca okunmaz
+            response = {"success": True, "message": message, "user": user}
             
             # Log kaydet
             APILogger.log_operation(
@@ -587,7 +604,8 @@ def update_user_endpoint(domain_id: int, username: str, user_data: UserUpdateReq
                 domain_id=domain_id,
                 request_data=user_data.dict(),
                 response_data=response,
-                success=True
+                success=True,
+                conn=db
             )
             
             return response
@@ -604,11 +622,13 @@ def update_user_endpoint(domain_id: int, username: str, user_data: UserUpdateReq
                 request_data=user_data.dict(),
                 response_data=error_response,
                 success=False,
-                error_message=message
+                error_message=message,
+                conn=db
             )
             
             return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Güncelleme hatası: {e}")
         error_response = {"success": False, "message": f"❌ Güncelleme hatası: {e}"}
         
@@ -622,20 +642,23 @@ def update_user_endpoint(domain_id: int, username: str, user_data: UserUpdateReq
             request_data=user_data.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 📌 Departmanları listeleme
 @router.get("/list_departments")
-def list_departments():
+def list_departments(request: Request):
+    return cached_json_response(request, [("departments", None)], _list_departments)
+
+def _list_departments():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, department_name FROM departments ORDER BY department_name")
-        departments = cursor.fetchall()
-        conn.close()
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, department_name FROM departments ORDER BY department_name")
+            departments = cursor.fetchall()
         
         department_list = [
             {
@@ -662,31 +685,41 @@ class DepartmentUpdateRequest(BaseModel):
 @router.get("/list_departments_by_domain/{domain_id}", 
             summary="Domain'e Ait Departmanları Listele", 
             description="Belirli bir domain'e ait departmanları listeler")
-def list_departments_by_domain(domain_id: int, user_id: Optional[str] = Query(None)):
+def list_departments_by_domain(request: Request, domain_id: int, user_id: Optional[str] = Query(None)):
+    return cached_json_response(
+        request,
+        # Kullanıcı sayıları da döndüğü için kullanıcı değişiklikleri de önbelleği geçersiz kılar
+        [("domains", None), ("departments", domain_id), ("users", domain_id)],
+        lambda: _list_departments_by_domain(domain_id, user_id)
+    )
+
+def _list_departments_by_domain(domain_id, user_id):
     try:
-        # Kullanıcının bu domain'e erişim yetkisi var mı kontrol et
-        if user_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT COUNT(*) FROM domains WHERE id = %s AND created_by = %s",
-                (domain_id, user_id)
-            )
-            count = cursor.fetchone()[0]
-            conn.close()
-            
-            if count == 0:
-                return {"success": False, "message": "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."}
-        
-        # Departmanları getir
         from db_ops import get_departments_by_domain
         
-        departments = get_departments_by_domain(domain_id)
+        with db_session() as conn:
+            # Kullanıcının bu domain'e erişim yetkisi var mı kontrol et
+            if user_id:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT COUNT(*) FROM domains WHERE id = %s AND created_by = %s",
+                    (domain_id, user_id)
+                )
+                count = cursor.fetchone()[0]
+                
+                if count == 0:
+                    return {"success": False, "message": "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."}
+            
+            # Departmanları getir
+            departments = get_departments_by_domain(domain_id, conn=conn)
         
         department_list = [
             {
                 "id": d[0],
-                "name": d[1]
+                "name": d[1],
+                "user_count": d[2],
+                "active_count": d[3],
+                "disabled_count": d[4]
             }
             for d in departments
         ]
@@ -700,29 +733,19 @@ def list_departments_by_domain(domain_id: int, user_id: Optional[str] = Query(No
 @router.post("/add_department", 
              summary="Yeni Departman Ekle",
              description="Belirli bir domain'e yeni departman ekler")
-def add_department_endpoint(department: DepartmentCreateRequest):
+def add_department_endpoint(department: DepartmentCreateRequest, db=Depends(get_db)):
     try:
-        # Domain kontrolü
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM domains WHERE id = %s AND created_by = %s",
-            (department.domain_id, department.created_by)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
-        
-        if count == 0:
-            return {"success": False, "message": "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."}
-        
-        # Departman ekleme
+        # Departman ekleme (domain sahipliği ve isim kontrolü aynı sorguda)
         from db_ops import add_department
         
         success, message, department_id = add_department(
             domain_id=department.domain_id,
             department_name=department.department_name,
-            created_by=department.created_by
+            created_by=department.created_by,
+            owner=department.created_by,
+            conn=db
         )
+        after_commit(db, response_cache.bump, "departments", department.domain_id)
         
         if success:
             response = {
@@ -742,7 +765,8 @@ def add_department_endpoint(department: DepartmentCreateRequest):
                 user_id=department.created_by,
                 request_data=department.dict(),
                 response_data=response,
-                success=True
+                success=True,
+                conn=db
             )
             
             return response
@@ -757,11 +781,13 @@ def add_department_endpoint(department: DepartmentCreateRequest):
                 request_data=department.dict(),
                 response_data=error_response,
                 success=False,
-                error_message=message
+                error_message=message,
+                conn=db
             )
             
             return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Departman ekleme hatası: {e}")
         error_response = {"success": False, "message": f"❌ Departman ekleme hatası: {e}"}
         
@@ -773,7 +799,8 @@ def add_department_endpoint(department: DepartmentCreateRequest):
             request_data=department.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
@@ -783,30 +810,19 @@ def add_department_endpoint(department: DepartmentCreateRequest):
             summary="Departman Güncelle", 
             description="Belirli bir departmanın bilgilerini günceller")
 def update_department_endpoint(domain_id: int, department_id: int, department: DepartmentUpdateRequest, 
-                              user_id: Optional[str] = Query(None)):
+                              user_id: Optional[str] = Query(None), db=Depends(get_db)):
     try:
-        # Kullanıcının bu domain'e erişim yetkisi var mı kontrol et
-        if user_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT COUNT(*) FROM domains WHERE id = %s AND created_by = %s",
-                (domain_id, user_id)
-            )
-            count = cursor.fetchone()[0]
-            conn.close()
-            
-            if count == 0:
-                return {"success": False, "message": "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."}
-        
-        # Departman güncelleme
+        # Departman güncelleme (user_id verilmişse domain sahipliği aynı sorguda kontrol edilir)
         from db_ops import update_department
         
         success, message = update_department(
             department_id=department_id,
             department_name=department.department_name,
-            domain_id=domain_id
+            domain_id=domain_id,
+            owner=user_id,
+            conn=db
         )
+        after_commit(db, response_cache.bump, "departments", domain_id)
         
         if success:
             response = {
@@ -826,7 +842,8 @@ def update_department_endpoint(domain_id: int, department_id: int, department: D
                 user_id=user_id,
                 request_data=department.dict(),
                 response_data=response,
-                success=True
+                success=True,
+                conn=db
             )
             
             return response
@@ -841,11 +858,13 @@ def update_department_endpoint(domain_id: int, department_id: int, department: D
                 request_data=department.dict(),
                 response_data=error_response,
                 success=False,
-                error_message=message
+                error_message=message,
+                conn=db
             )
             
             return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Departman güncelleme hatası: {e}")
         error_response = {"success": False, "message": f"❌ Departman güncelleme hatası: {e}"}
         
@@ -857,7 +876,8 @@ def update_department_endpoint(domain_id: int, department_id: int, department: D
             request_data=department.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
@@ -867,29 +887,20 @@ def update_department_endpoint(domain_id: int, department_id: int, department: D
               summary="Departman Sil", 
               description="Belirli bir departmanı siler ve bağlı kullanıcıların departman bilgisini null yapar")
 def delete_department_endpoint(domain_id: int, department_id: int, 
-                             user_id: Optional[str] = Query(None)):
+                             user_id: Optional[str] = Query(None), db=Depends(get_db)):
     try:
-        # Kullanıcının bu domain'e erişim yetkisi var mı kontrol et
-        if user_id:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT COUNT(*) FROM domains WHERE id = %s AND created_by = %s",
-                (domain_id, user_id)
-            )
-            count = cursor.fetchone()[0]
-            conn.close()
-            
-            if count == 0:
-                return {"success": False, "message": "❌ Bu domain'e erişim yetkiniz yok veya domain bulunamadı."}
-        
-        # Departman silme
+        # Departman silme (user_id verilmişse domain sahipliği aynı sorguda kontrol edilir)
         from db_ops import delete_department
         
         success, message = delete_department(
             department_id=department_id,
-            domain_id=domain_id
+            domain_id=domain_id,
+            owner=user_id,
+            conn=db
         )
+        # Silinen departmanın kullanıcıları da güncellenir
+        after_commit(db, response_cache.bump, "departments", domain_id)
+        after_commit(db, response_cache.bump, "users", domain_id)
         
         if success:
             response = {"success": True, "message": message}
@@ -901,7 +912,8 @@ def delete_department_endpoint(domain_id: int, department_id: int,
                 user_id=user_id,
                 request_data={"domain_id": domain_id, "department_id": department_id},
                 response_data=response,
-                success=True
+                success=True,
+                conn=db
             )
             
             return response
@@ -916,11 +928,13 @@ def delete_department_endpoint(domain_id: int, department_id: int,
                 request_data={"domain_id": domain_id, "department_id": department_id},
                 response_data=error_response,
                 success=False,
-                error_message=message
+                error_message=message,
+                conn=db
             )
             
             return error_response
     except Exception as e:
+        db.rollback()
         print(f"❌ Departman silme hatası: {e}")
         error_response = {"success": False, "message": f"❌ Departman silme hatası: {e}"}
         
@@ -932,32 +946,33 @@ def delete_department_endpoint(domain_id: int, department_id: int,
             request_data={"domain_id": domain_id, "department_id": department_id},
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 📌 IP benzersizlik kontrol fonksiyonu
-def check_user_ip_exists(domain_ip: str, created_by: str):
+def check_user_ip_exists(domain_ip: str, created_by: str, conn=None):
     """
     Belirli bir kullanıcının aynı IP ile domain'i olup olmadığını kontrol eder
     
     Args:
         domain_ip (str): Kontrol edilecek IP adresi
         created_by (str): Kullanıcı UUID'si
+        conn: Mevcut istek bağlantısı (verilmezse havuzdan alınır)
     
     Returns:
         bool: Aynı kullanıcının bu IP ile domain'i varsa True, yoksa False
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT COUNT(*) FROM domains WHERE domain_ip = %s AND created_by = %s",
-            (domain_ip, created_by)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
+        with db_session(conn) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM domains WHERE domain_ip = %s AND created_by = %s",
+                (domain_ip, created_by)
+            )
+            count = cursor.fetchone()[0]
         return count > 0
     except Exception as e:
         print(f"❌ IP kontrol hatası: {e}")
@@ -0,0 +1,122 @@
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # orjson opsiyoneldir, yoksa stdlib json kullanılır
+    orjson = None
+    HAS_ORJSON = False
+
+# FAST_JSON=1 ile tüm endpoint'ler FastJSONResponse kullanır (opt-in)
+FAST_JSON_ENABLED = os.getenv("FAST_JSON", "0") in ("1", "true", "True")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return str(value)
+
+
+def dumps(obj):
+    """
+    Nesneyi JSON byte dizisine çevirir (orjson varsa onu kullanır)
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """jsonable_encoder + stdlib json yerine doğrudan dumps() ile serileştiren yanıt sınıfı"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _encode_value(value, raw):
+    if raw:
+        # Veritabanından text olarak gelen JSON/JSONB değeri olduğu gibi gömülür
+        if value is None:
+            return b"null"
+        return value.encode("utf-8") if isinstance(value, str) else value
+    return dumps(value)
+
+
+def encode_rows(columns, rows, raw_json_columns=(), compact=False):
+    """
+    Veritabanı satırlarını (tuple) JSON dizisine çevirir
+
+    Args:
+        columns (list): Kolon adları (satırdaki sırayla)
+        rows (list): fetchall() sonucu tuple listesi
+        raw_json_columns (iterable): Değeri hazır JSON metni olan kolonlar (ör. jsonb::text)
+        compact (bool): True ise [[...], ...] biçiminde, False ise [{...}, ...] biçiminde üretir
+
+    Returns:
+        bytes: JSON dizisi
+    """
+    raw_indexes = {columns.index(c) for c in raw_json_columns}
+
+    if not raw_indexes:
+        # compact biçimde tuple listesi tek çağrıda serileştirilir; nesne biçiminde
+        # dict(zip()) değer başına dumps() çağırmaktan belirgin şekilde hızlıdır
+        if compact:
+            return dumps(rows)
+        return dumps([dict(zip(columns, row)) for row in rows])
+
+    if HAS_ORJSON and hasattr(orjson, "Fragment"):
+        # orjson >= 3.9: hazır JSON metni Fragment ile parse edilmeden gömülür
+        def convert(row):
+            return [orjson.Fragment(v) if i in raw_indexes and v is not None else v
+                    for i, v in enumerate(row)]
+        if compact:
+            return dumps([convert(row) for row in rows])
+        return dumps([dict(zip(columns, convert(row))) for row in rows])
+
+    raw_flags = [i in raw_indexes for i in range(len(columns))]
+    if compact:
+        encoded = [
+            b"[" + b",".join(_encode_value(v, raw_flags[i]) for i, v in enumerate(row)) + b"]"
+            for row in rows
+        ]
+    else:
+        key_prefixes = [dumps(c) + b":" for c in columns]
+        encoded = [
+            b"{" + b",".join(key_prefixes[i] + _encode_value(v, raw_flags[i]) for i, v in enumerate(row)) + b"}"
+            for row in rows
+        ]
+    return b"[" + b",".join(encoded) + b"]"
+
+
+def encode_payload(meta, key, columns, rows, raw_json_columns=(), compact=False):
+    """
+    {...meta, key: [satırlar]} yanıt gövdesini üretir; compact modda "columns" alanı da eklenir
+
+    Args:
+        meta (dict): Yanıttaki diğer alanlar (success, total_count, ...)
+        key (str): Satırların yazılacağı alan adı (ör. "users", "logs")
+
+    Returns:
+        bytes: JSON nesnesi
+    """
+    head = dict(meta)
+    if compact:
+        head["columns"] = list(columns)
+    head_bytes = dumps(head)
+    separator = b"," if len(head_bytes) > 2 else b""
+    return (
+        head_bytes[:-1] + separator + dumps(key) + b":"
+        + encode_rows(columns, rows, raw_json_columns, compact) + b"}"
+    )
+
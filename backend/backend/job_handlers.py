@@ -0,0 +1,151 @@
+from ldap3 import BASE
+from ldap_handler import get_ldap_connection_by_domain_id
+from job_queue import job_handler, JobError, JobCancelled
+from ldap_groups import GroupMembershipBatch
+from user_ops import add_user, migrate_passwords_to_hash
+from sync_scheduler import run_domain_sync
+
+# İş türleri: worker'lar bu modülü import ederek çalıştırıcıları kaydeder (job_worker.py)
+
+
+def _domain_id(job):
+    domain_id = job.payload.get("domain_id", job.domain_id)
+    if domain_id is None:
+        raise JobError("domain_id gerekli")
+    return domain_id
+
+
+@job_handler("ldap_sync")
+def run_ldap_sync(job):
+    """Domain'in LDAP kullanıcılarını users tablosuna senkronize eder"""
+    domain_id = _domain_id(job)
+    job.progress(0, 1, "Kullanıcılar senkronize ediliyor", force=True)
+    # Zamanlayıcıyla aynı yol: advisory lock + sync_runs kaydı
+    result = run_domain_sync(domain_id, trigger="manual")
+    if result["status"] == "skipped":
+        # Devam eden senkronizasyon bitince yeniden denenir
+        raise Exception("Domain için başka bir senkronizasyon çalışıyor")
+    if result["status"] == "failed":
+        raise Exception(result["error"] or "Senkronizasyon başarısız")
+    job.progress(1, 1, "Tamamlandı", force=True)
+    keys = ("run_id", "users_seen", "inserted", "updated", "unchanged", "deleted", "conflicts", "rows_changed",
+            "duration_ms")
+    return {"domain_id": domain_id, **{key: result[key] for key in keys}}
+
+
+def _flush_groups(domain_id, group_batch):
+    """Biriken grup üyeliklerini uygular ve grup başına özet döndürür"""
+    if not len(group_batch):
+        return []
+    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
+    try:
+        return [
+            {"group": r["group"], "added": len(r["changed"]), "already_member": len(r["unchanged"]),
+             "failed": len(r["failed"]), "error": str(r["error"]) if r["error"] else None}
+            for r in group_batch.flush(conn_ldap, base_dn)
+        ]
+    finally:
+        conn_ldap.unbind()
+
+
+@job_handler("bulk_add_users", secret_fields=("password",))
+def run_bulk_add_users(job):
+    """
+    Kullanıcıları sırayla ekler; tek bir kullanıcının hatası işi durdurmaz.
+    Payload: {"domain_id": 1, "created_by": "...", "users": [{"username", "first_name",
+    "last_name", "password", "role_id", "department_id"}, ...]}
+
+    Her kullanıcıdan sonra durum (sıradaki kullanıcı, hatalar, uygulanmamış grup üyelikleri)
+    kaydedilir. Tekrar denemede eklenmiş kullanıcılar yeniden eklenmez ("zaten var" olur ve
+    Domain Admins üyelikleri kaybolurdu); bekleyen üyelikler de uygulanır.
+    """
+    domain_id = _domain_id(job)
+    users = job.payload.get("users") or []
+    total = len(users)
+    state = job.state or {}
+    start = state.get("next", 0)
+    failures = state.get("failures", [])
+    # Admin üyelikleri biriktirilir ve sonda grup başına tek modify ile eklenir
+    group_batch = GroupMembershipBatch.from_pending(domain_id, state.get("pending_groups"))
+    attempt_results = {}
+
+    def save(next_index, groups=None):
+        job.save_state({"next": next_index, "failures": failures, "pending_groups": group_batch.pending(),
+                        "groups": groups})
+
+    for index in range(start, total):
+        user = users[index]
+        # İptal istenmişse burada durur; eklenmiş kullanıcılar ve grup üyelikleri kalır
+        try:
+            job.progress(index, total, f"{user.get('username')} ekleniyor")
+        except JobCancelled:
+            _flush_groups(domain_id, group_batch)
+            raise
+        try:
+            success, status = add_user(
+                domain_id=domain_id,
+                username=user["username"],
+                first_name=user.get("first_name", ""),
+                last_name=user.get("last_name", ""),
+                password=user["password"],
+                role_id=user.get("role_id", 2),
+                department_id=user.get("department_id"),
+                created_by=job.payload.get("created_by", job.created_by),
+                group_batch=group_batch
+            )
+            result = {"username": user["username"], "success": success, "status": status}
+        except Exception as e:
+            result = {"username": user.get("username"), "success": False, "error": str(e)}
+        attempt_results[index] = result
+        if not result["success"]:
+            failures.append({"index": index, **result})
+        save(index + 1)
+
+    if start < total or len(group_batch):
+        group_results = _flush_groups(domain_id, group_batch)
+        save(total, group_results)
+    else:
+        # Önceki deneme üyelikleri uygulamıştı; sonrasında hata oluşmuştu
+        group_results = state.get("groups") or []
+    job.progress(total, total, "Tamamlandı", force=True)
+
+    # Önceki denemelerde işlenen kullanıcılar için kaydedilen hatalar kullanılır
+    failed_by_index = {f["index"]: {k: v for k, v in f.items() if k != "index"} for f in failures}
+    results = []
+    for index, user in enumerate(users):
+        if index in attempt_results:
+            results.append(attempt_results[index])
+        elif index in failed_by_index:
+            results.append(failed_by_index[index])
+        else:
+            results.append({"username": user.get("username"), "success": True, "status": "Önceki denemede eklendi"})
+    succeeded = sum(1 for r in results if r["success"])
+    return {"total": total, "succeeded": succeeded, "failed": total - succeeded, "results": results,
+            "groups": group_results}
+
+
+@job_handler("migrate_passwords")
+def run_migrate_passwords(job):
+    """Düz metin şifreleri bcrypt hash'ine dönüştürür"""
+    job.progress(0, 1, "Şifreler dönüştürülüyor", force=True)
+    success, message = migrate_passwords_to_hash()
+    if not success:
+        raise Exception(message)
+    job.progress(1, 1, message, force=True)
+    return {"message": message}
+
+
+@job_handler("validate_domain")
+def run_validate_domain(job):
+    """Domain'in LDAP sunucusuna bağlanıp base DN'in okunabildiğini doğrular"""
+    domain_id = _domain_id(job)
+    job.progress(0, 2, "LDAP bağlantısı kuruluyor", force=True)
+    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
+    try:
+        job.progress(1, 2, "Base DN okunuyor", force=True)
+        readable = conn_ldap.search(base_dn, "(objectClass=*)", search_scope=BASE, attributes=["distinguishedName"])
+        result = {"domain_id": domain_id, "base_dn": base_dn, "bound": conn_ldap.bound, "base_dn_readable": bool(readable)}
+    finally:
+        conn_ldap.unbind()
+    job.progress(2, 2, "Tamamlandı", force=True)
+    return result
@@ -0,0 +1,358 @@
+import json
+import os
+import random
+import socket
+import time
+from db_ops import db_session
+from metrics import registry
+
+# İş kuyruğu ayarları (.env üzerinden değiştirilebilir)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+# İlerleme kaydı en fazla bu aralıkla (saniye) veritabanına yazılır
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+JOB_COLUMNS = ("id", "job_type", "status", "priority", "attempts", "max_attempts", "run_after",
+               "progress_current", "progress_total", "progress_message", "result", "last_error",
+               "cancel_requested", "created_by", "domain_id", "worker_id", "created_at", "started_at",
+               "finished_at")
+
+JOBS_ENQUEUED = registry.counter("odie_jobs_enqueued_total", "Kuyruğa eklenen iş sayısı", ("job_type",))
+JOBS_FINISHED = registry.counter("odie_jobs_finished_total", "Tamamlanan iş sayısı", ("job_type", "status"))
+JOB_DURATION = registry.histogram("odie_job_duration_ms", "İş çalışma süresi (ms)", ("job_type",),
+                                  buckets=(100, 500, 1000, 5000, 15000, 60000, 300000, 900000, 3600000))
+
+# job_type -> (fonksiyon, gizli alanlar)
+_handlers = {}
+
+
+class JobCancelled(Exception):
+    """İş çalışırken iptal istendiğinde JobContext.progress() tarafından fırlatılır"""
+
+
+class JobError(Exception):
+    """Tekrar denenmeden başarısız sayılacak hata (ör. geçersiz payload)"""
+
+
+def job_handler(job_type, secret_fields=()):
+    """
+    İş türü için çalıştırıcı kaydeder
+
+    Kullanım:
+        @job_handler("ldap_sync")
+        def run_sync(job):
+            ...
+            return {"synced": 10}
+
+    Args:
+        job_type (str): İş türü adı
+        secret_fields (tuple): İş bittiğinde payload'dan silinecek alan adları (ör. "password")
+    """
+    def register(func):
+        _handlers[job_type] = (func, tuple(secret_fields))
+        return func
+    return register
+
+
+def _scrub(value, secret_fields):
+    if isinstance(value, dict):
+        return {k: _scrub(v, secret_fields) for k, v in value.items() if k not in secret_fields}
+    if isinstance(value, list):
+        return [_scrub(v, secret_fields) for v in value]
+    return value
+
+
+def enqueue(job_type, payload=None, created_by=None, domain_id=None, priority=0, max_attempts=3,
+            delay_seconds=0, conn=None):
+    """
+    Kuyruğa yeni iş ekler. conn verilirse iş isteğin transaction'ı ile birlikte commit edilir.
+
+    Returns:
+        int: İş ID'si
+    """
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO jobs (job_type, payload, priority, max_attempts, run_after, created_by, domain_id)
+            VALUES (%s, %s::jsonb, %s, %s, NOW() + make_interval(secs => %s), %s, %s)
+            RETURNING id
+            """,
+            (job_type, json.dumps(payload or {}, ensure_ascii=False), priority, max_attempts,
+             delay_seconds, created_by, domain_id)
+        )
+        job_id = cursor.fetchone()[0]
+    JOBS_ENQUEUED.labels(job_type).inc()
+    return job_id
+
+
+def _row_to_job(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    for key in ("run_after", "created_at", "started_at", "finished_at"):
+        if job[key] is not None:
+            job[key] = job[key].isoformat()
+    return job
+
+
+def get_job(job_id, conn=None):
+    """İşin durumunu döndürür (yoksa None); payload döndürülmez"""
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = %s", (job_id,))
+        row = cursor.fetchone()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(created_by=None, status=None, job_type=None, limit=50, conn=None):
+    conditions = []
+    params = []
+    if created_by:
+        conditions.append("created_by = %s")
+        params.append(created_by)
+    if status:
+        conditions.append("status = %s")
+        params.append(status)
+    if job_type:
+        conditions.append("job_type = %s")
+        params.append(job_type)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    params.append(limit)
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs {where} ORDER BY created_at DESC LIMIT %s",
+                       params)
+        return [_row_to_job(row) for row in cursor.fetchall()]
+
+
+def cancel_job(job_id, created_by=None, conn=None):
+    """
+    İşi iptal eder. Kuyrukta bekleyen iş hemen iptal edilir ve payload'daki gizli alanlar
+    aynı transaction'da silinir; çalışan işe iptal isteği işaretlenir ve worker bir sonraki
+    ilerleme kaydında işi durdurur.
+
+    Returns:
+        tuple: (bool, str) - İşlem başarılı mı, mesaj
+    """
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT status, job_type, payload FROM jobs
+            WHERE id = %s AND (%s IS NULL OR created_by = %s) AND status IN ('queued', 'running')
+            FOR UPDATE
+            """,
+            (job_id, created_by, created_by)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return False, "❌ İş bulunamadı veya zaten tamamlanmış"
+        status, job_type, payload = row
+        if status != QUEUED:
+            cursor.execute("UPDATE jobs SET cancel_requested = true WHERE id = %s", (job_id,))
+            return True, "⏳ İptal istendi, iş bir sonraki adımda durdurulacak"
+
+        secret_fields = _handlers.get(job_type, (None, ()))[1]
+        cursor.execute(
+            """
+            UPDATE jobs
+            SET status = 'cancelled', finished_at = NOW(), cancel_requested = true, payload = %s::jsonb
+            WHERE id = %s
+            """,
+            (json.dumps(_scrub(payload or {}, secret_fields), ensure_ascii=False), job_id)
+        )
+    JOBS_FINISHED.labels(job_type, CANCELLED).inc()
+    return True, "✅ İş iptal edildi"
+
+
+class JobContext:
+    """Çalıştırıcıya verilen iş bilgisi; ilerleme kaydı ve iptal kontrolü sağlar"""
+
+    def __init__(self, job_id, job_type, payload, attempts, max_attempts, created_by, domain_id, worker_id,
+                 state=None):
+        self.id = job_id
+        self.job_type = job_type
+        self.payload = payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.created_by = created_by
+        self.domain_id = domain_id
+        self.worker_id = worker_id
+        # Önceki denemenin save_state ile kaydettiği durum (ilk denemede None)
+        self.state = state
+        self._last_progress = 0.0
+
+    def progress(self, current=None, total=None, message=None, force=False):
+        """
+        İlerlemeyi kaydeder, sahipliği uzatır ve iptal istenmişse JobCancelled fırlatır.
+        Sık çağrılabilir; veritabanına en fazla JOB_PROGRESS_INTERVAL aralıkla yazılır.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_progress < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET progress_current = COALESCE(%s, progress_current),
+                    progress_total = COALESCE(%s, progress_total),
+                    progress_message = COALESCE(%s, progress_message),
+                    locked_until = NOW() + make_interval(secs => %s)
+                WHERE id = %s AND worker_id = %s
+                RETURNING cancel_requested
+                """,
+                (current, total, message, JOB_LEASE_SECONDS, self.id, self.worker_id)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            # Sahiplik başka bir worker'a geçmiş (lease süresi dolmuş)
+            raise JobCancelled("İşin sahipliği kaybedildi")
+        if row[0]:
+            raise JobCancelled("İş iptal edildi")
+
+    def save_state(self, state):
+        """
+        Tekrar denemede kaldığı yerden devam edebilmek için durumu hemen kaydeder (result
+        kolonuna; iş bitince sonuçla değiştirilir). Bir sonraki denemede job.state olarak gelir.
+        """
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET result = %s::jsonb, locked_until = NOW() + make_interval(secs => %s)
+                WHERE id = %s AND worker_id = %s
+                """,
+                (json.dumps(state, ensure_ascii=False, default=str), JOB_LEASE_SECONDS, self.id, self.worker_id)
+            )
+            if cursor.rowcount == 0:
+                raise JobCancelled("İşin sahipliği kaybedildi")
+
+
+def claim_job(worker_id, job_types=None):
+    """
+    Sıradaki çalıştırılabilir işi SKIP LOCKED ile sahiplenir
+
+    Returns:
+        JobContext veya iş yoksa None
+    """
+    types = list(job_types) if job_types else None
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            WITH next AS (
+                SELECT id FROM jobs
+                WHERE ((status = 'queued' AND run_after <= NOW())
+                       OR (status = 'running' AND locked_until < NOW()))
+                  AND (%(types)s::text[] IS NULL OR job_type = ANY(%(types)s::text[]))
+                ORDER BY priority DESC, run_after, id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            UPDATE jobs j
+            SET status = 'running',
+                attempts = j.attempts + 1,
+                worker_id = %(worker_id)s,
+                locked_until = NOW() + make_interval(secs => %(lease)s),
+                started_at = COALESCE(j.started_at, NOW())
+            FROM next
+            WHERE j.id = next.id
+            RETURNING j.id, j.job_type, j.payload, j.attempts, j.max_attempts, j.created_by, j.domain_id,
+                      j.cancel_requested, j.result
+            """,
+            {"types": types, "worker_id": worker_id, "lease": JOB_LEASE_SECONDS}
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    job_id, job_type, payload, attempts, max_attempts, created_by, domain_id, cancel_requested, state = row
+    job = JobContext(job_id, job_type, payload or {}, attempts, max_attempts, created_by, domain_id, worker_id,
+                     state=state if attempts > 1 else None)
+    if cancel_requested:
+        _finish(job, CANCELLED, error="İş iptal edildi")
+        return claim_job(worker_id, job_types)
+    if attempts > max_attempts:
+        # Son denemede worker'ı ölen iş (lease süresi dolmuş) tekrar çalıştırılmaz
+        _finish(job, FAILED, error="Worker iş bitmeden yanıt vermeyi bıraktı")
+        return claim_job(worker_id, job_types)
+    return job
+
+
+def _finish(job, status, result=None, error=None, retry_in=None):
+    """İşi sonuç durumuna taşır; retry_in verilirse yeniden kuyruğa alır"""
+    secret_fields = _handlers.get(job.job_type, (None, ()))[1]
+    with db_session() as conn:
+        cursor = conn.cursor()
+        if retry_in is not None:
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET status = 'queued', run_after = NOW() + make_interval(secs => %s),
+                    locked_until = NULL, worker_id = NULL, last_error = %s
+                WHERE id = %s AND worker_id = %s
+                """,
+                (retry_in, error, job.id, job.worker_id)
+            )
+            return
+        cursor.execute(
+            """
+            UPDATE jobs
+            SET status = %s, result = %s::jsonb, last_error = %s, finished_at = NOW(),
+                locked_until = NULL, payload = %s::jsonb
+            WHERE id = %s AND worker_id = %s
+            """,
+            (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             error, json.dumps(_scrub(job.payload, secret_fields), ensure_ascii=False), job.id, job.worker_id)
+        )
+    JOBS_FINISHED.labels(job.job_type, status).inc()
+
+
+def retry_delay(attempts):
+    """Üstel geri çekilme (jitter ile)"""
+    delay = min(JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_job(job):
+    """Sahiplenilmiş işi çalıştırıp sonucunu kaydeder"""
+    handler = _handlers.get(job.job_type)
+    if handler is None:
+        _finish(job, FAILED, error=f"Bilinmeyen iş türü: {job.job_type}")
+        return FAILED
+
+    started = time.perf_counter()
+    try:
+        result = handler[0](job)
+    except JobCancelled as e:
+        status = CANCELLED
+        _finish(job, CANCELLED, error=str(e))
+    except JobError as e:
+        status = FAILED
+        _finish(job, FAILED, error=str(e))
+    except Exception as e:
+        print(f"❌ İş hatası (#{job.id} {job.job_type}, deneme {job.attempts}/{job.max_attempts}): {e}")
+        if job.attempts < job.max_attempts:
+            status = QUEUED
+            _finish(job, QUEUED, error=str(e), retry_in=retry_delay(job.attempts))
+        else:
+            status = FAILED
+            _finish(job, FAILED, error=str(e))
+    else:
+        status = SUCCEEDED
+        _finish(job, SUCCEEDED, result=result)
+    JOB_DURATION.labels(job.job_type).observe((time.perf_counter() - started) * 1000)
+    return status
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
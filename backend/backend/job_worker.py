@@ -0,0 +1,74 @@
+"""
+🧵 Arka plan iş worker'ı
+
+jobs tablosundaki işleri SKIP LOCKED ile sahiplenip çalıştırır. API sürecinden ayrı
+çalıştırılır; birden fazla makinede/süreçte aynı anda çalışabilir.
+
+Kullanım:
+    python job_worker.py --workers 4
+    python job_worker.py --workers 1 --types ldap_sync,validate_domain
+"""
+
+import argparse
+import os
+import random
+import signal
+import threading
+from job_queue import claim_job, run_job, default_worker_id
+import job_handlers  # noqa: F401 - iş türlerini kaydeder
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+
+
+def worker_loop(worker_id, stop_event, job_types=None, poll_interval=JOB_POLL_INTERVAL):
+    print(f"🧵 Worker başladı: {worker_id}")
+    while not stop_event.is_set():
+        try:
+            job = claim_job(worker_id, job_types)
+        except Exception as e:
+            print(f"❌ İş alınamadı ({worker_id}): {e}")
+            job = None
+
+        if job is None:
+            # Worker'lar aynı anda sorgulamasın diye bekleme süresine jitter eklenir
+            stop_event.wait(poll_interval * random.uniform(0.5, 1.5))
+            continue
+
+        print(f"▶️ #{job.id} {job.job_type} (deneme {job.attempts}/{job.max_attempts}) - {worker_id}")
+        status = run_job(job)
+        print(f"⏹️ #{job.id} {job.job_type}: {status}")
+    print(f"🛑 Worker durdu: {worker_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ODIE arka plan iş worker'ı")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")),
+                        help="Eşzamanlı iş sayısı (thread)")
+    parser.add_argument("--types", help="Sadece bu iş türlerini çalıştır (virgülle ayrılmış)")
+    parser.add_argument("--poll", type=float, default=JOB_POLL_INTERVAL, help="Boşta sorgulama aralığı (saniye)")
+    args = parser.parse_args()
+
+    job_types = [t.strip() for t in args.types.split(",") if t.strip()] if args.types else None
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        print("🛑 Durduruluyor; çalışan işler bitince çıkılacak...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    base_id = default_worker_id()
+    threads = [
+        threading.Thread(target=worker_loop, args=(f"{base_id}:{i}", stop_event, job_types, args.poll),
+                         name=f"job-worker-{i}")
+        for i in range(args.workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
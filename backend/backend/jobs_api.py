@@ -0,0 +1,137 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from typing import List, Optional
+from db_ops import get_db
+from log_system import APILogger
+from admin_api import require_admin
+from job_queue import enqueue, get_job, list_jobs, cancel_job
+# İş türleri bu süreçte de kaydedilir: kuyruktaki iş iptal edilirken gizli alanları bilinmeli
+import job_handlers  # noqa: F401
+
+# Uzun süren dizin işlemleri kuyruğa alınır ve job_worker.py tarafından çalıştırılır;
+# istemci dönen job_id ile GET /jobs/{job_id} üzerinden durumu sorgular.
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class BulkUser(BaseModel):
+    username: str
+    first_name: str
+    last_name: str
+    password: str
+    role_id: int = 2
+    department_id: Optional[int] = None
+
+
+class BulkAddUsersRequest(BaseModel):
+    domain_id: int
+    created_by: Optional[str] = None
+    users: List[BulkUser]
+
+
+def _enqueue_and_log(endpoint, operation_type, job_type, payload, user_id, domain_id, db, request_data,
+                     max_attempts=3):
+    try:
+        job_id = enqueue(job_type, payload, created_by=user_id, domain_id=domain_id,
+                         max_attempts=max_attempts, conn=db)
+        response = {"success": True, "job_id": job_id, "status": "queued"}
+        APILogger.log_operation(
+            endpoint=endpoint,
+            method="POST",
+            operation_type=operation_type,
+            user_id=user_id,
+            domain_id=domain_id,
+            request_data=request_data,
+            response_data=response,
+            success=True,
+            conn=db
+        )
+        return response
+    except Exception as e:
+        db.rollback()
+        error_response = {"success": False, "message": f"❌ İş kuyruğa eklenemedi: {e}"}
+        APILogger.log_operation(
+            endpoint=endpoint,
+            method="POST",
+            operation_type=operation_type,
+            user_id=user_id,
+            domain_id=domain_id,
+            request_data=request_data,
+            response_data=error_response,
+            success=False,
+            error_message=str(e),
+            conn=db
+        )
+        return error_response
+
+
+# 🔄 LDAP senkronizasyonu
+@router.post("/sync/{domain_id}", status_code=202)
+def enqueue_sync(domain_id: int, user_id: Optional[str] = Query(None), db=Depends(get_db)):
+    return _enqueue_and_log("/jobs/sync", "domain", "ldap_sync", {"domain_id": domain_id},
+                            user_id, domain_id, db, {"domain_id": domain_id})
+
+
+# 🔌 Domain bağlantı doğrulaması
+@router.post("/validate_domain/{domain_id}", status_code=202)
+def enqueue_validate_domain(domain_id: int, user_id: Optional[str] = Query(None), db=Depends(get_db)):
+    return _enqueue_and_log("/jobs/validate_domain", "domain", "validate_domain", {"domain_id": domain_id},
+                            user_id, domain_id, db, {"domain_id": domain_id}, max_attempts=1)
+
+
+# 👥 Toplu kullanıcı ekleme
+@router.post("/bulk_add_users", status_code=202)
+def enqueue_bulk_add_users(request: BulkAddUsersRequest, db=Depends(get_db)):
+    # Şifreler log'a yazılmaz; payload'daki şifreler iş bitince silinir
+    return _enqueue_and_log("/jobs/bulk_add_users", "user", "bulk_add_users", request.dict(),
+                            request.created_by, request.domain_id, db,
+                            {"domain_id": request.domain_id, "usernames": [u.username for u in request.users]})
+
+
+# 🔐 Şifre dönüştürme (admin)
+@router.post("/migrate_passwords", status_code=202, dependencies=[Depends(require_admin)])
+def enqueue_migrate_passwords(user_id: Optional[str] = Query(None), db=Depends(get_db)):
+    return _enqueue_and_log("/jobs/migrate_passwords", "user", "migrate_passwords", {},
+                            user_id, None, db, None, max_attempts=1)
+
+
+# 📋 İş durumu (GET işlemi - loglanmaz)
+@router.get("/{job_id}")
+def get_job_status(job_id: int, user_id: Optional[str] = Query(None)):
+    job = get_job(job_id)
+    if job is None or (user_id and job["created_by"] not in (None, user_id)):
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return {"success": True, "job": job}
+
+
+@router.get("")
+def get_jobs(
+    user_id: Optional[str] = Query(None, description="Oluşturan kullanıcı filtresi"),
+    status: Optional[str] = Query(None, description="queued, running, succeeded, failed, cancelled"),
+    job_type: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    return {"success": True, "jobs": list_jobs(created_by=user_id, status=status, job_type=job_type, limit=limit)}
+
+
+# ⛔ İş iptali
+@router.post("/{job_id}/cancel")
+def cancel_job_endpoint(job_id: int, user_id: Optional[str] = Query(None), db=Depends(get_db)):
+    try:
+        success, message = cancel_job(job_id, created_by=user_id, conn=db)
+        response = {"success": success, "message": message}
+    except Exception as e:
+        db.rollback()
+        success = False
+        response = {"success": False, "message": f"❌ İptal hatası: {e}"}
+    APILogger.log_operation(
+        endpoint="/jobs/cancel",
+        method="POST",
+        operation_type="other",
+        user_id=user_id,
+        request_data={"job_id": job_id},
+        response_data=response,
+        success=success,
+        error_message=None if success else response["message"],
+        conn=db
+    )
+    return response
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from ldap3.utils.conv import escape_filter_chars
+
+# Cache ayarları (.env üzerinden değiştirilebilir)
+DN_CACHE_TTL = float(os.getenv("LDAP_DN_CACHE_TTL", "300"))
+DN_CACHE_MAX_ENTRIES = int(os.getenv("LDAP_DN_CACHE_MAX_ENTRIES", "50000"))
+
+
+class DNCache:
+    """Domain bazlı kullanıcı adı -> (distinguishedName, userAccountControl) önbelleği"""
+
+    def __init__(self, ttl=DN_CACHE_TTL, max_entries=DN_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(domain_id, username):
+        # sAMAccountName büyük/küçük harf duyarsızdır
+        return (domain_id, username.lower())
+
+    def get(self, domain_id, username):
+        """
+        Önbellekteki kaydı döndürür
+
+        Returns:
+            tuple: (dn, user_account_control) veya süresi dolmuşsa/yoksa None
+        """
+        key = self._key(domain_id, username)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            dn, uac, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dn, uac
+
+    def put(self, domain_id, username, dn, uac=None):
+        """Kaydı ekler veya günceller; uac verilmezse mevcut değer korunur"""
+        key = self._key(domain_id, username)
+        with self._lock:
+            if uac is None and key in self._entries:
+                uac = self._entries[key][1]
+            self._entries[key] = (dn, uac, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            # En eski kayıtları at
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_uac(self, domain_id, username, uac):
+        """Sadece userAccountControl değerini günceller (TTL yenilenmez)"""
+        key = self._key(domain_id, username)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = (entry[0], uac, entry[2])
+
+    def invalidate(self, domain_id, username):
+        """Kullanıcı silindiğinde veya yeniden adlandırıldığında kaydı düşürür"""
+        with self._lock:
+            self._entries.pop(self._key(domain_id, username), None)
+
+    def invalidate_domain(self, domain_id):
+        """Bir domain'e ait tüm kayıtları düşürür (domain güncelleme/silme)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == domain_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Uygulama genelinde paylaşılan önbellek
+dn_cache = DNCache()
+
+
+def _entry_uac(entry):
+    if 'userAccountControl' in entry and entry.userAccountControl.value is not None:
+        return int(entry.userAccountControl.value)
+    return None
+
+
+def resolve_user_dn(conn_ldap, domain_id, base_dn, username, use_cache=True):
+    """
+    Kullanıcının DN ve userAccountControl değerini bulur.
+    Önbellekte varsa LDAP'e hiç gidilmez, yoksa subtree araması yapılıp sonuç önbelleğe yazılır.
+
+    Args:
+        conn_ldap: Açık LDAP bağlantısı
+        domain_id (int): Domain ID
+        base_dn (str): Arama yapılacak base DN
+        username (str): sAMAccountName
+        use_cache (bool): False ise önbellek atlanır (ör. güncel UAC gerektiğinde)
+
+    Returns:
+        tuple: (dn, user_account_control) veya kullanıcı yoksa None
+    """
+    if use_cache:
+        cached = dn_cache.get(domain_id, username)
+        if cached and cached[1] is not None:
+            return cached
+
+    conn_ldap.search(
+        base_dn,
+        f'(sAMAccountName={escape_filter_chars(username)})',
+        attributes=['distinguishedName', 'userAccountControl']
+    )
+    if not conn_ldap.entries:
+        dn_cache.invalidate(domain_id, username)
+        return None
+
+    entry = conn_ldap.entries[0]
+    dn = entry.distinguishedName.value
+    uac = _entry_uac(entry)
+    dn_cache.put(domain_id, username, dn, uac)
+    return dn, uac
+
+
+def cache_ldap_records(domain_id, records):
+    """
+    (username, dn, userAccountControl) kayıtlarını önbelleğe yazar
+    (sayfalı/parçalı senkronizasyon sonuçları için)
+
+    Returns:
+        int: Önbelleğe yazılan kayıt sayısı
+    """
+    count = 0
+    for username, dn, uac in records:
+        if username and dn:
+            dn_cache.put(domain_id, username, dn, uac)
+            count += 1
+    return count
@@ -0,0 +1,196 @@
+"""
+👥 LDAP grup üyelikleri
+
+Üyeler MODIFY_ADD / MODIFY_DELETE ile eklenip çıkarılır; grubun member özniteliği
+yeniden yazılmaz (MODIFY_REPLACE tüm üyeleri silip tek üye bırakırdı). Birden fazla
+üye tek modify ile gönderilir; grup adı -> DN eşlemesi önbellekte tutulur.
+
+Kullanım:
+    add_group_members(conn_ldap, domain_id, base_dn, "Domain Admins", [user_dn, ...])
+
+    batch = GroupMembershipBatch(domain_id)
+    batch.add("Domain Admins", user_dn)
+    ...
+    batch.flush(conn_ldap, base_dn)   # grup başına toplu modify
+"""
+
+import os
+from collections import defaultdict
+from ldap3 import MODIFY_ADD, MODIFY_DELETE
+from ldap3.utils.conv import escape_filter_chars
+from ldap_cache import DNCache
+from metrics import registry
+
+# Ayarlar (.env üzerinden değiştirilebilir)
+GROUP_DN_CACHE_TTL = float(os.getenv("LDAP_GROUP_DN_CACHE_TTL", "3600"))
+# Tek modify isteğinde gönderilen en fazla üye sayısı
+GROUP_MODIFY_BATCH = int(os.getenv("LDAP_GROUP_MODIFY_BATCH", "500"))
+
+DOMAIN_ADMINS = "Domain Admins"
+
+# Zaten üye / zaten üye değil sonuç kodları (RFC 4511 ve AD'nin döndürdüğü kodlar)
+# 20 attributeOrValueExists, 68 entryAlreadyExists; 16 noSuchAttribute, 53 unwillingToPerform
+ALREADY_MEMBER_CODES = (20, 68)
+NOT_MEMBER_CODES = (16, 53)
+# Grubun tamamını etkileyen hatalar: üyeleri tek tek denemek sonucu değiştirmez
+_GROUP_LEVEL_ERRORS = (49, 50, 51, 52, 80, 81)
+
+# Grup adı -> (DN, None)
+group_dn_cache = DNCache(ttl=GROUP_DN_CACHE_TTL, max_entries=10000)
+
+GROUP_MEMBER_CHANGES = registry.counter(
+    "odie_ldap_group_member_changes_total", "Grup üyelik değişiklikleri", ("operation", "result"))
+GROUP_MODIFY_REQUESTS = registry.counter(
+    "odie_ldap_group_modify_requests_total", "Grup üyeliği için gönderilen modify istekleri", ("operation",))
+
+
+def group_filter(group_name):
+    return f'(&(objectClass=group)(sAMAccountName={escape_filter_chars(group_name)}))'
+
+
+def resolve_group_dn(conn_ldap, domain_id, base_dn, group_name, use_cache=True):
+    """
+    Grubun DN'ini bulur (önce önbellek). SYNC bağlantı gerektirir.
+
+    Returns:
+        str: Grup DN'i veya grup yoksa None
+    """
+    if use_cache:
+        cached = group_dn_cache.get(domain_id, group_name)
+        if cached:
+            return cached[0]
+
+    conn_ldap.search(base_dn, group_filter(group_name), attributes=['distinguishedName'])
+    if not conn_ldap.entries:
+        group_dn_cache.invalidate(domain_id, group_name)
+        return None
+    dn = conn_ldap.entries[0].entry_dn
+    group_dn_cache.put(domain_id, group_name, dn)
+    return dn
+
+
+def _modify_members(conn_ldap, group_dn, member_dns, operation, result, split_missing=False):
+    """
+    Üyeleri GROUP_MODIFY_BATCH'lik modify'larla uygular. Modify atomik olduğundan tek bir
+    sorunlu üye (zaten üye, geçersiz DN) tüm isteği reddettirir; reddedilen istek ikiye
+    bölünerek tekrar denenir.
+
+    Returns:
+        list: noSuchObject (32) ile reddedilen üyeler; split_missing=False iken bunlar
+        bölünmez, çünkü sebep eskimiş grup DN'i olabilir
+    """
+    tolerated = ALREADY_MEMBER_CODES if operation == MODIFY_ADD else NOT_MEMBER_CODES
+    pending = [member_dns[i:i + GROUP_MODIFY_BATCH] for i in range(0, len(member_dns), GROUP_MODIFY_BATCH)]
+    missing = []
+    while pending:
+        batch = pending.pop()
+        GROUP_MODIFY_REQUESTS.labels("add" if operation == MODIFY_ADD else "remove").inc()
+        if conn_ldap.modify(group_dn, {'member': [(operation, batch)]}):
+            result["changed"].extend(batch)
+            continue
+
+        code = conn_ldap.result.get('result')
+        if code not in tolerated:
+            result["error"] = conn_ldap.result
+        if code == 32 and not split_missing:
+            missing.extend(batch)
+        elif len(batch) == 1:
+            (result["unchanged"] if code in tolerated else result["failed"]).extend(batch)
+        elif code in _GROUP_LEVEL_ERRORS:
+            # Yetki/bağlantı hatası: üyeleri tek tek denemek sonucu değiştirmez
+            result["failed"].extend(batch)
+        else:
+            middle = len(batch) // 2
+            pending.extend((batch[middle:], batch[:middle]))
+    return missing
+
+
+def _apply(conn_ldap, domain_id, base_dn, group_name, member_dns, operation):
+    result = {"group": group_name, "changed": [], "unchanged": [], "failed": [], "error": None}
+    member_dns = list(dict.fromkeys(member_dns))
+    if not member_dns:
+        return result
+
+    group_dn = resolve_group_dn(conn_ldap, domain_id, base_dn, group_name)
+    missing = member_dns
+    if group_dn is not None:
+        missing = _modify_members(conn_ldap, group_dn, member_dns, operation, result)
+        if missing:
+            # Grup taşınmış olabilir: güncel DN ile tekrar dene; DN aynıysa sorun üyelerdedir
+            group_dn = resolve_group_dn(conn_ldap, domain_id, base_dn, group_name, use_cache=False)
+            if group_dn is not None:
+                result["error"] = None
+                missing = _modify_members(conn_ldap, group_dn, missing, operation, result, split_missing=True)
+    if group_dn is None:
+        result["failed"].extend(missing)
+        result["error"] = f"Grup bulunamadı: {group_name}"
+
+    label = "add" if operation == MODIFY_ADD else "remove"
+    for key in ("changed", "unchanged", "failed"):
+        if result[key]:
+            GROUP_MEMBER_CHANGES.labels(label, key).inc(len(result[key]))
+    return result
+
+
+def add_group_members(conn_ldap, domain_id, base_dn, group_name, member_dns):
+    """
+    Üyeleri gruba ekler (MODIFY_ADD). Zaten üye olanlar "unchanged" sayılır.
+
+    Returns:
+        dict: {"group", "changed": [dn], "unchanged": [dn], "failed": [dn], "error"}
+    """
+    return _apply(conn_ldap, domain_id, base_dn, group_name, member_dns, MODIFY_ADD)
+
+
+def remove_group_members(conn_ldap, domain_id, base_dn, group_name, member_dns):
+    """Üyeleri gruptan çıkarır (MODIFY_DELETE). Zaten üye olmayanlar "unchanged" sayılır."""
+    return _apply(conn_ldap, domain_id, base_dn, group_name, member_dns, MODIFY_DELETE)
+
+
+class GroupMembershipBatch:
+    """Üyelik değişikliklerini biriktirip flush'ta grup başına toplu modify ile uygular"""
+
+    def __init__(self, domain_id):
+        self.domain_id = domain_id
+        self._adds = defaultdict(list)
+        self._removes = defaultdict(list)
+
+    def add(self, group_name, member_dn):
+        self._adds[group_name].append(member_dn)
+
+    def remove(self, group_name, member_dn):
+        self._removes[group_name].append(member_dn)
+
+    def pending(self):
+        """Henüz uygulanmamış değişiklikler (JSON'a yazılabilir): {"add": {grup: [dn]}, "remove": {...}}"""
+        return {"add": {k: list(v) for k, v in self._adds.items()},
+                "remove": {k: list(v) for k, v in self._removes.items()}}
+
+    @classmethod
+    def from_pending(cls, domain_id, pending=None):
+        """pending() çıktısından yeniden oluşturur"""
+        batch = cls(domain_id)
+        for group_name, member_dns in ((pending or {}).get("add") or {}).items():
+            batch._adds[group_name].extend(member_dns)
+        for group_name, member_dns in ((pending or {}).get("remove") or {}).items():
+            batch._removes[group_name].extend(member_dns)
+        return batch
+
+    def __len__(self):
+        return sum(len(v) for v in self._adds.values()) + sum(len(v) for v in self._removes.values())
+
+    def flush(self, conn_ldap, base_dn):
+        """
+        Biriken değişiklikleri uygular ve temizler
+
+        Returns:
+            list: Her grup ve işlem için add_group_members/remove_group_members sonucu
+        """
+        results = []
+        for group_name, member_dns in self._adds.items():
+            results.append(add_group_members(conn_ldap, self.domain_id, base_dn, group_name, member_dns))
+        for group_name, member_dns in self._removes.items():
+            results.append(remove_group_members(conn_ldap, self.domain_id, base_dn, group_name, member_dns))
+        self._adds.clear()
+        self._removes.clear()
+        return results
@@ -1,21 +1,131 @@
-from ldap3 import Server, Connection
-from db_ops import get_db_connection
+from ldap3 import Server, Connection, SYNC
+from db_ops import db_session, LazyConnection
+from prepared_statements import register_query, execute_prepared
+from metrics import registry
+import timing
 from enum import Enum
+import time
+
+LDAP_LATENCY = registry.histogram(
+    "odie_ldap_operation_duration_ms", "LDAP işlem süresi (ms)", ("domain_id", "operation"))
+LDAP_ERRORS = registry.counter(
+    "odie_ldap_operation_errors_total", "Başarısız LDAP işlemi sayısı", ("domain_id", "operation"))
+LDAP_CONNECTIONS = registry.counter(
+    "odie_ldap_connections_total", "Açılan LDAP bağlantısı sayısı", ("domain_id",))
 
 # Domain tipi enum tanımı
 class DomainType(str, Enum):
     MS = "ms"
     SAMBA = "samba"
 
-def get_ldap_connection_by_domain_id(domain_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT domain_ip, ldap_user, ldap_password, domain_component, domain_type
-        FROM domains WHERE id = %s
-    """, (domain_id,))
-    result = cursor.fetchone()
-    conn.close()
+SELECT_DOMAIN_LDAP = register_query("domains_ldap_by_id", """
+    SELECT domain_ip, ldap_user, ldap_password, domain_component, domain_type
+    FROM domains WHERE id = %s
+""")
+
+class InstrumentedConnection(Connection):
+    """İşlem sürelerini ve hatalarını domain bazında metrik olarak kaydeden LDAP bağlantısı"""
+
+    def __init__(self, *args, domain_id=None, **kwargs):
+        # auto_bind=True bind'i __init__ içinde çağırdığı için önce atanmalı
+        self.domain_id = domain_id
+        # ASYNC stratejisinde gönderilmiş, yanıtı beklenen işlemler: message_id -> (işlem, gönderim zamanı)
+        self._pending = {}
+        LDAP_CONNECTIONS.labels(domain_id).inc()
+        super().__init__(*args, **kwargs)
+
+    def _timed(self, operation, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            LDAP_ERRORS.labels(self.domain_id, operation).inc()
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            LDAP_LATENCY.labels(self.domain_id, operation).observe(elapsed_ms)
+            timing.record(f"ldap_{operation}", elapsed_ms)
+        if result is False:
+            LDAP_ERRORS.labels(self.domain_id, operation).inc()
+        return result
+
+    def _operation(self, operation, func, *args, **kwargs):
+        if self.strategy.sync:
+            return self._timed(operation, func, *args, **kwargs)
+        # ASYNC: istek sadece gönderilir, message_id döner; süre wait_responses() içinde yanıt gelince ölçülür
+        try:
+            message_id = func(*args, **kwargs)
+        except Exception:
+            LDAP_ERRORS.labels(self.domain_id, operation).inc()
+            raise
+        if message_id:
+            self._pending[message_id] = (operation, time.perf_counter())
+        return message_id
+
+    def wait_responses(self, *message_ids):
+        """
+        ASYNC stratejisinde gönderilmiş işlemlerin yanıtlarını bekler. İşlemler aynı anda
+        sunucuda olduğundan toplam bekleme en yavaş işlem kadardır.
+
+        Returns:
+            list: Her message_id için LDAP result sözlüğü (result, description, message);
+            search işlemlerinde bulunan kayıtlar "entries" anahtarındadır
+        """
+        results = []
+        for message_id in message_ids:
+            operation, sent = self._pending.pop(message_id, ("unknown", time.perf_counter()))
+            if not message_id:
+                result = {'result': -1, 'description': 'notSent', 'message': 'İstek gönderilemedi'}
+            else:
+                try:
+                    response, result = self.get_response(message_id)
+                    if operation == "search":
+                        result = dict(result, entries=[r for r in response or [] if r.get('type') == 'searchResEntry'])
+                except Exception as e:
+                    result = {'result': -1, 'description': type(e).__name__, 'message': str(e)}
+            elapsed_ms = (time.perf_counter() - sent) * 1000
+            LDAP_LATENCY.labels(self.domain_id, operation).observe(elapsed_ms)
+            timing.record(f"ldap_{operation}", elapsed_ms)
+            if result.get('result') != 0:
+                LDAP_ERRORS.labels(self.domain_id, operation).inc()
+            results.append(result)
+        return results
+
+    def bind(self, *args, **kwargs):
+        return self._timed("bind", super().bind, *args, **kwargs)
+
+    def start_tls(self, *args, **kwargs):
+        return self._timed("start_tls", super().start_tls, *args, **kwargs)
+
+    def search(self, *args, **kwargs):
+        return self._operation("search", super().search, *args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        return self._operation("add", super().add, *args, **kwargs)
+
+    def modify(self, *args, **kwargs):
+        return self._operation("modify", super().modify, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._operation("delete", super().delete, *args, **kwargs)
+
+    def modify_dn(self, *args, **kwargs):
+        return self._operation("modify_dn", super().modify_dn, *args, **kwargs)
+
+def get_ldap_connection_by_domain_id(domain_id: int, conn=None, server_index: int = 0, client_strategy=SYNC):
+    """
+    domain_ip virgülle ayrılmış birden fazla DC içerebilir; server_index hangisine
+    bağlanılacağını seçer (parçalı senkronizasyon parçaları DC'lere dağıtır).
+    client_strategy=ASYNC ile işlemler message_id döndürür, yanıtlar conn_ldap.wait_responses() ile alınır.
+    """
+    # İstek bağlantısı henüz alınmadıysa domain kısa ömürlü bir bağlantıyla okunur; aksi halde
+    # istek bağlantısı sonraki LDAP işlemleri (add_user'daki bekleme dahil) boyunca tutulurdu
+    if isinstance(conn, LazyConnection) and not conn.acquired:
+        conn = None
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        execute_prepared(cursor, SELECT_DOMAIN_LDAP, (domain_id,))
+        result = cursor.fetchone()
     
     if not result:
         raise Exception("❌ Domain bulunamadı")
@@ -23,15 +133,18 @@ def get_ldap_connection_by_domain_id(domain_id: int):
     domain_ip, ldap_user, ldap_password, domain_component, domain_type = result
     
     try:
-        server = Server(domain_ip, use_ssl=False)
+        hosts = [host.strip() for host in domain_ip.split(",") if host.strip()]
+        server = Server(hosts[server_index % len(hosts)], use_ssl=False)
 
         if domain_type == "ms":
             # Microsoft için: basit bind yeterli
-            conn_ldap = Connection(server, user=ldap_user, password=ldap_password, auto_bind=True)
+            conn_ldap = InstrumentedConnection(server, user=ldap_user, password=ldap_password, auto_bind=True,
+                                               client_strategy=client_strategy, domain_id=domain_id)
 
         elif domain_type == "samba":
             # Samba için: önce TLS başlat, sonra bind
-            conn_ldap = Connection(server, user=ldap_user, password=ldap_password)
+            conn_ldap = InstrumentedConnection(server, user=ldap_user, password=ldap_password,
+                                               client_strategy=client_strategy, domain_id=domain_id)
             conn_ldap.open()
             conn_ldap.start_tls()
             conn_ldap.bind()
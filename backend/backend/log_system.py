@@ -1,12 +1,40 @@
 import json
+import os
 import time
 from datetime import datetime
 from typing import Optional, Dict, Any
-from db_ops import get_db_connection
+from db_ops import db_session
+from prepared_statements import register_query, prepared_sql
+from metrics import registry
+import timing
+
+# API_LOG_TIMINGS=1 ile isteğin log anına kadarki faz süreleri api_logs.timings kolonuna yazılır
+# (migrations/002_api_logs_timings.sql gerektirir)
+API_LOG_TIMINGS = os.getenv("API_LOG_TIMINGS", "0") in ("1", "true", "True")
+
+# Log yazımı senkron çalışır (kuyruk yok); yazım süresi ve hataları izlenir
+LOG_INSERT_LATENCY = registry.histogram(
+    "odie_api_log_insert_duration_ms", "api_logs INSERT süresi (ms)", ("mode",))
+LOG_INSERT_ERRORS = registry.counter(
+    "odie_api_log_insert_errors_total", "Yazılamayan log kaydı sayısı")
 
 class APILogger:
     """API işlemlerini log'lamak için basit sınıf"""
     
+    INSERT_LOG_SQL = """
+        INSERT INTO api_logs (
+            endpoint, method, operation_type, user_id, domain_id, request_data, 
+            response_data, success, error_message
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    INSERT_LOG = register_query("api_logs_insert", INSERT_LOG_SQL)
+    INSERT_LOG_WITH_TIMINGS = register_query("api_logs_insert_timings", """
+        INSERT INTO api_logs (
+            endpoint, method, operation_type, user_id, domain_id, request_data, 
+            response_data, success, error_message, timings
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """)
+    
     @staticmethod
     def log_operation(
         endpoint: str,
@@ -17,11 +45,15 @@ class APILogger:
         request_data: Optional[Dict[Any, Any]] = None,
         response_data: Optional[Dict[Any, Any]] = None,
         success: bool = True,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        conn=None
     ):
         """
         API işlemini veritabanında log'lar - Sadece POST, DELETE, PUT işlemleri loglanır
         
+        conn verilirse log kaydı isteğin transaction'ı içinde (savepoint ile) yazılır;
+        log hatası isteğin diğer değişikliklerini geri almaz.
+        
         Args:
             endpoint: API endpoint yolu
             method: HTTP method
@@ -32,6 +64,7 @@ class APILogger:
             response_data: Response verisi
             success: İşlem başarılı mı
             error_message: Hata mesajı
+            conn: İstek kapsamındaki veritabanı bağlantısı (opsiyonel)
         """
         # Sadece POST, DELETE, PUT işlemlerini logla
         if method.upper() not in ['POST', 'DELETE', 'PUT']:
@@ -41,31 +74,50 @@ class APILogger:
         if not operation_type:
             operation_type = APILogger._determine_operation_type(endpoint)
             
-        try:
-            conn = get_db_connection()
-            if not conn:
-                print("❌ Log kaydı için veritabanı bağlantısı kurulamadı")
-                return False
-                
+        # JSON verilerini string'e çevir
+        request_json = json.dumps(request_data, ensure_ascii=False) if request_data else None
+        response_json = json.dumps(response_data, ensure_ascii=False) if response_data else None
+        params = (
+            endpoint, method, operation_type, user_id, domain_id, request_json,
+            response_json, success, error_message
+        )
+        statement = APILogger.INSERT_LOG
+        timings = timing.current_timings() if API_LOG_TIMINGS else None
+        if timings is not None:
+            statement = APILogger.INSERT_LOG_WITH_TIMINGS
+            params += (json.dumps(timings),)
+        
+        started = time.perf_counter()
+        written = APILogger._write(statement, params, conn)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        LOG_INSERT_LATENCY.labels("request" if conn is not None else "standalone").observe(elapsed_ms)
+        timing.record("log_insert", elapsed_ms)
+        if not written:
+            LOG_INSERT_ERRORS.inc()
+        return written
+
+    @staticmethod
+    def _write(statement, params, conn=None):
+        """Log kaydını yazar; başarılıysa True döner"""
+        if conn is not None:
+            # İsteğin transaction'ı içinde, savepoint ile tek round-trip'te yaz
             cursor = conn.cursor()
+            try:
+                insert_sql = prepared_sql(cursor, statement)
+                cursor.execute(f"SAVEPOINT api_log; {insert_sql}; RELEASE SAVEPOINT api_log", params)
+                return True
+            except Exception as e:
+                print(f"❌ Log kaydetme hatası: {e}")
+                try:
+                    cursor.execute("ROLLBACK TO SAVEPOINT api_log")
+                except Exception:
+                    pass
+                return False
             
-            # JSON verilerini string'e çevir
-            request_json = json.dumps(request_data, ensure_ascii=False) if request_data else None
-            response_json = json.dumps(response_data, ensure_ascii=False) if response_data else None
-            
-            # Log kaydını ekle
-            cursor.execute("""
-                INSERT INTO api_logs (
-                    endpoint, method, operation_type, user_id, domain_id, request_data, 
-                    response_data, success, error_message
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                endpoint, method, operation_type, user_id, domain_id, request_json,
-                response_json, success, error_message
-            ))
-            
-            conn.commit()
-            conn.close()
+        try:
+            with db_session() as conn:
+                cursor = conn.cursor()
+                cursor.execute(prepared_sql(cursor, statement), params)
             return True
             
         except Exception as e:
@@ -96,13 +148,42 @@ class APILogger:
         else:
             return 'other'
 
+    @staticmethod
+    def _build_filters(user_id=None, endpoint=None, operation_type=None):
+        """
+        Log sorguları için dinamik WHERE koşulunu oluşturur
+        
+        Returns:
+            tuple: (where_clause, params)
+        """
+        where_conditions = []
+        params = []
+        
+        if user_id:
+            where_conditions.append("user_id = %s")
+            params.append(user_id)
+            
+        if endpoint:
+            where_conditions.append("endpoint ILIKE %s")
+            params.append(f"%{endpoint}%")
+            
+        if operation_type:
+            where_conditions.append("operation_type = %s")
+            params.append(operation_type)
+        
+        where_clause = ""
+        if where_conditions:
+            where_clause = "WHERE " + " AND ".join(where_conditions)
+        return where_clause, params
+
     @staticmethod
     def get_logs(
         user_id: Optional[str] = None,
         endpoint: Optional[str] = None,
         operation_type: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        conn=None
     ):
         """
         Log kayıtlarını getirir
@@ -118,52 +199,29 @@ class APILogger:
             Dict: Log kayıtları
         """
         try:
-            conn = get_db_connection()
-            if not conn:
-                return {"success": False, "message": "Veritabanı bağlantısı kurulamadı"}
-                
-            cursor = conn.cursor()
+            where_clause, params = APILogger._build_filters(user_id, endpoint, operation_type)
             
-            # Dinamik WHERE koşulları oluştur
-            where_conditions = []
-            params = []
-            
-            if user_id:
-                where_conditions.append("user_id = %s")
-                params.append(user_id)
+            with db_session(conn) as conn:
+                cursor = conn.cursor()
                 
-            if endpoint:
-                where_conditions.append("endpoint ILIKE %s")
-                params.append(f"%{endpoint}%")
+                # Toplam kayıt sayısını al
+                count_query = f"SELECT COUNT(*) FROM api_logs {where_clause}"
+                cursor.execute(count_query, params)
+                total_count = cursor.fetchone()[0]
                 
-            if operation_type:
-                where_conditions.append("operation_type = %s")
-                params.append(operation_type)
-            
-            # WHERE clause oluştur
-            where_clause = ""
-            if where_conditions:
-                where_clause = "WHERE " + " AND ".join(where_conditions)
-            
-            # Toplam kayıt sayısını al
-            count_query = f"SELECT COUNT(*) FROM api_logs {where_clause}"
-            cursor.execute(count_query, params)
-            total_count = cursor.fetchone()[0]
-            
-            # Log kayıtlarını al
-            query = f"""
-                SELECT id, endpoint, method, operation_type, user_id, domain_id, request_data, 
-                       response_data, success, error_message, created_at
-                FROM api_logs 
-                {where_clause}
-                ORDER BY created_at DESC
-                LIMIT %s OFFSET %s
-            """
-            
-            params.extend([limit, offset])
-            cursor.execute(query, params)
-            logs = cursor.fetchall()
-            conn.close()
+                # Log kayıtlarını al
+                query = f"""
+                    SELECT id, endpoint, method, operation_type, user_id, domain_id, request_data, 
+                           response_data, success, error_message, created_at
+                    FROM api_logs 
+                    {where_clause}
+                    ORDER BY created_at DESC
+                    LIMIT %s OFFSET %s
+                """
+                
+                params.extend([limit, offset])
+                cursor.execute(query, params)
+                logs = cursor.fetchall()
             
             # Log kayıtlarını formatla
             log_list = []
@@ -211,3 +269,56 @@ class APILogger:
         except Exception as e:
             print(f"❌ Log getirme hatası: {e}")
             return {"success": False, "message": f"Log getirme hatası: {e}"}
+
+    # Hızlı serileştirme yolunda kullanılan kolonlar (request/response JSONB text olarak gelir)
+    LOG_COLUMNS = ("id", "endpoint", "method", "operation_type", "user_id", "domain_id", "request_data",
+                   "response_data", "success", "error_message", "created_at")
+    LOG_RAW_JSON_COLUMNS = ("request_data", "response_data")
+
+    @staticmethod
+    def get_log_rows(
+        user_id: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        operation_type: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        conn=None
+    ):
+        """
+        get_logs ile aynı filtreleri uygular ancak satırları tuple olarak döndürür.
+        JSONB alanları Python nesnesine çevrilmeden text olarak gelir, böylece
+        fast_json.encode_payload ile doğrudan yanıta gömülebilir.
+        
+        Returns:
+            Dict: {"success", "columns", "rows", "total_count", "limit", "offset"}
+        """
+        try:
+            where_clause, params = APILogger._build_filters(user_id, endpoint, operation_type)
+            
+            with db_session(conn) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT COUNT(*) FROM api_logs {where_clause}", params)
+                total_count = cursor.fetchone()[0]
+                
+                cursor.execute(f"""
+                    SELECT id, endpoint, method, operation_type, user_id, domain_id, request_data::text,
+                           response_data::text, success, error_message, created_at
+                    FROM api_logs 
+                    {where_clause}
+                    ORDER BY created_at DESC
+                    LIMIT %s OFFSET %s
+                """, params + [limit, offset])
+                rows = cursor.fetchall()
+            
+            return {
+                "success": True,
+                "columns": APILogger.LOG_COLUMNS,
+                "rows": rows,
+                "total_count": total_count,
+                "limit": limit,
+                "offset": offset
+            }
+            
+        except Exception as e:
+            print(f"❌ Log getirme hatası: {e}")
+            return {"success": False, "message": f"Log getirme hatası: {e}"}
@@ -1,15 +1,64 @@
-from user_ops import add_user, disable_user, delete_user
-from db_ops import get_db_connection
-from ldap_handler import get_ldap_connection_by_domain_id
+"""
+🖥️ ODIE CLI
+
+Tüm işlemler API üzerinden yapılır; istekler thread başına tek bir keep-alive
+requests.Session ile gönderilir (her menü işleminde yeni TCP bağlantısı açılmaz).
+
+Kullanım:
+    python main.py                                               # etkileşimli menü
+    python main.py --batch islemler.csv --user-id <UUID> --workers 8
+    python main.py --batch islemler.txt --user-id <UUID> --domain-id 1 --output sonuc.csv
+"""
+
+import argparse
+import csv
+import os
+import shlex
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
-# API endpoint sabitleri
-API_BASE_URL = "http://localhost:8000"  # API sunucu adresi
+# API endpoint sabitleri (.env üzerinden değiştirilebilir)
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")  # API sunucu adresi
+API_TIMEOUT = float(os.getenv("CLI_API_TIMEOUT", "30"))
+
+# Thread başına bir oturum: bağlantı keep-alive ile yeniden kullanılır
+_local = threading.local()
+
+def get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+def api_request(method, url, **kwargs):
+    """Thread'in oturumu üzerinden istek gönderir (varsayılan zaman aşımı API_TIMEOUT)"""
+    kwargs.setdefault("timeout", API_TIMEOUT)
+    return get_session().request(method, url, **kwargs)
+
+def print_api_result(response, success_message, error_message):
+    """Kullanıcı işlemi yanıtını ekrana yazar"""
+    if response.status_code == 200:
+        result = response.json()
+        message = result.get("message") or result.get("status")
+        if result.get("success"):
+            print(f"✅ {message or success_message}")
+        else:
+            print(f"❌ {message or error_message}")
+    else:
+        print(f"❌ API Hatası: {response.status_code}")
 
 def list_domains(current_user_id):
     try:
-        response = requests.get(f"{API_BASE_URL}/list_domains", params={"user_id": current_user_id})
+        response = api_request("GET", f"{API_BASE_URL}/list_domains", params={"user_id": current_user_id})
         if response.status_code == 200:
             data = response.json()
             domains = [(d["id"], d["domain_name"]) for d in data["domains"]]
@@ -59,8 +108,7 @@ def add_domain_api(current_user_id):
             "created_by": current_user_id
         }
         
-        response = requests.post(
-            f"{API_BASE_URL}/add_domain", 
+        response = api_request("POST", f"{API_BASE_URL}/add_domain", 
             data=json.dumps(domain_data),
             headers={"Content-Type": "application/json"}
         )
@@ -99,7 +147,7 @@ def delete_domain_api(current_user_id):
             return
             
         # API'den domain'i sil
-        response = requests.delete(f"{API_BASE_URL}/delete_domain/{domain_id}", params={"user_id": current_user_id})
+        response = api_request("DELETE", f"{API_BASE_URL}/delete_domain/{domain_id}", params={"user_id": current_user_id})
         
         if response.status_code == 200:
             result = response.json()
@@ -147,8 +195,8 @@ def domain_menu(current_user_id):
         else:
             print("❌ Geçersiz seçim. Lütfen 1-4 arasında bir değer girin.")
 
-def main():
-    current_user_id = input("Kullanıcı UUID'nizi girin (frontend'den alınan): ")
+def interactive(current_user_id=None):
+    current_user_id = current_user_id or input("Kullanıcı UUID'nizi girin (frontend'den alınan): ")
     while True:
         print("\n🔧 Ana Menü")
         print("1) Domain işlemleri")
@@ -188,17 +236,19 @@ def kullanici_menu(domain_id, current_user_id):
 
         alt_secim = input("Seçiminizi yapın (1-5): ")
         
-        if alt_secim == "1":
-            username = input("Kullanıcı adı: ")
-            disable_user(domain_id, username, current_user_id)
-
-        elif alt_secim == "2":
+        if alt_secim in ("1", "2", "3"):
             username = input("Kullanıcı adı: ")
-            disable_user(domain_id, username, current_user_id, enable=True)
-
-        elif alt_secim == "3":
-            username = input("Kullanıcı adı: ")
-            delete_user(domain_id, username, current_user_id)
+            user_data = {"username": username, "domain_id": domain_id, "user_id": current_user_id}
+            try:
+                if alt_secim == "1":
+                    response = api_request("POST", f"{API_BASE_URL}/disable_user", json=user_data)
+                elif alt_secim == "2":
+                    response = api_request("POST", f"{API_BASE_URL}/enable_user", json=user_data)
+                else:
+                    response = api_request("DELETE", f"{API_BASE_URL}/delete_user", json=user_data)
+                print_api_result(response, "İşlem başarılı", "İşlem başarısız")
+            except Exception as e:
+                print(f"❌ Hata: {e}")
             
         elif alt_secim == "4":
             username = input("Kullanıcı adı: ")
@@ -209,8 +259,7 @@ def kullanici_menu(domain_id, current_user_id):
             
             # Domain'e ait departmanları listele
             try:
-                response = requests.get(
-                    f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
+                response = api_request("GET", f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
                     params={"user_id": current_user_id}
                 )
                 
@@ -238,7 +287,20 @@ def kullanici_menu(domain_id, current_user_id):
                 print(f"❌ Hata: {e}")
                 department_id = None
 
-            add_user(domain_id, username, first, last, password, role_id, department_id, current_user_id)
+            try:
+                response = api_request("POST", f"{API_BASE_URL}/add_user", json={
+                    "username": username,
+                    "first_name": first,
+                    "last_name": last,
+                    "password": password,
+                    "role_id": role_id,
+                    "department_id": department_id,
+                    "domain_id": domain_id,
+                    "created_by": current_user_id
+                })
+                print_api_result(response, "Kullanıcı eklendi", "Kullanıcı eklenirken hata oluştu")
+            except Exception as e:
+                print(f"❌ Hata: {e}")
 
         elif alt_secim == "5":
             print("📋 Ana menüye dönülüyor...")
@@ -262,8 +324,7 @@ def department_menu(domain_id, current_user_id):
             print("\n📋 Departman Listesi:")
             try:
                 # API'den departmanları getir
-                response = requests.get(
-                    f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
+                response = api_request("GET", f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
                     params={"user_id": current_user_id}
                 )
                 
@@ -295,8 +356,7 @@ def department_menu(domain_id, current_user_id):
                     "created_by": current_user_id
                 }
                 
-                response = requests.post(
-                    f"{API_BASE_URL}/add_department", 
+                response = api_request("POST", f"{API_BASE_URL}/add_department", 
                     json=department_data
                 )
                 
@@ -316,8 +376,7 @@ def department_menu(domain_id, current_user_id):
             
             # Önce departmanları listele
             try:
-                response = requests.get(
-                    f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
+                response = api_request("GET", f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
                     params={"user_id": current_user_id}
                 )
                 
@@ -337,8 +396,7 @@ def department_menu(domain_id, current_user_id):
                                 "department_name": new_name
                             }
                             
-                            update_response = requests.put(
-                                f"{API_BASE_URL}/update_department/{domain_id}/{department_id}", 
+                            update_response = api_request("PUT", f"{API_BASE_URL}/update_department/{domain_id}/{department_id}", 
                                 json=update_data,
                                 params={"user_id": current_user_id}
                             )
@@ -365,8 +423,7 @@ def department_menu(domain_id, current_user_id):
             
             # Önce departmanları listele
             try:
-                response = requests.get(
-                    f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
+                response = api_request("GET", f"{API_BASE_URL}/list_departments_by_domain/{domain_id}", 
                     params={"user_id": current_user_id}
                 )
                 
@@ -387,8 +444,7 @@ def department_menu(domain_id, current_user_id):
                                 print("❓ Silme işlemi iptal edildi.")
                                 continue
                                 
-                            delete_response = requests.delete(
-                                f"{API_BASE_URL}/delete_department/{domain_id}/{department_id}", 
+                            delete_response = api_request("DELETE", f"{API_BASE_URL}/delete_department/{domain_id}/{department_id}", 
                                 params={"user_id": current_user_id}
                             )
                             
@@ -416,5 +472,206 @@ def department_menu(domain_id, current_user_id):
         else:
             print("❌ Geçersiz seçim. Lütfen 1-5 arasında bir değer girin.")
             
+# 📦 Toplu işlem modu
+# CSV (başlık satırıyla) veya betik dosyası ("işlem anahtar=değer ..." satırları, # yorum) okunur.
+# Aynı kullanıcıya/departmana ait satırlar dosyadaki sırayla, farklı olanlar --workers kadar
+# eşzamanlı çalıştırılır.
+BATCH_ACTIONS = ("add_user", "disable_user", "enable_user", "delete_user", "update_user",
+                 "add_department", "update_department", "delete_department")
+
+class BatchError(ValueError):
+    """Toplu işlem satırı geçersiz"""
+
+def read_batch_file(path):
+    """
+    Returns:
+        list: [(satır no, {"action": ..., alan: değer}), ...]
+    """
+    handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if path.lower().endswith(".csv"):
+            # Başlık satırı 1. satırdır
+            return [(index, {k.strip(): (v or "").strip() for k, v in row.items() if k})
+                    for index, row in enumerate(csv.DictReader(handle), start=2)]
+
+        operations = []
+        for index, line in enumerate(handle, start=1):
+            tokens = shlex.split(line, comments=True)
+            if not tokens:
+                continue
+            operation = {"action": tokens[0]}
+            for token in tokens[1:]:
+                key, separator, value = token.partition("=")
+                if not separator:
+                    raise BatchError(f"{path}:{index}: 'anahtar=değer' bekleniyordu: {token}")
+                operation[key] = value
+            operations.append((index, operation))
+        return operations
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+def _field(operation, name, required=True, cast=str):
+    value = operation.get(name)
+    if value in (None, ""):
+        if required:
+            raise BatchError(f"'{name}' alanı gerekli")
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise BatchError(f"'{name}' alanı geçersiz: {value}")
+
+def build_batch_request(operation, user_id=None, domain_id=None):
+    """
+    Satırı API isteğine çevirir
+
+    Returns:
+        tuple: (method, path, kwargs, sıralama anahtarı)
+    """
+    action = operation.get("action")
+    if action not in BATCH_ACTIONS:
+        raise BatchError(f"Bilinmeyen işlem: {action}")
+    user_id = operation.get("user_id") or user_id
+    if domain_id is not None and not operation.get("domain_id"):
+        operation = {**operation, "domain_id": str(domain_id)}
+    domain = _field(operation, "domain_id", cast=int)
+
+    if action.endswith("_department"):
+        if action == "add_department":
+            name = _field(operation, "department_name")
+            if not user_id:
+                raise BatchError("add_department için user_id gerekli (--user-id)")
+            return ("POST", "/add_department",
+                    {"json": {"department_name": name, "domain_id": domain, "created_by": user_id}},
+                    ("department", domain, name))
+        department_id = _field(operation, "department_id", cast=int)
+        key = ("department", domain, department_id)
+        if action == "update_department":
+            return ("PUT", f"/update_department/{domain}/{department_id}",
+                    {"json": {"department_name": _field(operation, "department_name")}, "params": {"user_id": user_id}},
+                    key)
+        return "DELETE", f"/delete_department/{domain}/{department_id}", {"params": {"user_id": user_id}}, key
+
+    username = _field(operation, "username")
+    key = ("user", domain, username.lower())
+    if action == "add_user":
+        return ("POST", "/add_user", {"json": {
+            "username": username,
+            "first_name": _field(operation, "first_name"),
+            "last_name": _field(operation, "last_name"),
+            "password": _field(operation, "password"),
+            "role_id": _field(operation, "role_id", required=False, cast=int) or 2,
+            "department_id": _field(operation, "department_id", required=False, cast=int),
+            "domain_id": domain,
+            "created_by": user_id
+        }}, key)
+    if action == "update_user":
+        changes = {}
+        for name, cast in (("first_name", str), ("last_name", str), ("password", str),
+                           ("role_id", int), ("department_id", int)):
+            value = _field(operation, name, required=False, cast=cast)
+            if value is not None:
+                changes[name] = value
+        if not changes:
+            raise BatchError("update_user için en az bir alan gerekli")
+        return "PUT", f"/update_user/{domain}/{username}", {"json": changes, "params": {"user_id": user_id}}, key
+
+    user_data = {"username": username, "domain_id": domain, "user_id": user_id}
+    if action == "delete_user":
+        return "DELETE", "/delete_user", {"json": user_data}, key
+    return "POST", f"/{action}", {"json": user_data}, key
+
+def _execute_batch_request(method, path, kwargs):
+    """Returns: (başarılı mı, mesaj)"""
+    try:
+        response = api_request(method, f"{API_BASE_URL}{path}", **kwargs)
+    except requests.RequestException as e:
+        return False, f"Bağlantı hatası: {e}"
+    try:
+        result = response.json()
+    except ValueError:
+        result = {}
+    if response.status_code != 200:
+        detail = result.get("detail") or result.get("message") if isinstance(result, dict) else None
+        return False, f"API Hatası: {response.status_code}" + (f" - {detail}" if detail else "")
+    message = result.get("message") or result.get("status") or ""
+    return bool(result.get("success")), str(message)
+
+def run_batch(operations, workers=4, user_id=None, domain_id=None):
+    """
+    Satırları çalıştırır; her satırın sonucu tamamlandıkça yazdırılır
+
+    Returns:
+        list: [{"line", "action", "target", "success", "message"}, ...] (satır sırasıyla)
+    """
+    results = {}
+    # Sıralama anahtarı -> [(satır, method, path, kwargs), ...]
+    chains = OrderedDict()
+    for line, operation in operations:
+        action = operation.get("action", "")
+        target = operation.get("username") or operation.get("department_name") or operation.get("department_id") or ""
+        try:
+            method, path, kwargs, key = build_batch_request(operation, user_id, domain_id)
+        except BatchError as e:
+            results[line] = {"line": line, "action": action, "target": target, "success": False, "message": str(e)}
+            print(f"❌ Satır {line}: {action} {target} - {e}")
+            continue
+        chains.setdefault(key, []).append((line, action, target, method, path, kwargs))
+
+    print_lock = threading.Lock()
+
+    def run_chain(chain):
+        for line, action, target, method, path, kwargs in chain:
+            success, message = _execute_batch_request(method, path, kwargs)
+            results[line] = {"line": line, "action": action, "target": target, "success": success, "message": message}
+            with print_lock:
+                print(f"{'✅' if success else '❌'} Satır {line}: {action} {target} - {message}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_chain, chain) for chain in chains.values()]
+        for future in as_completed(futures):
+            future.result()
+
+    return [results[line] for line in sorted(results)]
+
+def write_batch_results(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["line", "action", "target", "success", "message"])
+        writer.writeheader()
+        writer.writerows(results)
+
+def main():
+    global API_BASE_URL
+    parser = argparse.ArgumentParser(description="ODIE CLI")
+    parser.add_argument("--base-url", default=API_BASE_URL, help="API sunucu adresi")
+    parser.add_argument("--user-id", help="İşlemi yapan kullanıcının UUID'si")
+    parser.add_argument("--batch", metavar="DOSYA",
+                        help="Toplu işlem dosyası (.csv veya betik; '-' = stdin)")
+    parser.add_argument("--domain-id", type=int, help="Toplu işlemde domain_id verilmeyen satırlar için")
+    parser.add_argument("--workers", type=int, default=4, help="Toplu işlemde eşzamanlı istek sayısı")
+    parser.add_argument("--output", help="Toplu işlem sonuçlarını bu CSV dosyasına yaz")
+    args = parser.parse_args()
+    API_BASE_URL = args.base_url.rstrip("/")
+
+    if not args.batch:
+        interactive(args.user_id)
+        return
+
+    try:
+        operations = read_batch_file(args.batch)
+    except (OSError, BatchError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    print(f"📦 {len(operations)} işlem çalıştırılıyor ({args.workers} eşzamanlı)...")
+    results = run_batch(operations, workers=args.workers, user_id=args.user_id, domain_id=args.domain_id)
+    failed = sum(1 for r in results if not r["success"])
+    print(f"\n📊 Toplam {len(results)} işlem: {len(results) - failed} başarılı, {failed} başarısız")
+    if args.output:
+        write_batch_results(results, args.output)
+        print(f"💾 Sonuçlar yazıldı: {args.output}")
+    sys.exit(1 if failed else 0)
+
 if __name__ == "__main__":
     main()
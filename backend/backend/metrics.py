@@ -0,0 +1,256 @@
+import bisect
+import threading
+
+# Varsayılan gecikme kovaları (milisaniye)
+DEFAULT_MS_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    Sabit kovalı, thread-safe gecikme histogramı.
+    Gözlemler kovalara sayılır; yüzdelikler kova sınırları arasında
+    doğrusal interpolasyonla tahmin edilir.
+    """
+
+    def __init__(self, buckets=DEFAULT_MS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # son kova: +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self):
+        """(kova sayıları, toplam, adet, maksimum) kopyasını döndürür"""
+        with self._lock:
+            return list(self._counts), self._sum, self._count, self._max
+
+    def quantile(self, q):
+        """q (0-1) yüzdeliğinin tahmini değeri; gözlem yoksa None"""
+        counts, _, count, maximum = self.snapshot()
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                upper = min(upper, maximum)
+                return lower + (upper - lower) * ((rank - seen) / bucket_count)
+            seen += bucket_count
+        return maximum
+
+    def summary(self):
+        counts, total, count, maximum = self.snapshot()
+        return {
+            "count": count,
+            "sum_ms": round(total, 3),
+            "avg_ms": round(total / count, 3) if count else None,
+            "max_ms": round(maximum, 3),
+            "p50_ms": _round(self.quantile(0.50)),
+            "p95_ms": _round(self.quantile(0.95)),
+            "p99_ms": _round(self.quantile(0.99)),
+        }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+# ---------------------------------------------------------------------------
+# Prometheus metin formatı (text exposition 0.0.4) için basit metrik kayıt defteri
+# ---------------------------------------------------------------------------
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class Gauge:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+class MetricFamily:
+    """Aynı isimli metriğin etiket kombinasyonlarına göre alt metrikleri"""
+
+    _types = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+    def __init__(self, name, documentation, metric_type, labelnames=(), buckets=None):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name}: {len(self.labelnames)} etiket bekleniyor")
+        key = tuple(str(v) for v in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    if self.type == "histogram" and self.buckets:
+                        child = Histogram(self.buckets)
+                    else:
+                        child = self._types[self.type]()
+                    self._children[key] = child
+        return child
+
+    # Etiketsiz metrikler için kısayollar
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            children = list(self._children.items())
+        for labelvalues, child in children:
+            if self.type == "histogram":
+                counts, total, count, _ = child.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(list(child.buckets) + [float("inf")], counts):
+                    cumulative += bucket_count
+                    le = 'le="' + _format_value(float(bound)) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+                lines.append(f"{self.name}_count{labels} {count}")
+            else:
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}{labels} {_format_value(float(child.value))}")
+        return lines
+
+
+class CallbackGauge:
+    """Değeri her toplamada bir fonksiyondan okunan gauge (ör. havuz kullanımı)"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, func, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            samples = self.func()
+        except Exception:
+            return lines
+        if not isinstance(samples, (list, tuple)):
+            samples = [((), samples)]
+        for labelvalues, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(float(value))}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(MetricFamily(name, documentation, "counter", labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(MetricFamily(name, documentation, "gauge", labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_MS_BUCKETS):
+        return self._register(MetricFamily(name, documentation, "histogram", labelnames, buckets))
+
+    def gauge_callback(self, name, documentation, func, labelnames=()):
+        """func() tek bir değer veya [(etiket değerleri, değer), ...] döndürmelidir"""
+        return self._register(CallbackGauge(name, documentation, func, labelnames))
+
+    def render(self):
+        """Tüm metrikleri Prometheus metin formatında döndürür"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Uygulama genelinde paylaşılan metrik kayıt defteri
+registry = MetricsRegistry()
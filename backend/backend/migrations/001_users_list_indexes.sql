@@ -0,0 +1,27 @@
+-- /list_users_by_domain sayfalama, sıralama ve arama için indeksler
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Keyset sayfalama: (domain_id, sıralama anahtarı, id)
+CREATE INDEX IF NOT EXISTS idx_users_domain_username_id
+    ON users (domain_id, username, id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_status_username_id
+    ON users (domain_id, status, username, id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_first_name_id
+    ON users (domain_id, (COALESCE(first_name, '')), id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_last_name_id
+    ON users (domain_id, (COALESCE(last_name, '')), id);
+
+-- ILIKE '%metin%' araması için trigram indeksleri
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+    ON users USING gin (username gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_users_first_name_trgm
+    ON users USING gin (first_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_users_last_name_trgm
+    ON users USING gin (last_name gin_trgm_ops);
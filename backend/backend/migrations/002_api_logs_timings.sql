@@ -0,0 +1,5 @@
+-- API_LOG_TIMINGS=1 için istek faz sürelerini (Server-Timing) saklayan kolon
+-- Örnek değer: {"db_acquire": 0.4, "ldap_bind": 38.2, "ldap_add": 21.7, "sleep": 1001.3, "bcrypt": 243.9}
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+
+ALTER TABLE api_logs ADD COLUMN IF NOT EXISTS timings JSONB;
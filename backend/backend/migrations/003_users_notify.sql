@@ -0,0 +1,19 @@
+-- Kullanıcı okuma modeli (user_index.py, USER_INDEX_ENABLED=1) için değişiklik bildirimleri
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- Bildirim sadece işlem türü ve id taşır; worker'lar satırın güncel halini kendisi okur.
+
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'users_changed',
+        json_build_object('op', TG_OP, 'id', COALESCE(NEW.id, OLD.id))::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_notify ON users;
+
+CREATE TRIGGER trg_users_notify
+    AFTER INSERT OR UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_users_changed();
@@ -0,0 +1,71 @@
+-- Departman başına kullanıcı sayıları (toplam, devrede, devre dışı)
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- Sayılar users tablosundaki trigger ile aynı transaction içinde güncellenir; bu yüzden
+-- add_user, update_user, delete_user, delete_department ve LDAP senkronizasyonu ek bir
+-- işlem yapmadan sayıları tutarlı tutar.
+
+BEGIN;
+
+ALTER TABLE departments
+    ADD COLUMN IF NOT EXISTS user_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS active_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS disabled_count INTEGER NOT NULL DEFAULT 0;
+
+-- /list_users_by_department ve departman silme için üyelik indeksi
+CREATE INDEX IF NOT EXISTS idx_users_department_id
+    ON users (department_id) WHERE department_id IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION users_department_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.department_id IS NOT NULL THEN
+        UPDATE departments
+        SET user_count = user_count - 1,
+            active_count = active_count - CASE WHEN OLD.status = 'devrede' THEN 1 ELSE 0 END,
+            disabled_count = disabled_count - CASE WHEN OLD.status = 'devre dışı' THEN 1 ELSE 0 END
+        WHERE id = OLD.department_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.department_id IS NOT NULL THEN
+        UPDATE departments
+        SET user_count = user_count + 1,
+            active_count = active_count + CASE WHEN NEW.status = 'devrede' THEN 1 ELSE 0 END,
+            disabled_count = disabled_count + CASE WHEN NEW.status = 'devre dışı' THEN 1 ELSE 0 END
+        WHERE id = NEW.department_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_department_counts ON users;
+DROP TRIGGER IF EXISTS trg_users_department_counts_update ON users;
+
+CREATE TRIGGER trg_users_department_counts
+    AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION users_department_counts();
+
+-- Departmanı veya durumu değişmeyen güncellemeler (ör. şifre) sayılara dokunmaz
+CREATE TRIGGER trg_users_department_counts_update
+    AFTER UPDATE OF department_id, status ON users
+    FOR EACH ROW
+    WHEN (OLD.department_id IS DISTINCT FROM NEW.department_id OR OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION users_department_counts();
+
+-- Mevcut veriden doldur (trigger'lar aynı transaction'da oluşturulduğu için arada yazma olmaz)
+UPDATE departments d
+SET user_count = COALESCE(c.total, 0),
+    active_count = COALESCE(c.active, 0),
+    disabled_count = COALESCE(c.disabled, 0)
+FROM departments d2
+LEFT JOIN (
+    SELECT department_id,
+           COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE status = 'devrede') AS active,
+           COUNT(*) FILTER (WHERE status = 'devre dışı') AS disabled
+    FROM users
+    WHERE department_id IS NOT NULL
+    GROUP BY department_id
+) c ON c.department_id = d2.id
+WHERE d.id = d2.id;
+
+COMMIT;
@@ -0,0 +1,21 @@
+-- Departman adının domain içinde büyük/küçük harf duyarsız benzersizliği
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- add_department / update_department bu indekse dayanarak kontrol ve yazmayı tek sorguda yapar.
+
+BEGIN;
+
+-- Daha önce oluşmuş aynı isimli departmanlar (ilki hariç) "<ad> (<id>)" olarak yeniden adlandırılır;
+-- kullanıcı bağlantıları değişmez, gerekirse elle birleştirilebilir
+UPDATE departments d
+SET department_name = d.department_name || ' (' || d.id || ')'
+WHERE EXISTS (
+    SELECT 1 FROM departments o
+    WHERE o.domain_id = d.domain_id
+      AND LOWER(o.department_name) = LOWER(d.department_name)
+      AND o.id < d.id
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_departments_domain_lower_name
+    ON departments (domain_id, (LOWER(department_name)));
+
+COMMIT;
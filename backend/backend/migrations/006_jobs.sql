@@ -0,0 +1,39 @@
+-- Arka plan iş kuyruğu (job_queue.py, job_worker.py)
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- Durumlar: queued, running, succeeded, failed, cancelled
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    priority SMALLINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    -- Çalışan worker bu süreye kadar işi sahiplenir; süre dolarsa (worker öldüyse) iş yeniden alınır
+    locked_until TIMESTAMP WITH TIME ZONE,
+    worker_id VARCHAR(255),
+    cancel_requested BOOLEAN NOT NULL DEFAULT false,
+    progress_current INTEGER,
+    progress_total INTEGER,
+    progress_message TEXT,
+    result JSONB,
+    last_error TEXT,
+    created_by VARCHAR(255),
+    domain_id INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Worker'ların sıradaki işi SKIP LOCKED ile seçmesi için
+CREATE INDEX IF NOT EXISTS idx_jobs_queued
+    ON jobs (priority DESC, run_after, id) WHERE status = 'queued';
+
+-- Sahipliği düşmüş (worker'ı ölmüş) işlerin bulunması için
+CREATE INDEX IF NOT EXISTS idx_jobs_running_lease
+    ON jobs (locked_until) WHERE status = 'running';
+
+CREATE INDEX IF NOT EXISTS idx_jobs_created_by
+    ON jobs (created_by, created_at DESC);
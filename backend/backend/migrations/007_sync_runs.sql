@@ -0,0 +1,23 @@
+-- Periyodik LDAP senkronizasyonu (sync_scheduler.py)
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+
+-- Domain bazlı senkronizasyon aralığı (saniye); NULL ise SYNC_INTERVAL_SECONDS, 0 ise kapalı
+ALTER TABLE domains ADD COLUMN IF NOT EXISTS sync_interval_seconds INTEGER;
+
+-- Her senkronizasyon çalışmasının kaydı
+-- status: running, succeeded, failed, skipped (aynı domain'in önceki çalışması sürüyordu)
+CREATE TABLE IF NOT EXISTS sync_runs (
+    id BIGSERIAL PRIMARY KEY,
+    domain_id INTEGER NOT NULL REFERENCES domains (id) ON DELETE CASCADE,
+    trigger VARCHAR(20) NOT NULL DEFAULT 'schedule',
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE,
+    duration_ms INTEGER,
+    users_seen INTEGER,
+    rows_changed INTEGER,
+    error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_runs_domain_started
+    ON sync_runs (domain_id, started_at DESC);
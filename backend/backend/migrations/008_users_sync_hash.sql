@@ -0,0 +1,19 @@
+-- LDAP senkronizasyonu için değişiklik tespiti (db_ops.sync_ldap_users_to_supabase)
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- content_hash: kullanıcı adı, ad, soyad, durum ve DN'den hesaplanan özet; sadece özeti
+-- değişen satırlar yazılır. content_hash'i dolu olan satırlar LDAP'ten gelmiştir ve LDAP'te
+-- bulunamazlarsa silinmiş kabul edilir.
+
+ALTER TABLE users
+    ADD COLUMN IF NOT EXISTS distinguished_name TEXT,
+    ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
+
+-- Silinen kullanıcı tespiti: domain'in senkronize edilmiş kullanıcıları
+CREATE INDEX IF NOT EXISTS idx_users_domain_synced
+    ON users (domain_id) WHERE content_hash IS NOT NULL;
+
+ALTER TABLE sync_runs
+    ADD COLUMN IF NOT EXISTS inserted INTEGER,
+    ADD COLUMN IF NOT EXISTS updated INTEGER,
+    ADD COLUMN IF NOT EXISTS unchanged INTEGER,
+    ADD COLUMN IF NOT EXISTS deleted INTEGER;
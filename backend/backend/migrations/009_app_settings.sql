@@ -0,0 +1,10 @@
+-- Küme genelinde ortak uygulama ayarları
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+-- bcrypt_rounds: ilk başlayan süreç tarafından ölçülüp yazılan bcrypt cost değeri (user_ops.bcrypt_rounds).
+-- Yeniden ölçüm için: DELETE FROM app_settings WHERE key = 'bcrypt_rounds';
+
+CREATE TABLE IF NOT EXISTS app_settings (
+    key VARCHAR(100) PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
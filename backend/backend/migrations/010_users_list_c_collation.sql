@@ -0,0 +1,20 @@
+-- /list_users_by_domain sıralaması COLLATE "C" (kod noktası sırası) ile yapılır; kullanıcı okuma
+-- modeli (user_index.py) de aynı sırayı kullanır, böylece bir cursor iki yolda da aynı yere işaret eder.
+-- Supabase SQL Editor'de veya psql ile çalıştırın.
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_username_c_id
+    ON users (domain_id, (username COLLATE "C"), id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_status_username_c_id
+    ON users (domain_id, status, (username COLLATE "C"), id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_first_name_c_id
+    ON users (domain_id, (COALESCE(first_name, '') COLLATE "C"), id);
+
+CREATE INDEX IF NOT EXISTS idx_users_domain_last_name_c_id
+    ON users (domain_id, (COALESCE(last_name, '') COLLATE "C"), id);
+
+-- Eski sıralama indeksleri sadece veritabanı collation'ıyla sıralamaya hizmet ediyordu
+-- (username indeksleri kullanıcı adı aramalarında kullanıldığı için korunur)
+DROP INDEX IF EXISTS idx_users_domain_first_name_id;
+DROP INDEX IF EXISTS idx_users_domain_last_name_id;
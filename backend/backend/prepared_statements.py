@@ -0,0 +1,81 @@
+import hashlib
+import os
+import re
+import threading
+
+# Sık çalışan sorgular bağlantı başına bir kez PREPARE edilip isimle çalıştırılır.
+# PgBouncer transaction modunda (Supabase pooler, port 6543) prepared statement'lar
+# bağlantılar arasında taşınmadığı için varsayılan olarak kapalıdır; doğrudan
+# Postgres'e (5432) veya session modundaki pooler'a bağlanırken açın.
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "0") in ("1", "true", "True")
+
+_registry = {}
+_registry_lock = threading.Lock()
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def _to_positional(sql):
+    """psycopg2 (%s) yer tutucularını PREPARE için $1, $2, ... biçimine çevirir"""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+
+def register_query(name, sql):
+    """
+    Sorguyu registry'ye kaydeder
+
+    Args:
+        name (str): Statement adı; None ise SQL metninden türetilir (dinamik sorgular için).
+            Registry ve bağlantılardaki prepared statement'lar hiç silinmez; sadece sınırlı
+            sayıda biçimi olan sorgular kaydedilmelidir.
+        sql (str): psycopg2 biçiminde (%s yer tutuculu) sorgu
+
+    Returns:
+        str: Statement adı
+    """
+    if name is None:
+        name = "q_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+    with _registry_lock:
+        existing = _registry.get(name)
+        if existing is None:
+            positional, param_count = _to_positional(sql)
+            _registry[name] = (sql, positional, param_count)
+        elif existing[0] != sql:
+            raise ValueError(f"'{name}' adıyla farklı bir sorgu zaten kayıtlı")
+    return name
+
+
+def prepared_sql(cursor, name):
+    """
+    Kayıtlı sorgunun bu bağlantıda çalıştırılacak SQL metnini döndürür.
+
+    Prepared statement desteği açıksa sorgu bağlantıda ilk kullanımda PREPARE edilir
+    ve "EXECUTE name (%s, ...)" döner; kapalıysa veya bağlantı OdieConnection
+    değilse orijinal SQL döner. Dönen metin aynı parametrelerle çalıştırılır.
+    """
+    sql, positional, param_count = _registry[name]
+    prepared = getattr(cursor.connection, "prepared_statements", None)
+    if not DB_PREPARED_STATEMENTS or prepared is None:
+        return sql
+
+    if name not in prepared:
+        # PREPARE transaction'a bağlı değildir; rollback sonrası da oturumda kalır
+        cursor.execute(f"PREPARE {name} AS {positional}")
+        prepared.add(name)
+
+    if param_count == 0:
+        return f"EXECUTE {name}"
+    return f"EXECUTE {name} ({', '.join(['%s'] * param_count)})"
+
+
+def execute_prepared(cursor, name, params=None):
+    """Kayıtlı sorguyu (gerekirse PREPARE ederek) çalıştırır"""
+    cursor.execute(prepared_sql(cursor, name), params)
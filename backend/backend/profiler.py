@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Boşta bekleyen thread'lerin yaprak frame'leri (thread havuzu, event loop); varsayılan olarak atlanır
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("base_events.py", "_run_once"),
+}
+
+MAX_PROFILE_SECONDS = 60
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame, code_filter=None):
+    """Frame zincirini kökten yaprağa "a;b;c" biçimine çevirir; filtre eşleşmezse None"""
+    labels = []
+    matched = code_filter is None
+    while frame is not None:
+        if not matched and frame.f_code in code_filter:
+            matched = True
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if not matched:
+        return None
+    labels.reverse()
+    return ";".join(labels)
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """
+    sys._current_frames() ile periyodik örnekleme yapan düşük maliyetli profiler.
+    Çıktı flamegraph.pl / speedscope ile uyumlu "collapsed stack" biçimindedir.
+    Aynı anda tek bir profil oturumu çalışabilir.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds, interval_ms=5, code_filter=None, include_idle=False):
+        """
+        Çağıran thread'de seconds boyunca örnekleme yapar
+
+        Args:
+            seconds (float): Profil süresi (en fazla MAX_PROFILE_SECONDS)
+            interval_ms (float): Örnekleme aralığı
+            code_filter (set, optional): Sadece bu code nesnelerinden birini yığınında
+                taşıyan thread'ler örneklenir (ör. belirli bir route'un endpoint fonksiyonu)
+            include_idle (bool): Boşta bekleyen thread'ler de sayılsın mı
+
+        Returns:
+            tuple: (Counter {collapsed_stack: adet}, alınan örnek turu sayısı)
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("Başka bir profil oturumu çalışıyor")
+        try:
+            own_thread = threading.get_ident()
+            interval = max(interval_ms, 1) / 1000
+            deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+            stacks = Counter()
+            rounds = 0
+
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    if not include_idle and (
+                            os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_LEAVES:
+                        continue
+                    stack = _collapse(frame, code_filter)
+                    if stack:
+                        stacks[stack] += 1
+                rounds += 1
+                time.sleep(interval)
+
+            return stacks, rounds
+        finally:
+            self._lock.release()
+
+
+def format_collapsed(stacks):
+    """Counter'ı "yığın adet" satırlarına çevirir (en sık görülen önce)"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+# Uygulama genelinde paylaşılan profiler
+profiler = SamplingProfiler()
@@ -0,0 +1,215 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import psycopg2.extensions
+from metrics import Histogram, registry
+import timing
+
+logger = logging.getLogger("odie.db")
+
+# Sorgu enstrümantasyonu ayarları (.env üzerinden değiştirilebilir)
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "1") not in ("0", "false", "False")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+# Aynı sorgu için EXPLAIN en fazla bu aralıkla (saniye) alınır
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+QUERY_STATS_MAX_KEYS = int(os.getenv("QUERY_STATS_MAX_KEYS", "2000"))
+
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = ("select", "insert", "update", "delete", "with", "execute")
+# Çağrı yeri aranırken atlanacak modüller (enstrümantasyon ve yardımcı katmanlar)
+_SKIP_FILES = ("query_stats.py", "prepared_statements.py", "contextlib.py")
+
+
+def normalize_statement(query):
+    """Sorgu metnini tek satıra indirir (istatistik anahtarı olarak kullanılır)"""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = str(query)
+    return _WHITESPACE.sub(" ", query).strip()[:500]
+
+
+def _call_site():
+    """cursor.execute'u çağıran ilk uygulama satırını "dosya:satır fonksiyon" olarak döndürür"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_SKIP_FILES):
+            return f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class QueryStat:
+    __slots__ = ("statement", "call_site", "histogram", "errors", "rows", "last_explain")
+
+    def __init__(self, statement, call_site):
+        self.statement = statement
+        self.call_site = call_site
+        self.histogram = Histogram()
+        self.errors = 0
+        self.rows = 0
+        self.last_explain = 0.0
+
+
+class QueryStats:
+    """(sorgu, çağrı yeri) bazında süre histogramı, satır ve hata sayıları"""
+
+    def __init__(self, max_keys=QUERY_STATS_MAX_KEYS):
+        self.max_keys = max_keys
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _get(self, statement, call_site):
+        key = (statement, call_site)
+        stat = self._stats.get(key)
+        if stat is None:
+            with self._lock:
+                stat = self._stats.get(key)
+                if stat is None:
+                    if len(self._stats) >= self.max_keys:
+                        self.dropped += 1
+                        return None
+                    stat = self._stats[key] = QueryStat(statement, call_site)
+        return stat
+
+    def record(self, statement, call_site, elapsed_ms, rowcount, error=False):
+        stat = self._get(statement, call_site)
+        if stat is None:
+            return None
+        stat.histogram.observe(elapsed_ms)
+        if error:
+            stat.errors += 1
+        elif rowcount and rowcount > 0:
+            stat.rows += rowcount
+        return stat
+
+    def report(self, sort="total", limit=50):
+        """
+        Toplu istatistikleri döndürür
+
+        Args:
+            sort (str): "total", "avg", "max", "count", "p95" veya "errors"
+            limit (int): Döndürülecek en fazla kayıt
+        """
+        with self._lock:
+            stats = list(self._stats.values())
+
+        rows = []
+        for stat in stats:
+            item = {"statement": stat.statement, "call_site": stat.call_site,
+                    "rows": stat.rows, "errors": stat.errors}
+            item.update(stat.histogram.summary())
+            rows.append(item)
+
+        sort_keys = {
+            "total": lambda r: r["sum_ms"],
+            "avg": lambda r: r["avg_ms"] or 0,
+            "max": lambda r: r["max_ms"],
+            "count": lambda r: r["count"],
+            "p95": lambda r: r["p95_ms"] or 0,
+            "errors": lambda r: r["errors"],
+        }
+        if sort not in sort_keys:
+            raise ValueError(f"Geçersiz sıralama: {sort}")
+        rows.sort(key=sort_keys[sort], reverse=True)
+        return rows[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.dropped = 0
+
+
+# Uygulama genelinde paylaşılan sorgu istatistikleri
+query_stats = QueryStats()
+
+DB_QUERY_LATENCY = registry.histogram("odie_db_query_duration_ms", "Veritabanı sorgu süresi (ms)")
+DB_QUERY_ERRORS = registry.counter("odie_db_query_errors_total", "Hata veren veritabanı sorgusu sayısı")
+
+
+def _explain(connection, query, vars):
+    """Yavaş sorgunun planını ayrı bir cursor ve savepoint içinde alır"""
+    statement = normalize_statement(query)
+    if not statement.lower().startswith(_EXPLAINABLE) or ";" in statement.rstrip(";"):
+        return None
+    if connection.closed or connection.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return None
+
+    cursor = psycopg2.extensions.cursor(connection)
+    use_savepoint = not connection.autocommit
+    try:
+        if use_savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        cursor.execute(f"EXPLAIN {query}", vars)
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+        if use_savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as e:
+        if use_savepoint:
+            try:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            except Exception:
+                pass
+        return f"(EXPLAIN alınamadı: {e})"
+    finally:
+        cursor.close()
+
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Her sorgunun süresini, satır sayısını ve çağrı yerini query_stats'a kaydeden cursor.
+    SLOW_QUERY_MS eşiğini aşan sorgular EXPLAIN planıyla birlikte loglanır,
+    hatalı sorgular çağrı yeriyle loglanıp yeniden fırlatılır.
+    """
+
+    def execute(self, query, vars=None):
+        if not QUERY_STATS_ENABLED:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception as e:
+            self._record(query, started, error=e)
+            raise
+        self._record(query, started, vars=vars)
+        return result
+
+    def executemany(self, query, vars_list):
+        if not QUERY_STATS_ENABLED:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            result = super().executemany(query, vars_list)
+        except Exception as e:
+            self._record(query, started, error=e)
+            raise
+        self._record(query, started)
+        return result
+
+    def _record(self, query, started, vars=None, error=None):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        statement = normalize_statement(query)
+        call_site = _call_site()
+        stat = query_stats.record(statement, call_site, elapsed_ms, self.rowcount, error=error is not None)
+        DB_QUERY_LATENCY.observe(elapsed_ms)
+        timing.record("db_query", elapsed_ms)
+
+        if error is not None:
+            DB_QUERY_ERRORS.inc()
+            logger.warning("Sorgu hatası (%s, %.1f ms): %s | %s", call_site, elapsed_ms, error, statement)
+            return
+
+        if elapsed_ms >= SLOW_QUERY_MS:
+            plan = None
+            now = time.monotonic()
+            if stat is not None and now - stat.last_explain >= SLOW_QUERY_EXPLAIN_INTERVAL:
+                stat.last_explain = now
+                plan = _explain(self.connection, query, vars)
+            logger.warning("Yavaş sorgu (%s, %.1f ms, %s satır): %s%s", call_site, elapsed_ms,
+                           self.rowcount, statement, f"\n{plan}" if plan else "")
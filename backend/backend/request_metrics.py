@@ -0,0 +1,46 @@
+import time
+from metrics import registry
+
+HTTP_REQUESTS = registry.counter(
+    "odie_http_requests_total", "Tamamlanan HTTP istek sayısı", ("method", "route", "status"))
+HTTP_LATENCY = registry.histogram(
+    "odie_http_request_duration_ms", "HTTP istek süresi (ms)", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge(
+    "odie_http_requests_in_flight", "Şu anda işlenen HTTP istek sayısı")
+
+
+def _route_label(scope):
+    """Etiket kardinalitesi düşük kalsın diye gerçek path yerine route şablonu kullanılır"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """Route bazında istek süresi, sayısı ve eşzamanlı istek sayısını toplayan ASGI middleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = _route_label(scope)
+            HTTP_LATENCY.labels(scope["method"], route).observe((time.perf_counter() - started) * 1000)
+            HTTP_REQUESTS.labels(scope["method"], route, status_code).inc()
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from fastapi import Request, Response
+from fast_json import dumps
+
+# Önbellek ayarları (.env üzerinden değiştirilebilir)
+# TTL, başka bir worker'daki mutasyonların bu worker'a yansıma süresinin üst sınırıdır
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+class ResponseCache:
+    """
+    Okuma endpoint'leri için sürüm sayaçlı yanıt önbelleği.
+
+    Her kayıt bağlı olduğu kaynakların (domains, departments, users) sürümleriyle
+    saklanır; ilgili mutasyon endpoint'leri bump() çağırdığında kayıt geçersiz olur.
+    Kaynaklar isteğe bağlı olarak domain_id ile kapsamlandırılabilir.
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # _all: kaynaktaki her değişiklik, _wide: kapsamsız değişiklik, _scoped: domain bazlı değişiklik
+        self._all = defaultdict(int)
+        self._wide = defaultdict(int)
+        self._scoped = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, resource, scope=None):
+        """
+        Bir kaynağın sürümünü artırır
+
+        Args:
+            resource (str): "domains", "departments" veya "users"
+            scope (int, optional): Domain ID; verilmezse kaynağın tüm kapsamları geçersiz olur
+        """
+        with self._lock:
+            self._all[resource] += 1
+            if scope is None:
+                self._wide[resource] += 1
+            else:
+                self._scoped[(resource, scope)] += 1
+
+    def versions(self, deps):
+        """
+        Bağımlılık listesinin anlık sürüm değerlerini döndürür
+
+        Args:
+            deps (list): (resource, scope) çiftleri; scope None ise kaynağın tamamına bağımlıdır
+        """
+        with self._lock:
+            result = []
+            for resource, scope in deps:
+                if scope is None:
+                    result.append(self._all[resource])
+                else:
+                    result.append((self._wide[resource], self._scoped[(resource, scope)]))
+            return tuple(result)
+
+    def get(self, key, versions):
+        """Sürümleri eşleşen ve süresi dolmamış kaydı (body, etag) olarak döndürür"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == versions and entry[3] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, key, versions, body, etag):
+        with self._lock:
+            self._entries[key] = (versions, body, etag, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Uygulama genelinde paylaşılan önbellek
+response_cache = ResponseCache()
+
+
+def _make_etag(body):
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Zayıf (W/) ve çoklu ETag değerlerini destekle
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return etag in candidates
+
+
+def serialize_json(payload):
+    """Yanıt gövdesini JSON byte dizisine çevirir (builder hazır bytes döndürebilir)"""
+    if isinstance(payload, bytes):
+        return payload
+    return dumps(payload)
+
+
+def cached_json_response(request: Request, deps, builder):
+    """
+    Okuma endpoint'i yanıtını önbellekten veya builder() ile üretip ETag ile döndürür.
+    If-None-Match başlığı güncel ETag ile eşleşirse gövdesiz 304 döner.
+    Hata yanıtları ({"success": False, ...}) önbelleğe alınmaz.
+
+    Args:
+        request: FastAPI Request nesnesi (anahtar path + query parametrelerinden oluşur)
+        deps (list): (resource, scope) bağımlılık listesi
+        builder (callable): Yanıt dict'ini üreten fonksiyon
+
+    Returns:
+        Response: 200 (JSON) veya 304
+    """
+    headers = {"Cache-Control": "no-cache"}
+
+    if not RESPONSE_CACHE_ENABLED:
+        return Response(content=serialize_json(builder()), media_type="application/json")
+
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    versions = response_cache.versions(deps)
+
+    cached = response_cache.get(key, versions)
+    if cached:
+        body, etag = cached
+    else:
+        payload = builder()
+        body = serialize_json(payload)
+        etag = _make_etag(body)
+        if not (isinstance(payload, dict) and payload.get("success") is False):
+            response_cache.put(key, versions, body, etag)
+
+    headers["ETag"] = etag
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
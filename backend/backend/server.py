@@ -1,12 +1,67 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, Depends
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from user_ops import add_user, disable_user, delete_user, UserStatus, UserRole
+from user_ops import add_user, disable_user, delete_user, authenticate_user, bcrypt_rounds, UserStatus, UserRole
+from auth_guard import LoginThrottled
 from domain_api import router as domain_router
+from admin_api import router as admin_router
+from jobs_api import router as jobs_router
 from log_system import APILogger
+from db_ops import get_db, after_commit, get_users_by_department, PoolTimeout
+from response_cache import response_cache
+from fast_json import FastJSONResponse, FAST_JSON_ENABLED, encode_payload
+from compression import CompressionMiddleware
+from request_metrics import MetricsMiddleware
+from timing import ServerTimingMiddleware
+from metrics import registry, PROMETHEUS_CONTENT_TYPE
+from sync_scheduler import scheduler as sync_scheduler, SYNC_SCHEDULER_ENABLED
 from typing import Optional
+import os
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse if FAST_JSON_ENABLED else JSONResponse)
 app.include_router(domain_router)
+app.include_router(admin_router)
+app.include_router(jobs_router)
+
+# ⏳ Bağlantı havuzu DB_POOL_TIMEOUT boyunca doluysa istek beklemek yerine 503 ile döner
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(
+        status_code=503,
+        content={"success": False, "message": f"❌ {exc}"},
+        headers={"Retry-After": "1"}
+    )
+
+# 🔐 bcrypt cost'u ilk istek yerine başlangıçta belirlenir (BCRYPT_TARGET_MS / BCRYPT_ROUNDS)
+@app.on_event("startup")
+def calibrate_bcrypt():
+    bcrypt_rounds()
+
+# 🔄 Periyodik LDAP senkronizasyonu - SYNC_SCHEDULER_ENABLED=1 ile API sürecinde çalışır
+# (ayrı süreç olarak: python sync_scheduler.py)
+if SYNC_SCHEDULER_ENABLED:
+    @app.on_event("startup")
+    def start_sync_scheduler():
+        sync_scheduler.start()
+
+    @app.on_event("shutdown")
+    def stop_sync_scheduler():
+        sync_scheduler.stop()
+
+# 🗜️ Yanıt sıkıştırma (brotli/gzip) - RESPONSE_COMPRESSION=0 ile kapatılabilir
+if os.getenv("RESPONSE_COMPRESSION", "1") not in ("0", "false", "False"):
+    app.add_middleware(CompressionMiddleware)
+
+# ⏱️ Server-Timing başlığı (db, ldap, bcrypt, log fazları) - SERVER_TIMING=0 ile kapatılabilir
+app.add_middleware(ServerTimingMiddleware)
+
+# 📈 İstek metrikleri (en dışta; sıkıştırma dahil toplam süreyi ölçer)
+app.add_middleware(MetricsMiddleware)
+
+# 📈 Prometheus metrikleri (GET işlemi - loglanmaz)
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 # 👤 Kullanıcı oluşturma için gelen veri
 class UserCreateRequest(BaseModel):
@@ -29,9 +84,14 @@ class UserDeleteRequest(BaseModel):
     domain_id: int
     user_id: Optional[str] = None  # İşlemi yapan kullanıcının UUID'si
 
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+    domain_id: int
+
 # 👇 Kullanıcı Ekleme
 @app.post("/add_user")
-def api_add_user(user: UserCreateRequest):
+def api_add_user(user: UserCreateRequest, db=Depends(get_db)):
     try:
         success, status = add_user(
             domain_id=user.domain_id,
@@ -41,8 +101,10 @@ def api_add_user(user: UserCreateRequest):
             password=user.password,
             role_id=user.role_id.value,  # Enum değerini tamsayıya dönüştür
             department_id=user.department_id,
-            created_by=user.created_by
+            created_by=user.created_by,
+            conn=db
         )
+        after_commit(db, response_cache.bump, "users", user.domain_id)
         
         response = {"success": success, "status": status}
         
@@ -56,12 +118,14 @@ def api_add_user(user: UserCreateRequest):
             request_data=user.dict(),
             response_data=response,
             success=success,
-            error_message=None if success else status
+            error_message=None if success else status,
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "status": f"Hata: {str(e)}"}
         
         # Hata log'u kaydet
@@ -74,16 +138,18 @@ def api_add_user(user: UserCreateRequest):
             request_data=user.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 👇 Kullanıcı Devre Dışı Bırak
 @app.post("/disable_user")
-def api_disable_user(user: UserDisableRequest):
+def api_disable_user(user: UserDisableRequest, db=Depends(get_db)):
     try:
-        success, status_text = disable_user(user.domain_id, user.username, enable=False)
+        success, status_text = disable_user(user.domain_id, user.username, enable=False, conn=db)
+        after_commit(db, response_cache.bump, "users", user.domain_id)
         response = {"success": success, "status": status_text}
         
         # Log kaydet
@@ -96,12 +162,14 @@ def api_disable_user(user: UserDisableRequest):
             request_data=user.dict(),
             response_data=response,
             success=success,
-            error_message=None if success else status_text
+            error_message=None if success else status_text,
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "status": f"Hata: {str(e)}"}
         
         APILogger.log_operation(
@@ -113,16 +181,18 @@ def api_disable_user(user: UserDisableRequest):
             request_data=user.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 👇 Kullanıcı Devreye Al
 @app.post("/enable_user")
-def api_enable_user(user: UserDisableRequest):
+def api_enable_user(user: UserDisableRequest, db=Depends(get_db)):
     try:
-        success, status_text = disable_user(user.domain_id, user.username, enable=True)
+        success, status_text = disable_user(user.domain_id, user.username, enable=True, conn=db)
+        after_commit(db, response_cache.bump, "users", user.domain_id)
         response = {"success": success, "status": status_text}
         
         # Log kaydet
@@ -135,12 +205,14 @@ def api_enable_user(user: UserDisableRequest):
             request_data=user.dict(),
             response_data=response,
             success=success,
-            error_message=None if success else status_text
+            error_message=None if success else status_text,
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "status": f"Hata: {str(e)}"}
         
         APILogger.log_operation(
@@ -152,16 +224,18 @@ def api_enable_user(user: UserDisableRequest):
             request_data=user.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
 # 👇 Kullanıcı Sil
 @app.delete("/delete_user")
-def api_delete_user(user: UserDeleteRequest):
+def api_delete_user(user: UserDeleteRequest, db=Depends(get_db)):
     try:
-        success = delete_user(user.domain_id, user.username)
+        success = delete_user(user.domain_id, user.username, conn=db)
+        after_commit(db, response_cache.bump, "users", user.domain_id)
         response = {"success": success}
         
         # Log kaydet
@@ -174,12 +248,14 @@ def api_delete_user(user: UserDeleteRequest):
             request_data=user.dict(),
             response_data=response,
             success=success,
-            error_message=None if success else "Kullanıcı silinirken hata oluştu"
+            error_message=None if success else "Kullanıcı silinirken hata oluştu",
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "error": str(e)}
         
         APILogger.log_operation(
@@ -191,23 +267,51 @@ def api_delete_user(user: UserDeleteRequest):
             request_data=user.dict(),
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
 
-from fastapi import Body, Query
-from db_ops import get_db_connection
+# 👇 Kullanıcı Girişi
+@app.post("/login")
+def api_login(credentials: LoginRequest, request: Request, db=Depends(get_db)):
+    # Şifre log'a yazılmaz
+    request_data = {"username": credentials.username, "domain_id": credentials.domain_id}
+    try:
+        success, message = authenticate_user(
+            credentials.username, credentials.password, credentials.domain_id,
+            conn=db, client_ip=request.client.host if request.client else None
+        )
+    except LoginThrottled as e:
+        # Sınıra takılan denemeler loglanmaz (sadece metrik); saldırı anında veritabanına yazı yapılmaz
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "message": f"❌ {e}"},
+            headers={"Retry-After": str(int(e.retry_after) + 1)}
+        )
 
+    response = {"success": success, "message": message}
+    APILogger.log_operation(
+        endpoint="/login",
+        method="POST",
+        operation_type="login",
+        domain_id=credentials.domain_id,
+        request_data=request_data,
+        response_data=response,
+        success=success,
+        error_message=None if success else message,
+        conn=db
+    )
+    return response
+
+from fastapi import Body, Query
 @app.post("/list_users_by_department")
-def list_users_by_department(department: dict = Body(...)):
+def list_users_by_department(department: dict = Body(...), db=Depends(get_db)):
     try:
         department_id = department["department_id"]
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, first_name, last_name FROM users WHERE department_id = %s", (department_id,))
-        users = cursor.fetchall()
-        conn.close()
+        # (id, username, first_name, last_name, ...) - okuma modeli açıksa veritabanına gidilmez
+        users = get_users_by_department(department_id, conn=db)
 
         response = {
             "success": True,
@@ -229,12 +333,14 @@ def list_users_by_department(department: dict = Body(...)):
             operation_type="user",
             request_data=department,
             response_data={"user_count": len(response["users"])},  # Sadece sayıyı logla
-            success=True
+            success=True,
+            conn=db
         )
         
         return response
         
     except Exception as e:
+        db.rollback()
         error_response = {"success": False, "message": f"Hata: {e}"}
         
         APILogger.log_operation(
@@ -244,7 +350,8 @@ def list_users_by_department(department: dict = Body(...)):
             request_data=department,
             response_data=error_response,
             success=False,
-            error_message=str(e)
+            error_message=str(e),
+            conn=db
         )
         
         return error_response
@@ -256,10 +363,35 @@ def get_api_logs(
     endpoint: Optional[str] = Query(None, description="Endpoint filtresi"),
     operation_type: Optional[str] = Query(None, description="İşlem türü filtresi (domain, user, department, login, other)"),
     limit: Optional[int] = Query(50, description="Maksimum kayıt sayısı"),
-    offset: Optional[int] = Query(0, description="Kayıt başlangıç pozisyonu")
+    offset: Optional[int] = Query(0, description="Kayıt başlangıç pozisyonu"),
+    format: Optional[str] = Query(None, description="Hızlı serileştirme: fast (nesne) veya compact (kolon + satır dizisi)")
 ):
     """API log kayıtlarını getirir - Bu endpoint loglanmaz (GET işlemi)"""
     try:
+        if format in ("fast", "compact"):
+            # JSONB alanları parse edilmeden, satırlar dict'e çevrilmeden yanıta yazılır
+            result = APILogger.get_log_rows(
+                user_id=user_id,
+                endpoint=endpoint,
+                operation_type=operation_type,
+                limit=limit,
+                offset=offset
+            )
+            if not result["success"]:
+                return {"success": False, "message": result["message"]}
+            body = encode_payload(
+                {
+                    "success": True,
+                    "total_count": result["total_count"],
+                    "limit": result["limit"],
+                    "offset": result["offset"]
+                },
+                "logs", result["columns"], result["rows"],
+                raw_json_columns=APILogger.LOG_RAW_JSON_COLUMNS,
+                compact=(format == "compact")
+            )
+            return Response(content=body, media_type="application/json")
+        
         result = APILogger.get_logs(
             user_id=user_id,
             endpoint=endpoint,
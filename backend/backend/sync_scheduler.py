@@ -0,0 +1,261 @@
+"""
+🔄 Periyodik LDAP senkronizasyonu
+
+Her domain'i kendi aralığıyla (domains.sync_interval_seconds veya SYNC_INTERVAL_SECONDS)
+senkronize eder. Çalışma zamanlarına jitter eklenir; böylece tüm domain'ler aynı anda
+DC'lere yüklenmez. Aynı domain'in önceki çalışması (başka bir süreçte bile) sürüyorsa
+Postgres advisory lock sayesinde çalışma atlanır. Her çalışma sync_runs tablosuna
+süre ve değişen satır sayısıyla kaydedilir (migrations/007_sync_runs.sql).
+
+Kullanım:
+    python sync_scheduler.py                 # sürekli çalışır
+    python sync_scheduler.py --once 3        # 3 numaralı domain'i hemen senkronize eder
+Ya da API sürecinde: SYNC_SCHEDULER_ENABLED=1
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from db_ops import db_session, sync_ldap_users_to_supabase
+from ldap_handler import get_ldap_connection_by_domain_id
+from metrics import registry
+
+# Zamanlayıcı ayarları (.env üzerinden değiştirilebilir)
+SYNC_SCHEDULER_ENABLED = os.getenv("SYNC_SCHEDULER_ENABLED", "0") in ("1", "true", "True")
+SYNC_INTERVAL_SECONDS = int(os.getenv("SYNC_INTERVAL_SECONDS", "3600"))
+# Her çalışma aralığa ±%SYNC_JITTER kadar kaydırılır
+SYNC_JITTER = float(os.getenv("SYNC_JITTER", "0.1"))
+# Aynı anda en fazla bu kadar domain senkronize edilir (süreç başına)
+SYNC_MAX_CONCURRENT = int(os.getenv("SYNC_MAX_CONCURRENT", "2"))
+# Zamanlayıcının domain listesini kontrol etme aralığı (saniye)
+SYNC_TICK_SECONDS = float(os.getenv("SYNC_TICK_SECONDS", "30"))
+
+# pg_try_advisory_lock(namespace, domain_id) için sabit namespace
+SYNC_LOCK_NAMESPACE = 7301
+
+SYNC_RUNS = registry.counter("odie_sync_runs_total", "LDAP senkronizasyon çalışmaları", ("status",))
+SYNC_DURATION = registry.histogram("odie_sync_duration_ms", "LDAP senkronizasyon süresi (ms)",
+                                   buckets=(500, 1000, 5000, 15000, 60000, 300000, 900000))
+SYNC_USERS = registry.counter("odie_sync_users_total", "Senkronizasyonda işlenen kullanıcılar", ("result",))
+
+
+def _start_run(domain_id, trigger, status="running", error=None):
+    with db_session() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            INSERT INTO sync_runs (domain_id, trigger, status, error, finished_at)
+            VALUES (%s, %s, %s, %s, CASE WHEN %s = 'running' THEN NULL ELSE NOW() END)
+            RETURNING id
+            """,
+            (domain_id, trigger, status, error, status)
+        )
+        return cursor.fetchone()[0]
+
+
+def _finish_run(run_id, status, duration_ms, stats=None, error=None):
+    stats = stats or {}
+    with db_session() as conn:
+        conn.cursor().execute(
+            """
+            UPDATE sync_runs
+            SET status = %s, finished_at = NOW(), duration_ms = %s, users_seen = %s, rows_changed = %s,
+                inserted = %s, updated = %s, unchanged = %s, deleted = %s, error = %s
+            WHERE id = %s
+            """,
+            (status, int(duration_ms), stats.get("users_seen"), stats.get("rows_changed"), stats.get("inserted"),
+             stats.get("updated"), stats.get("unchanged"), stats.get("deleted"), error, run_id)
+        )
+
+
+def run_domain_sync(domain_id, trigger="schedule"):
+    """
+    Domain'i senkronize eder ve sonucu sync_runs'a yazar
+
+    Returns:
+        dict: {"status": "succeeded" | "failed" | "skipped", "run_id", "users_seen", "inserted",
+               "updated", "unchanged", "deleted", "rows_changed", ...}
+    """
+    with db_session() as conn_db:
+        cursor = conn_db.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (SYNC_LOCK_NAMESPACE, domain_id))
+        if not cursor.fetchone()[0]:
+            run_id = _start_run(domain_id, trigger, status="skipped",
+                                error="Önceki senkronizasyon hâlâ çalışıyor")
+            SYNC_RUNS.labels("skipped").inc()
+            print(f"⏭️ Domain {domain_id} senkronizasyonu atlandı (önceki çalışma sürüyor)")
+            return {"status": "skipped", "run_id": run_id}
+
+        run_id = None
+        started = time.perf_counter()
+        try:
+            run_id = _start_run(domain_id, trigger)
+            conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
+            try:
+                stats = sync_ldap_users_to_supabase(conn_db, conn_ldap, domain_id=domain_id, base_dn=base_dn)
+            finally:
+                conn_ldap.unbind()
+            if stats is None:
+                raise Exception("Senkronizasyon başarısız")
+            status, error = "succeeded", None
+        except Exception as e:
+            stats, status, error = None, "failed", str(e)
+            print(f"❌ Domain {domain_id} senkronizasyon hatası: {e}")
+        finally:
+            # Oturum seviyesindeki kilit bağlantı havuza dönmeden bırakılmalı
+            if not conn_db.closed:
+                conn_db.rollback()
+                conn_db.cursor().execute("SELECT pg_advisory_unlock(%s, %s)", (SYNC_LOCK_NAMESPACE, domain_id))
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        SYNC_RUNS.labels(status).inc()
+        SYNC_DURATION.observe(duration_ms)
+        if stats:
+            for result in ("inserted", "updated", "unchanged", "deleted"):
+                SYNC_USERS.labels(result).inc(stats[result])
+        if run_id is not None:
+            _finish_run(run_id, status, duration_ms, stats, error)
+        return {"status": status, "run_id": run_id, "duration_ms": round(duration_ms), "error": error,
+                **(stats or {})}
+
+
+def get_sync_runs(domain_id=None, limit=50, conn=None):
+    with db_session(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id, domain_id, trigger, status, started_at, finished_at, duration_ms, users_seen, rows_changed,
+                   inserted, updated, unchanged, deleted, error
+            FROM sync_runs
+            WHERE %s IS NULL OR domain_id = %s
+            ORDER BY started_at DESC
+            LIMIT %s
+            """,
+            (domain_id, domain_id, limit)
+        )
+        columns = ("id", "domain_id", "trigger", "status", "started_at", "finished_at", "duration_ms",
+                   "users_seen", "rows_changed", "inserted", "updated", "unchanged", "deleted", "error")
+        runs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    for run in runs:
+        for key in ("started_at", "finished_at"):
+            if run[key] is not None:
+                run[key] = run[key].isoformat()
+    return runs
+
+
+class SyncScheduler:
+    """Zamanı gelen domain'leri sınırlı eşzamanlılıkla senkronize eden döngü"""
+
+    def __init__(self, max_concurrent=SYNC_MAX_CONCURRENT, tick_seconds=SYNC_TICK_SECONDS):
+        self.tick_seconds = tick_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ldap-sync")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # domain_id -> (son çalışma başlangıcı, planlanan sonraki çalışma zamanı - epoch)
+        self._next_run = {}
+
+    def _due_domains(self):
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT d.id, COALESCE(d.sync_interval_seconds, %s),
+                       (SELECT EXTRACT(EPOCH FROM MAX(r.started_at)) FROM sync_runs r
+                        WHERE r.domain_id = d.id AND r.status <> 'skipped')
+                FROM domains d
+                WHERE d.status = 'devrede'
+                """,
+                (SYNC_INTERVAL_SECONDS,)
+            )
+            rows = cursor.fetchall()
+
+        now = time.time()
+        due = []
+        for domain_id, interval, last_started in rows:
+            if not interval or interval <= 0:
+                continue
+            last_started = float(last_started) if last_started is not None else None
+            cached = self._next_run.get(domain_id)
+            if cached is None or cached[0] != last_started:
+                jitter = random.uniform(-SYNC_JITTER, SYNC_JITTER) * interval
+                if last_started is None:
+                    # Hiç çalışmamış domain'ler ilk aralığa yayılır
+                    next_run = now + random.uniform(0, min(interval, 300))
+                else:
+                    next_run = last_started + interval + jitter
+                self._next_run[domain_id] = cached = (last_started, next_run)
+            if cached[1] <= now:
+                due.append(domain_id)
+        return due
+
+    def _run(self, domain_id):
+        try:
+            result = run_domain_sync(domain_id, trigger="schedule")
+            if result["status"] == "skipped":
+                # Diğer çalışma bitince yeni başlangıç zamanına göre yeniden planlanır
+                self._next_run.pop(domain_id, None)
+        except Exception as e:
+            print(f"❌ Zamanlanmış senkronizasyon hatası (domain {domain_id}): {e}")
+            self._next_run.pop(domain_id, None)
+        finally:
+            with self._lock:
+                self._in_flight.discard(domain_id)
+
+    def tick(self):
+        for domain_id in self._due_domains():
+            with self._lock:
+                if domain_id in self._in_flight:
+                    continue
+                self._in_flight.add(domain_id)
+            self._executor.submit(self._run, domain_id)
+
+    def loop(self):
+        print(f"🔄 Senkronizasyon zamanlayıcısı başladı (aralık {SYNC_INTERVAL_SECONDS}s, "
+              f"jitter ±%{int(SYNC_JITTER * 100)}, eşzamanlı {self._executor._max_workers})")
+        # Birden fazla süreç aynı anda başlarsa ilk sorgular çakışmasın
+        self._stop.wait(random.uniform(0, min(self.tick_seconds, 10)))
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"❌ Zamanlayıcı hatası: {e}")
+            self._stop.wait(self.tick_seconds)
+
+    def start(self):
+        """Zamanlayıcıyı arka plan thread'inde başlatır"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop, name="sync-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=False):
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
+
+
+# API süreci için paylaşılan zamanlayıcı (SYNC_SCHEDULER_ENABLED=1)
+scheduler = SyncScheduler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ODIE periyodik LDAP senkronizasyonu")
+    parser.add_argument("--once", type=int, metavar="DOMAIN_ID", help="Sadece bu domain'i hemen senkronize et")
+    args = parser.parse_args()
+
+    if args.once is not None:
+        print(run_domain_sync(args.once, trigger="manual"))
+        return
+
+    try:
+        scheduler.loop()
+    except KeyboardInterrupt:
+        print("🛑 Zamanlayıcı durduruluyor; çalışan senkronizasyonlar bitince çıkılacak...")
+        scheduler.stop(wait=True)
+
+
+if __name__ == "__main__":
+    main()
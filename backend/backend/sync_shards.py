@@ -0,0 +1,118 @@
+"""
+🧩 Parçalı LDAP senkronizasyonu
+
+Büyük dizinlerde (100k+ hesap) tek sayfalı arama ve dönüşüm tek çekirdeğe ve tek DC'ye
+bağlıdır. SYNC_SHARDS > 1 olduğunda sync_ldap_users_to_supabase dizini parçalara böler;
+her parça ayrı bir süreçte kendi LDAP bağlantısıyla okunur ve kendi veritabanı
+bağlantısıyla yazılır. Parça sonuçları (sayılar ve görülen kullanıcılar) ana süreçte
+birleştirilir; silme tespiti ve önbellek güncellemesi orada yapılır.
+
+Bölme yöntemleri (SYNC_SHARD_BY):
+    prefix - sAMAccountName aralıkları: (sAMAccountName>=a)(!(sAMAccountName>=n)) ...
+    ou     - base DN'in bir alt seviyesindeki her nesne ayrı bir alt ağaç parçası
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ldap3 import LEVEL, SUBTREE
+from db_ops import db_session, iter_ldap_user_records, write_user_diff, SYNC_USER_FILTER
+from ldap_handler import get_ldap_connection_by_domain_id
+
+SYNC_SHARD_BY = os.getenv("SYNC_SHARD_BY", "prefix")
+
+# prefix bölmesinde sınırlar bu karakterlerden eşit aralıklarla seçilir
+SHARD_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def prefix_shards(base_dn, shards):
+    """
+    sAMAccountName'i ardışık aralıklara böler. İlk aralık alt sınırsız, son aralık üst
+    sınırsızdır; böylece alfabe dışındaki karakterlerle başlayan hesaplar da bir parçaya düşer.
+
+    Returns:
+        list: [(search_base, search_scope, search_filter), ...]
+    """
+    bounds = []
+    for i in range(1, shards):
+        bound = SHARD_ALPHABET[i * len(SHARD_ALPHABET) // shards]
+        if bound not in bounds:
+            bounds.append(bound)
+
+    plan = []
+    for lower, upper in zip([None] + bounds, bounds + [None]):
+        condition = ""
+        if lower is not None:
+            condition += f"(sAMAccountName>={lower})"
+        if upper is not None:
+            condition += f"(!(sAMAccountName>={upper}))"
+        plan.append((base_dn, SUBTREE, f"(&{SYNC_USER_FILTER}{condition})"))
+    return plan
+
+
+def ou_shards(conn_ldap, base_dn):
+    """
+    base DN'in doğrudan altındaki her nesneyi (OU, container, doğrudan bağlı kullanıcı)
+    ayrı bir alt ağaç parçası yapar; parçaların birleşimi tüm alt ağacı kapsar.
+    """
+    conn_ldap.search(base_dn, '(objectClass=*)', search_scope=LEVEL, attributes=[])
+    return [(entry.entry_dn, SUBTREE, SYNC_USER_FILTER) for entry in conn_ldap.entries]
+
+
+def plan_shards(conn_ldap, base_dn, shards, shard_by=SYNC_SHARD_BY):
+    if shard_by == "ou":
+        return ou_shards(conn_ldap, base_dn)
+    if shard_by == "prefix":
+        return prefix_shards(base_dn, shards)
+    raise ValueError(f"Bilinmeyen SYNC_SHARD_BY: {shard_by}")
+
+
+def _sync_shard(domain_id, shard_index, shard):
+    """Alt süreçte çalışır: parçayı okur, farkları yazar ve commit eder"""
+    search_base, search_scope, search_filter = shard
+    # Parçalar domain_ip'deki DC'lere sırayla dağıtılır
+    conn_ldap, _ = get_ldap_connection_by_domain_id(domain_id, server_index=shard_index)
+    try:
+        ldap_users = dict(iter_ldap_user_records(conn_ldap, search_base, search_filter, search_scope))
+    finally:
+        conn_ldap.unbind()
+
+    with db_session() as conn_db:
+        counts = write_user_diff(conn_db.cursor(), domain_id, ldap_users)
+    # DN önbelleği süreç içidir; kayıtlar ana sürece döner ve önbellek orada doldurulur
+    # (alt süreç çıkınca kendi önbelleği kaybolur)
+    records = [(username, record[3], record[4]) for username, record in ldap_users.items()]
+    return counts, records
+
+
+def sync_sharded(conn_ldap, domain_id, base_dn, shards):
+    """
+    Parçaları en fazla `shards` süreçte çalıştırır ve sonuçları birleştirir
+
+    Returns:
+        tuple: (counts dict, [(username, dn, userAccountControl), ...])
+    """
+    plan = plan_shards(conn_ldap, base_dn, shards)
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "conflicts": 0}
+    records = []
+    if not plan:
+        return counts, records
+
+    # spawn: API/zamanlayıcı süreçlerindeki thread'ler ve havuz bağlantıları alt sürece kopyalanmaz
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(shards, len(plan)), mp_context=context) as executor:
+        futures = {executor.submit(_sync_shard, domain_id, index, shard): shard
+                   for index, shard in enumerate(plan)}
+        try:
+            for future in as_completed(futures):
+                shard_counts, shard_records = future.result()
+                for key in counts:
+                    counts[key] += shard_counts[key]
+                records.extend(shard_records)
+                print(f"🧩 Parça tamamlandı ({futures[future][0]} {futures[future][2]}): "
+                      f"{len(shard_records)} kullanıcı")
+        except Exception:
+            # Bir parça başarısızsa bekleyenler başlatılmaz; silme tespiti yapılmaz
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+    return counts, records
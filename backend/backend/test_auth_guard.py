@@ -0,0 +1,232 @@
+"""
+🧪 auth_guard birim testleri: token bucket ve doğrulanmış kimlik önbelleği
+Veritabanı ve LDAP gerekmez: python -m pytest test_auth_guard.py
+"""
+
+import pytest
+
+import auth_guard
+import user_ops
+from auth_guard import TokenBuckets, VerifiedCredentialCache, LoginThrottled
+
+
+class FakeClock:
+    """auth_guard.time yerine geçer; süre elle ilerletilir"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(auth_guard, "time", fake)
+    return fake
+
+
+# ------------------------------------------------------------------ token bucket
+
+def test_burst_exhaustion_and_retry_after(clock):
+    buckets = TokenBuckets(burst=3, per_minute=6)  # 10 saniyede bir jeton
+    assert [buckets.take("alice") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("alice") == pytest.approx(10.0)
+    clock.advance(4)
+    assert buckets.take("alice") == pytest.approx(6.0)
+
+
+def test_refill_is_capped_at_burst(clock):
+    buckets = TokenBuckets(burst=2, per_minute=60)
+    buckets.take("alice")
+    buckets.take("alice")
+    assert buckets.take("alice") > 0
+
+    clock.advance(1)
+    assert buckets.take("alice") == 0.0
+    assert buckets.take("alice") > 0
+
+    # Uzun bekleme burst'ten fazla jeton biriktirmez
+    clock.advance(3600)
+    assert buckets.take("alice") == 0.0
+    assert buckets.take("alice") == 0.0
+    assert buckets.take("alice") > 0
+
+
+def test_keys_are_independent(clock):
+    buckets = TokenBuckets(burst=1, per_minute=1)
+    assert buckets.take("alice") == 0.0
+    assert buckets.take("alice") > 0
+    assert buckets.take("bob") == 0.0
+
+
+def test_lru_eviction_at_max_keys(clock):
+    buckets = TokenBuckets(burst=1, per_minute=1, max_keys=2)
+    buckets.take("a")
+    buckets.take("b")
+    # "a" yeniden kullanılınca en eski "b" olur
+    assert buckets.take("a") > 0
+    buckets.take("c")
+    assert set(buckets._buckets) == {"a", "c"}
+    # Atılan anahtar dolu bir bucket ile yeniden başlar
+    assert buckets.take("b") == 0.0
+
+
+def test_zero_burst_disables_throttling(clock):
+    buckets = TokenBuckets(burst=0, per_minute=1)
+    assert all(buckets.take("alice") == 0.0 for _ in range(100))
+
+
+def test_zero_rate_never_refills(clock):
+    buckets = TokenBuckets(burst=1, per_minute=0)
+    buckets.take("alice")
+    clock.advance(3600)
+    assert buckets.take("alice") == float("inf")
+
+
+def test_check_rate_limit_raises_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(auth_guard, "user_buckets", TokenBuckets(burst=1, per_minute=6))
+    monkeypatch.setattr(auth_guard, "ip_buckets", TokenBuckets(burst=100, per_minute=60))
+    auth_guard.check_rate_limit(1, "Alice", "10.0.0.1")
+    with pytest.raises(LoginThrottled) as excinfo:
+        # Kullanıcı adı büyük/küçük harf duyarsız sayılır
+        auth_guard.check_rate_limit(1, "alice", "10.0.0.1")
+    assert excinfo.value.scope == "user"
+    assert excinfo.value.retry_after == pytest.approx(10.0)
+
+
+def test_check_rate_limit_ip_scope(clock, monkeypatch):
+    monkeypatch.setattr(auth_guard, "user_buckets", TokenBuckets(burst=100, per_minute=60))
+    monkeypatch.setattr(auth_guard, "ip_buckets", TokenBuckets(burst=2, per_minute=60))
+    auth_guard.check_rate_limit(1, "alice", "10.0.0.1")
+    auth_guard.check_rate_limit(1, "bob", "10.0.0.1")
+    with pytest.raises(LoginThrottled) as excinfo:
+        auth_guard.check_rate_limit(1, "carol", "10.0.0.1")
+    assert excinfo.value.scope == "ip"
+    # IP verilmezse sadece kullanıcı sınırı uygulanır
+    auth_guard.check_rate_limit(1, "carol", None)
+
+
+# ------------------------------------------------------- doğrulanmış kimlik önbelleği
+
+def test_cache_key_binds_domain_user_and_password():
+    cache = VerifiedCredentialCache(ttl=60)
+    key = cache.key(1, "Alice", "secret")
+    assert key == cache.key(1, "alice", "secret")
+    assert key != cache.key(2, "alice", "secret")
+    assert key != cache.key(1, "alice", "Secret")
+    assert b"secret" not in key
+    # Süreç anahtarı örnek başına rastgeledir
+    assert key != VerifiedCredentialCache(ttl=60).key(1, "alice", "secret")
+
+
+def test_cache_entry_expires_after_ttl(clock):
+    cache = VerifiedCredentialCache(ttl=60)
+    key = cache.key(1, "alice", "secret")
+    cache.put(key, "$2b$12$hash")
+    clock.advance(59)
+    assert cache.get(key) == "$2b$12$hash"
+    clock.advance(2)
+    assert cache.get(key) is None
+    assert cache.size() == 0
+
+
+def test_cache_lru_eviction_at_max_entries(clock):
+    cache = VerifiedCredentialCache(ttl=60, max_entries=2)
+    cache.put(b"a", "hash-a")
+    cache.put(b"b", "hash-b")
+    assert cache.get(b"a") == "hash-a"
+    cache.put(b"c", "hash-c")
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == "hash-a"
+    assert cache.get(b"c") == "hash-c"
+
+
+def test_zero_ttl_disables_cache(clock):
+    cache = VerifiedCredentialCache(ttl=0)
+    key = cache.key(1, "alice", "secret")
+    cache.put(key, "$2b$12$hash")
+    assert cache.get(key) is None
+    assert cache.size() == 0
+
+
+# ------------------------------------------- authenticate_user önbellek hızlı yolu
+
+class FakeRow:
+    def __init__(self, password, status="devrede"):
+        self.id = 7
+        self.username = "alice"
+        self.password = password
+        self.status = status
+
+
+class FakeIndex:
+    """user_ops.user_index yerine geçer; kullanıcı satırı bellekte tutulur"""
+
+    def __init__(self, row):
+        self.row = row
+
+    def available(self, conn=None):
+        return True
+
+    def get_by_username(self, domain_id, username):
+        return self.row
+
+
+@pytest.fixture
+def login_env(clock, monkeypatch):
+    index = FakeIndex(FakeRow("$2b$12$first"))
+    verified = []
+
+    def fake_verify(password, password_hash):
+        verified.append(password_hash)
+        return password == "secret"
+
+    monkeypatch.setattr(user_ops, "user_index", index)
+    monkeypatch.setattr(user_ops, "verify_password", fake_verify)
+    monkeypatch.setattr(user_ops, "BCRYPT_REHASH_ON_LOGIN", False)
+    monkeypatch.setattr(user_ops, "credential_cache", VerifiedCredentialCache(ttl=60))
+    monkeypatch.setattr(auth_guard, "user_buckets", TokenBuckets(burst=100, per_minute=60))
+    monkeypatch.setattr(auth_guard, "ip_buckets", TokenBuckets(burst=100, per_minute=60))
+    return index, verified
+
+
+def test_cache_hit_skips_bcrypt_while_hash_unchanged(login_env):
+    index, verified = login_env
+    assert user_ops.authenticate_user("alice", "secret", 1)[0]
+    assert user_ops.authenticate_user("alice", "secret", 1)[0]
+    assert verified == ["$2b$12$first"]
+
+
+def test_cache_miss_after_password_hash_changes(login_env):
+    index, verified = login_env
+    assert user_ops.authenticate_user("alice", "secret", 1)[0]
+
+    # Şifre başka bir yoldan değişti: eski kayıt kabul edilmez, bcrypt yeniden çalışır
+    index.row = FakeRow("$2b$12$second")
+    assert user_ops.authenticate_user("alice", "secret", 1)[0]
+    assert verified == ["$2b$12$first", "$2b$12$second"]
+
+    index.row = FakeRow("$2b$12$third")
+    assert not user_ops.authenticate_user("alice", "old-secret", 1)[0]
+
+
+def test_cache_hit_still_rejects_disabled_user(login_env):
+    index, verified = login_env
+    assert user_ops.authenticate_user("alice", "secret", 1)[0]
+    index.row = FakeRow("$2b$12$first", status="devre dışı")
+    assert user_ops.authenticate_user("alice", "secret", 1) == (False, "Kullanıcı devre dışı")
+
+
+def test_wrong_password_is_not_cached_and_is_throttled(login_env, monkeypatch):
+    index, verified = login_env
+    monkeypatch.setattr(auth_guard, "user_buckets", TokenBuckets(burst=2, per_minute=1))
+    assert not user_ops.authenticate_user("alice", "wrong", 1)[0]
+    assert not user_ops.authenticate_user("alice", "wrong", 1)[0]
+    with pytest.raises(LoginThrottled):
+        user_ops.authenticate_user("alice", "wrong", 1)
+    assert len(verified) == 2
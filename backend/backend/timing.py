@@ -0,0 +1,98 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+# SERVER_TIMING=0 ile Server-Timing başlığı kapatılır
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "1") not in ("0", "false", "False")
+
+# İstek başına {faz adı: [toplam ms, adet]} sözlüğü. Sync endpoint'ler thread havuzunda
+# kopyalanmış context ile çalışır; sözlük aynı nesne olduğu için fazlar middleware'e ulaşır.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request():
+    """Yeni bir istek için faz toplayıcısını başlatır"""
+    timings = {}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token):
+    _request_timings.reset(token)
+
+
+def record(name, elapsed_ms):
+    """Aktif istek varsa faz süresini ekler (istek dışı çağrılarda hiçbir şey yapmaz)"""
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [elapsed_ms, 1]
+    else:
+        entry[0] += elapsed_ms
+        entry[1] += 1
+
+
+@contextmanager
+def span(name):
+    """
+    Blok süresini aktif isteğin faz toplamına ekler
+
+    Kullanım:
+        with span("bcrypt"):
+            bcrypt.hashpw(...)
+    """
+    if _request_timings.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+def current_timings():
+    """Aktif isteğin fazlarını {ad: ms} olarak döndürür (istek yoksa None)"""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    return {name: round(entry[0], 2) for name, entry in list(timings.items())}
+
+
+def format_server_timing(timings, total_ms):
+    parts = []
+    for name, (elapsed_ms, count) in list(timings.items()):
+        description = f';desc="{count}x"' if count > 1 else ""
+        parts.append(f"{name};dur={elapsed_ms:.1f}{description}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """Fazları istek boyunca toplayıp yanıta Server-Timing başlığı olarak ekleyen ASGI middleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SERVER_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings, token = start_request()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                header = format_server_timing(timings, (time.perf_counter() - started) * 1000)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
@@ -0,0 +1,444 @@
+import bisect
+import json
+import os
+import select
+import threading
+import time
+from operator import attrgetter
+import psycopg2
+import psycopg2.extensions
+from db_ops import db_session, USER, PASSWORD, HOST, PORT, DBNAME
+from metrics import registry
+
+# Kullanıcı okuma modeli ayarları (.env üzerinden değiştirilebilir)
+USER_INDEX_ENABLED = os.getenv("USER_INDEX_ENABLED", "0") in ("1", "true", "True")
+# LISTEN/NOTIFY dinleyicisi; Supabase pooler'ın transaction modunda (6543) LISTEN çalışmaz,
+# USER_INDEX_LISTEN_PORT ile doğrudan bağlantı (5432) veya session modu kullanılmalıdır
+USER_INDEX_LISTEN = os.getenv("USER_INDEX_LISTEN", "1") not in ("0", "false", "False")
+USER_INDEX_LISTEN_PORT = os.getenv("USER_INDEX_LISTEN_PORT", PORT)
+USER_INDEX_CHANNEL = os.getenv("USER_INDEX_CHANNEL", "users_changed")
+# Tam yeniden yükleme aralığı (saniye); dinleyici kapalıyken diğer worker'lardaki
+# değişikliklerin görünme süresi üst sınırıdır
+USER_INDEX_MAX_AGE = float(os.getenv("USER_INDEX_MAX_AGE", "300"))
+# Tek seferde bu kadar çok kullanıcı değişirse (ör. senkronizasyon) satır satır
+# okumak yerine indeks yeniden yüklenir
+USER_INDEX_BULK_RELOAD = int(os.getenv("USER_INDEX_BULK_RELOAD", "500"))
+
+USER_COLUMNS = ("id", "username", "password", "first_name", "last_name", "role_id",
+                "department_id", "status", "domain_id")
+_SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+
+USER_INDEX_READS = registry.counter("odie_user_index_reads_total",
+                                    "Kullanıcı okuma modeline gelen okumalar", ("result",))
+USER_INDEX_RELOADS = registry.counter("odie_user_index_reloads_total", "Kullanıcı okuma modelinin tam yüklenme sayısı")
+
+
+def fold_case(text):
+    """
+    Veritabanının lower()/ILIKE eşlemesiyle aynı küçük harfe çevirme. PostgreSQL karakter başına
+    tek karakterlik (basit) eşleme kullanır; Python'un lower()'ı ise "İ"yi iki karaktere
+    ("i" + U+0307) ve kelime sonundaki "Σ"yı "ς"ye çevirir. Bu iki fark önceden giderilir.
+    (tr_TR collation'ında "I" -> "ı" olduğundan veritabanı UTF-8 ve Türkçe olmayan bir
+    locale ile (ör. C.UTF-8, en_US.UTF-8) oluşturulmuş olmalıdır.)
+    """
+    return text.replace("İ", "i").replace("Σ", "σ").lower()
+
+
+class UserRow:
+    """users tablosunun bellekteki satırı. Değiştirilmez; güncellemede yeni satır oluşturulur."""
+
+    __slots__ = USER_COLUMNS + ("search_text",)
+
+    def __init__(self, id, username, password, first_name, last_name, role_id, department_id, status, domain_id):
+        self.id = id
+        self.username = username
+        self.password = password
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role_id = role_id
+        self.department_id = department_id
+        self.status = status
+        self.domain_id = domain_id
+        # ILIKE '%metin%' araması için küçük harfli birleşik metin
+        self.search_text = fold_case("\x00".join((username or "", first_name or "", last_name or "")))
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in USER_COLUMNS}
+        values.update(changes)
+        return UserRow(**values)
+
+
+# list_users_page sıralama anahtarlarının (USER_SORT_KEYS) Python karşılıkları. Python str
+# karşılaştırması kod noktası sırasıdır; SQL tarafı aynı sıra için COLLATE "C" kullanır
+SORT_KEYS = {
+    "username": lambda row: row.username or "",
+    "first_name": lambda row: row.first_name or "",
+    "last_name": lambda row: row.last_name or "",
+    "status": lambda row: row.status or "",
+    "id": lambda row: row.id,
+}
+
+
+def _add_to(index, key, user_id):
+    bucket = index.get(key)
+    if bucket is None:
+        bucket = index[key] = set()
+    bucket.add(user_id)
+
+
+def _remove_from(index, key, user_id):
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.discard(user_id)
+        if not bucket:
+            del index[key]
+
+
+class DomainIndex:
+    """Tek bir domain'in kullanıcıları ve ikincil indeksleri"""
+
+    __slots__ = ("rows", "by_username", "by_department", "by_role", "by_status", "_sorted")
+
+    def __init__(self):
+        self.rows = {}            # id -> UserRow
+        self.by_username = {}     # username -> id
+        self.by_department = {}   # department_id -> {id}
+        self.by_role = {}         # role_id -> {id}
+        self.by_status = {}       # status -> {id}
+        self._sorted = {}         # sıralama anahtarı -> (anahtarlar, satırlar)
+
+    def add(self, row):
+        self.rows[row.id] = row
+        self.by_username[row.username] = row.id
+        _add_to(self.by_department, row.department_id, row.id)
+        _add_to(self.by_role, row.role_id, row.id)
+        _add_to(self.by_status, row.status, row.id)
+        self._sorted.clear()
+
+    def remove(self, row):
+        self.rows.pop(row.id, None)
+        if self.by_username.get(row.username) == row.id:
+            del self.by_username[row.username]
+        _remove_from(self.by_department, row.department_id, row.id)
+        _remove_from(self.by_role, row.role_id, row.id)
+        _remove_from(self.by_status, row.status, row.id)
+        self._sorted.clear()
+
+    def sorted_rows(self, sort):
+        """(sıralama değeri, id) sırasına dizilmiş satırlar; değişene kadar önbellekte tutulur"""
+        cached = self._sorted.get(sort)
+        if cached is None:
+            key = SORT_KEYS[sort]
+            rows = sorted(self.rows.values(), key=lambda row: (key(row), row.id))
+            cached = self._sorted[sort] = ([(key(row), row.id) for row in rows], rows)
+        return cached
+
+
+class _IndexState:
+    __slots__ = ("rows", "domains")
+
+    def __init__(self):
+        self.rows = {}     # id -> UserRow (tüm domain'ler)
+        self.domains = {}  # domain_id -> DomainIndex
+
+    def upsert(self, row):
+        old = self.rows.get(row.id)
+        if old is not None:
+            self.domains[old.domain_id].remove(old)
+        self.rows[row.id] = row
+        domain = self.domains.get(row.domain_id)
+        if domain is None:
+            domain = self.domains[row.domain_id] = DomainIndex()
+        domain.add(row)
+
+    def remove(self, user_id):
+        old = self.rows.pop(user_id, None)
+        if old is not None:
+            self.domains[old.domain_id].remove(old)
+
+
+class UserIndex:
+    """
+    users tablosunun worker içindeki okuma modeli.
+
+    Kullanıcı listeleme ve giriş doğrulama sorguları veritabanına gitmeden buradan
+    cevaplanır. Tutarlılık üç yoldan sağlanır:
+      - user_ops mutasyonları commit sonrası değişikliği doğrudan uygular (write-through)
+      - users tablosundaki trigger'ın NOTIFY'ları diğer worker'ların ve elle yapılan
+        değişikliklerin satırlarını yeniden okutur (migrations/003_users_notify.sql)
+      - USER_INDEX_MAX_AGE aralığıyla ve dinleyici bağlantısı koptuğunda tam yeniden yükleme
+    """
+
+    def __init__(self):
+        self._state = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        # Yeniden yükleme sürerken gelen değişiklikler yeni duruma da uygulanır
+        self._reloading = False
+        self._pending = []
+        self._listener = None
+        self._reload_thread = None
+
+    # ----------------------------------------------------------------- yükleme
+
+    def _stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > USER_INDEX_MAX_AGE
+
+    def reload(self, force=True):
+        """users tablosunu baştan okuyup indeksi yeniden kurar"""
+        with self._reload_lock:
+            # Aynı anda bekleyen thread'lerden sadece ilki yükler
+            if not force and not self._stale():
+                return
+            with self._lock:
+                self._reloading = True
+                self._pending = []
+            try:
+                with db_session() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(_SELECT_USERS)
+                    rows = cursor.fetchall()
+
+                state = _IndexState()
+                for values in rows:
+                    state.upsert(UserRow(*values))
+
+                with self._lock:
+                    for op, arg in self._pending:
+                        getattr(state, op)(arg)
+                    self._state = state
+                    self._loaded_at = time.monotonic()
+            finally:
+                with self._lock:
+                    self._reloading = False
+                    self._pending = []
+        USER_INDEX_RELOADS.inc()
+        print(f"✅ Kullanıcı okuma modeli yüklendi: {len(rows)} kullanıcı")
+
+    def invalidate(self):
+        """Bir sonraki okumada tam yeniden yüklemeyi zorlar"""
+        self._loaded_at = None
+
+    def _schedule_reload(self):
+        """Yeniden yüklemeyi arka plan thread'inde başlatır (sürmekte olan varsa bir şey yapmaz)"""
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self._background_reload, name="user-index-reload",
+                                                   daemon=True)
+            self._reload_thread.start()
+
+    def _background_reload(self):
+        try:
+            self.reload(force=False)
+        except Exception as e:
+            print(f"❌ Kullanıcı okuma modeli yüklenemedi: {e}")
+            return
+        self._start_listener()
+
+    def available(self, conn=None):
+        """
+        Okumanın indeksten yapılıp yapılamayacağını döndürür.
+        conn üzerinde commit bekleyen değişiklik varsa, isteğin kendi yazdıklarını
+        görebilmesi için okuma veritabanına bırakılır.
+
+        İndeks eskimişse (veya hiç yüklenmemişse) yeniden yükleme arka planda başlatılır ve
+        okuma o sürede veritabanından yapılır. İstek thread'i yüklemeyi beklemez: istek zaten
+        havuzdan bir bağlantı tutarken ikinci bir bağlantı beklemek havuzu kilitleyebilirdi.
+        """
+        if not USER_INDEX_ENABLED:
+            return False
+        if conn is not None and getattr(conn, "after_commit_callbacks", None):
+            USER_INDEX_READS.labels("fallback").inc()
+            return False
+        if self._stale():
+            self._schedule_reload()
+            USER_INDEX_READS.labels("fallback").inc()
+            return False
+        USER_INDEX_READS.labels("hit").inc()
+        return True
+
+    # -------------------------------------------------------------- değişiklik
+
+    def _apply(self, op, arg):
+        with self._lock:
+            if self._state is not None:
+                getattr(self._state, op)(arg)
+            if self._reloading:
+                self._pending.append((op, arg))
+
+    def upsert(self, values):
+        """Satırı ekler veya değiştirir (values: USER_COLUMNS sırasında tuple)"""
+        if USER_INDEX_ENABLED:
+            self._apply("upsert", UserRow(*values))
+
+    def update_fields(self, domain_id, username, changes):
+        """Kullanıcının bazı alanlarını günceller; indekste yoksa dinleyiciye/yeniden yüklemeye bırakır"""
+        if not USER_INDEX_ENABLED:
+            return
+        with self._lock:
+            state = self._state
+            domain = state.domains.get(domain_id) if state is not None else None
+            user_id = domain.by_username.get(username) if domain is not None else None
+            if user_id is None:
+                return
+            row = state.rows[user_id].replace(**changes)
+        self._apply("upsert", row)
+
+    def remove(self, *user_ids):
+        if USER_INDEX_ENABLED:
+            for user_id in user_ids:
+                self._apply("remove", user_id)
+
+    def clear_department(self, department_id):
+        """Silinen departmana bağlı kullanıcıların department_id'sini boşaltır"""
+        if not USER_INDEX_ENABLED:
+            return
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+            rows = [state.rows[user_id]
+                    for domain in state.domains.values()
+                    for user_id in domain.by_department.get(department_id, ())]
+        for row in rows:
+            self._apply("upsert", row.replace(department_id=None))
+
+    def refresh(self, user_ids):
+        """Verilen id'lerin güncel hallerini veritabanından okuyup uygular"""
+        if len(user_ids) > USER_INDEX_BULK_RELOAD:
+            self.invalidate()
+            return
+        with db_session() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"{_SELECT_USERS} WHERE id = ANY(%s)", (list(user_ids),))
+            rows = cursor.fetchall()
+        found = set()
+        for values in rows:
+            found.add(values[0])
+            self._apply("upsert", UserRow(*values))
+        for user_id in user_ids:
+            if user_id not in found:
+                self._apply("remove", user_id)
+
+    # ------------------------------------------------------------------ okuma
+
+    def get_by_username(self, domain_id, username):
+        with self._lock:
+            domain = self._state.domains.get(domain_id)
+            if domain is None:
+                return None
+            user_id = domain.by_username.get(username)
+            return domain.rows[user_id] if user_id is not None else None
+
+    def _rows_by(self, attribute, value):
+        with self._lock:
+            rows = []
+            for domain in self._state.domains.values():
+                ids = getattr(domain, attribute).get(value)
+                if ids:
+                    rows.extend(domain.rows[user_id] for user_id in ids)
+        rows.sort(key=attrgetter("id"))
+        return rows
+
+    def by_department(self, department_id):
+        return self._rows_by("by_department", department_id)
+
+    def by_role(self, role_id):
+        return self._rows_by("by_role", role_id)
+
+    def query_page(self, domain_id, fields, sort, order, status=None, search=None, after=None, limit=None):
+        """
+        list_users_page'in indeks karşılığı; satırları (alanlar..., sıralama değeri) tuple'ları
+        olarak döndürür
+
+        Args:
+            after (tuple, optional): Cursor'dan çözülen (sıralama değeri, id)
+            limit (int, optional): Döndürülecek en fazla satır
+        """
+        with self._lock:
+            domain = self._state.domains.get(domain_id)
+            if domain is None:
+                return []
+            keys, rows = domain.sorted_rows(sort)
+
+        if order == "asc":
+            start = bisect.bisect_right(keys, after) if after is not None else 0
+            candidates = (rows[i] for i in range(start, len(rows)))
+        else:
+            end = bisect.bisect_left(keys, after) if after is not None else len(rows)
+            candidates = (rows[i] for i in range(end - 1, -1, -1))
+
+        needle = fold_case(search) if search else None
+        sort_key = SORT_KEYS[sort]
+        getter = attrgetter(*fields)
+        single = len(fields) == 1
+        result = []
+        for row in candidates:
+            if status is not None and row.status != status:
+                continue
+            if needle is not None and needle not in row.search_text:
+                continue
+            values = (getter(row),) if single else getter(row)
+            result.append(values + (sort_key(row),))
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def size(self):
+        state = self._state
+        return len(state.rows) if state is not None else 0
+
+    # ---------------------------------------------------------------- dinleyici
+
+    def _start_listener(self):
+        if not USER_INDEX_LISTEN or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen_loop, name="user-index-listener", daemon=True)
+        self._listener.start()
+
+    def _listen_loop(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(user=USER, password=PASSWORD, host=HOST,
+                                        port=USER_INDEX_LISTEN_PORT, dbname=DBNAME)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {USER_INDEX_CHANNEL}")
+                # Dinleme başlamadan önceki değişiklikler kaçırılmış olabilir
+                self.invalidate()
+                backoff = 1
+                print(f"✅ Kullanıcı okuma modeli '{USER_INDEX_CHANNEL}' kanalını dinliyor")
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    payloads = [notify.payload for notify in conn.notifies]
+                    conn.notifies.clear()
+                    try:
+                        user_ids = {int(json.loads(payload)["id"]) for payload in payloads}
+                    except (ValueError, KeyError, TypeError):
+                        self.invalidate()
+                        continue
+                    if user_ids:
+                        self.refresh(user_ids)
+            except Exception as e:
+                print(f"❌ Kullanıcı okuma modeli dinleyici hatası: {e}")
+                self.invalidate()
+            finally:
+                if conn is not None and not conn.closed:
+                    conn.close()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+# Uygulama genelinde paylaşılan okuma modeli
+user_index = UserIndex()
+
+registry.gauge_callback("odie_user_index_users", "Kullanıcı okuma modelindeki kullanıcı sayısı", user_index.size)
@@ -1,11 +1,59 @@
-from ldap3 import MODIFY_REPLACE
+from ldap3 import MODIFY_ADD, MODIFY_REPLACE, ASYNC
 from ldap_handler import get_ldap_connection_by_domain_id
-from db_ops import get_db_connection
+from ldap_cache import dn_cache, resolve_user_dn
+from ldap_groups import (DOMAIN_ADMINS, ALREADY_MEMBER_CODES, group_dn_cache, group_filter,
+                         add_group_members)
+from db_ops import db_session, after_commit
+from user_index import user_index
+from auth_guard import credential_cache, check_rate_limit, LoginThrottled
+from prepared_statements import register_query, execute_prepared
+from metrics import registry
+import timing
 import psycopg2
+import os
 import time
+import json
+import base64
+import hmac
+import math
+import threading
 from enum import Enum
 import bcrypt  # Bcrypt kütüphanesini ekliyoruz
 
+# bcrypt çağrıları istek thread'inde senkron çalışır (ayrı havuz yok);
+# eşzamanlı hash sayısı ve süreleri izlenir
+BCRYPT_IN_FLIGHT = registry.gauge("odie_bcrypt_in_flight", "Şu anda çalışan bcrypt işlemi sayısı")
+BCRYPT_LATENCY = registry.histogram("odie_bcrypt_duration_ms", "bcrypt işlem süresi (ms)", ("operation",))
+BCRYPT_ROUNDS_GAUGE = registry.gauge("odie_bcrypt_rounds", "Yeni hash'lerde kullanılan bcrypt cost değeri")
+PASSWORD_REHASHES = registry.counter("odie_password_rehash_total", "Girişte güncel cost ile yeniden hashlenen şifreler",
+                                     ("result",))
+
+# bcrypt cost ayarları (.env üzerinden değiştirilebilir)
+# BCRYPT_ROUNDS verilirse doğrudan kullanılır. Verilmezse cost app_settings tablosundan okunur;
+# orada yoksa ilk başlayan süreç tek hash'in BCRYPT_TARGET_MS'i aşmadığı en yüksek cost'u ölçüp
+# yazar ve tüm worker'lar bu ortak değeri kullanır
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+# BCRYPT_REHASH_ON_LOGIN=1: cost'u güncel değerden farklı hash'ler başarılı girişte yeniden hashlenir
+BCRYPT_REHASH_ON_LOGIN = os.getenv("BCRYPT_REHASH_ON_LOGIN", "1") in ("1", "true", "True")
+# BCRYPT_KEEP_MAX_COST=1: ölçüm, veritabanında kullanılan en yüksek cost'un altında bir değer seçmez
+BCRYPT_KEEP_MAX_COST = os.getenv("BCRYPT_KEEP_MAX_COST", "0") in ("1", "true", "True")
+
+# app_settings anahtarı
+BCRYPT_ROUNDS_SETTING = "bcrypt_rounds"
+# Ortak değer okunamazsa (tablo yok, veritabanı erişilemez) yerel ölçüm bu değerin altına inmez
+_FALLBACK_MIN_ROUNDS = 12
+# Kalibrasyonda ölçülen cost; her cost artışı süreyi ikiye katlar
+_CALIBRATION_ROUNDS = 8
+_bcrypt_rounds = None
+_bcrypt_rounds_lock = threading.Lock()
+
+# LDAP_PIPELINE_ADD_USER=1: add_user LDAP işlemlerini ASYNC bağlantıda, bağımsız olanları
+# yanıt beklemeden arka arkaya göndererek yapar (search ve bekleme yok, ~2 RTT)
+LDAP_PIPELINE_ADD_USER = os.getenv("LDAP_PIPELINE_ADD_USER", "0") in ("1", "true", "True")
+
 # Kullanıcı durumu enum tanımı
 class UserStatus(str, Enum):
     ACTIVE = "devrede"
@@ -17,6 +65,92 @@ class UserRole(int, Enum):
     USER = 2
     GUEST = 3
 
+def calibrate_bcrypt_rounds(target_ms=BCRYPT_TARGET_MS, min_rounds=None):
+    """
+    Bu makinede tek hash'in target_ms'i aşmadığı en yüksek cost'u ölçer
+    (BCRYPT_MIN_ROUNDS ile BCRYPT_MAX_ROUNDS arasında; min_rounds verilirse onun altına inmez)
+    """
+    password_bytes = b"odie-bcrypt-calibration"
+    salt = bcrypt.gensalt(_CALIBRATION_ROUNDS)
+    # İlk çağrının ısınma etkisini dışlamak için en hızlı ölçüm alınır
+    fastest_ms = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(password_bytes, salt)
+        fastest_ms = min(fastest_ms, (time.perf_counter() - started) * 1000)
+    rounds = _CALIBRATION_ROUNDS + int(math.floor(math.log2(target_ms / max(fastest_ms, 0.001))))
+    rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+    return max(rounds, min_rounds or 0)
+
+def _max_bcrypt_cost_in_use(cursor):
+    """Veritabanındaki hash'lerin en yüksek cost'u (hash yoksa None)"""
+    cursor.execute(r"""
+        SELECT MAX(substring(password from 5 for 2)::int)
+        FROM users
+        WHERE password ~ '^\$2[abxy]\$[0-9]{2}\$'
+    """)
+    return cursor.fetchone()[0]
+
+def _shared_bcrypt_rounds():
+    """
+    app_settings'teki ortak cost'u döndürür; yoksa ölçüp yazar. Aynı anda başlayan
+    süreçlerden ilk yazanın değeri geçerli olur. BCRYPT_KEEP_MAX_COST=1 ise ölçüm,
+    kullanımdaki en yüksek cost'un altında bir değer seçemez.
+    """
+    with db_session() as conn_db:
+        cursor = conn_db.cursor()
+        cursor.execute("SELECT value FROM app_settings WHERE key = %s", (BCRYPT_ROUNDS_SETTING,))
+        row = cursor.fetchone()
+        if row:
+            return int(row[0]), "app_settings"
+
+        min_rounds = _max_bcrypt_cost_in_use(cursor) if BCRYPT_KEEP_MAX_COST else None
+        rounds = calibrate_bcrypt_rounds(min_rounds=min_rounds)
+        cursor.execute("""
+            INSERT INTO app_settings (key, value) VALUES (%s, %s)
+            ON CONFLICT (key) DO NOTHING
+        """, (BCRYPT_ROUNDS_SETTING, str(rounds)))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT value FROM app_settings WHERE key = %s", (BCRYPT_ROUNDS_SETTING,))
+            return int(cursor.fetchone()[0]), "app_settings"
+        return rounds, f"hedef {BCRYPT_TARGET_MS:.0f} ms, app_settings'e yazıldı"
+
+def bcrypt_rounds():
+    """Yeni hash'lerde kullanılacak cost (ilk çağrıda belirlenir)"""
+    global _bcrypt_rounds
+    if _bcrypt_rounds is None:
+        with _bcrypt_rounds_lock:
+            if _bcrypt_rounds is None:
+                if BCRYPT_ROUNDS:
+                    rounds, source = int(BCRYPT_ROUNDS), "BCRYPT_ROUNDS"
+                else:
+                    try:
+                        rounds, source = _shared_bcrypt_rounds()
+                    except Exception as e:
+                        print(f"❌ Ortak bcrypt cost okunamadı, yerel ölçüm kullanılıyor: {e}")
+                        rounds = calibrate_bcrypt_rounds(min_rounds=_FALLBACK_MIN_ROUNDS)
+                        source = f"yerel ölçüm, hedef {BCRYPT_TARGET_MS:.0f} ms"
+                print(f"🔐 bcrypt cost: {rounds} ({source})")
+                BCRYPT_ROUNDS_GAUGE.set(rounds)
+                _bcrypt_rounds = rounds
+    return _bcrypt_rounds
+
+def bcrypt_cost(hashed_password):
+    """Hash'teki cost değerini döndürür ($2b$12$... -> 12); bcrypt hash'i değilse None"""
+    parts = (hashed_password or "").split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(hashed_password):
+    """
+    Hash'in cost'u güncel değerden farklıysa True; cost her iki yönde de değiştirilebilir.
+    Cost tüm worker'larda ortak olduğundan (app_settings veya BCRYPT_ROUNDS) süreçler
+    aynı hash'i karşılıklı yeniden hashlemez.
+    """
+    cost = bcrypt_cost(hashed_password)
+    return cost is not None and cost != bcrypt_rounds()
+
 # Şifre hashleme fonksiyonu
 def hash_password(plain_password):
     """
@@ -30,8 +164,17 @@ def hash_password(plain_password):
     """
     # Şifreyi bytes'a çevir
     password_bytes = plain_password.encode('utf-8')
-    # Salt üret ve şifreyi hashle (gensalt(12) = 2^12 rounds)
-    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt(12))
+    # Salt üret ve şifreyi hashle (cost = bcrypt_rounds(), 2^cost rounds)
+    salt = bcrypt.gensalt(bcrypt_rounds())
+    BCRYPT_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        hashed = bcrypt.hashpw(password_bytes, salt)
+    finally:
+        BCRYPT_IN_FLIGHT.dec()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        BCRYPT_LATENCY.labels("hash").observe(elapsed_ms)
+        timing.record("bcrypt", elapsed_ms)
     # Hash'i string olarak döndür
     return hashed.decode('utf-8')
 
@@ -50,30 +193,53 @@ def verify_password(plain_password, hashed_password):
     try:
         password_bytes = plain_password.encode('utf-8')
         hashed_bytes = hashed_password.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
+        BCRYPT_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return bcrypt.checkpw(password_bytes, hashed_bytes)
+        finally:
+            BCRYPT_IN_FLIGHT.dec()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            BCRYPT_LATENCY.labels("verify").observe(elapsed_ms)
+            timing.record("bcrypt", elapsed_ms)
     except Exception as e:
         print(f"❌ Şifre doğrulama hatası: {e}")
         return False
 
-def add_user_to_admin_group(conn_ldap, username, base_dn):
-    user_dn = f"CN={username},CN=Users,{base_dn}"
-    admin_group_dn = f"CN=Domain Admins,CN=Users,{base_dn}"
+def _modify_user(conn_ldap, domain_id, base_dn, username, user_dn, changes):
+    """
+    Kullanıcı üzerinde LDAP modify yapar. Önbellekten gelen DN artık geçersizse
+    (noSuchObject) DN'i LDAP'ten yeniden çözüp işlemi bir kez daha dener.
 
-    if conn_ldap.modify(admin_group_dn, {'member': [(MODIFY_REPLACE, [user_dn])]}):
-        print(f"✅ {username} kullanıcısı Domain Admins grubuna eklendi.")
-    else:
-        print(f"❌ {username} kullanıcısı Domain Admins grubuna eklenemedi: {conn_ldap.result}")
+    Returns:
+        tuple: (bool, str) - İşlem başarılı mı, kullanılan DN
+    """
+    if conn_ldap.modify(user_dn, changes):
+        return True, user_dn
 
-def add_user(domain_id, username, first_name, last_name, password, role_id=2, department_id=None , created_by=None):
-    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
-    user_dn = f"CN={username},CN=Users,{base_dn}"
+    # 32 = noSuchObject: kullanıcı taşınmış veya yeniden adlandırılmış olabilir
+    if conn_ldap.result.get('result') != 32:
+        return False, user_dn
 
-    conn_ldap.search(base_dn, f'(sAMAccountName={username})', attributes=['distinguishedName'])
-    if conn_ldap.entries:
-        print(f"❌ Kullanıcı zaten var: {username}")
-        return False, "devre dışı"
+    dn_cache.invalidate(domain_id, username)
+    resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username, use_cache=False)
+    if not resolved:
+        return False, user_dn
+    return conn_ldap.modify(resolved[0], changes), resolved[0]
+
+def add_user_to_admin_group(conn_ldap, domain_id, username, base_dn, user_dn=None):
+    """Kullanıcıyı Domain Admins grubuna ekler (MODIFY_ADD; mevcut üyeler korunur)"""
+    user_dn = user_dn or f"CN={username},CN=Users,{base_dn}"
+    result = add_group_members(conn_ldap, domain_id, base_dn, DOMAIN_ADMINS, [user_dn])
+
+    if result["failed"]:
+        print(f"❌ {username} kullanıcısı Domain Admins grubuna eklenemedi: {result['error']}")
+        return False
+    print(f"✅ {username} kullanıcısı Domain Admins grubuna eklendi.")
+    return True
 
-    user_attributes = {
+def _user_attributes(username, first_name, last_name):
+    return {
         'objectClass': ['top', 'person', 'organizationalPerson', 'user'],
         'cn': username,
         'sAMAccountName': username,
@@ -82,28 +248,139 @@ def add_user(domain_id, username, first_name, last_name, password, role_id=2, de
         'userAccountControl': 514
     }
 
-    if conn_ldap.add(user_dn, attributes=user_attributes):
-        print(f"✅ LDAP'e eklendi (devre dışı): {username}")
+def _password_value(password):
+    return ('"%s"' % password).encode('utf-16-le')
+
+def _add_user_ldap(conn_ldap, domain_id, base_dn, user_dn, username, first_name, last_name, password, role_id,
+                   group_batch=None):
+    """
+    Sıralı LDAP akışı: search, add, şifre, userAccountControl ve grup işlemleri tek tek beklenir
+
+    Returns:
+        str: Kullanıcının durumu; LDAP'e eklenemediyse None
+    """
+    # Önbellek atlanır: dışarıda silinmiş bir hesabın eski kaydı eklemeyi TTL boyunca engellemesin
+    if resolve_user_dn(conn_ldap, domain_id, base_dn, username, use_cache=False):
+        print(f"❌ Kullanıcı zaten var: {username}")
+        return None
+
+    if not conn_ldap.add(user_dn, attributes=_user_attributes(username, first_name, last_name)):
+        print(f"❌ LDAP'e eklenemedi: {conn_ldap.result}")
+        return None
+
+    print(f"✅ LDAP'e eklendi (devre dışı): {username}")
+    with timing.span("sleep"):
         time.sleep(1)
 
-        password_value = ('"%s"' % password).encode('utf-16-le')
-        if conn_ldap.modify(user_dn, {'unicodePwd': [(MODIFY_REPLACE, [password_value])]}):
-            conn_ldap.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [512])]})
-            print(f"✅ Şifre ayarlandı, kullanıcı devrede: {username}")
-            status = 'devrede'
+    if conn_ldap.modify(user_dn, {'unicodePwd': [(MODIFY_REPLACE, [_password_value(password)])]}):
+        conn_ldap.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [512])]})
+        print(f"✅ Şifre ayarlandı, kullanıcı devrede: {username}")
+        status = 'devrede'
+    else:
+        print("⚠️ Şifre atanamadı, kullanıcı devre dışı kaldı.")
+        status = 'devre dışı'
+
+    if role_id == 1:
+        if group_batch is not None:
+            group_batch.add(DOMAIN_ADMINS, user_dn)
         else:
-            print("⚠️ Şifre atanamadı, kullanıcı devre dışı kaldı.")
-            status = 'devre dışı'        
-        if role_id == 1:
-            add_user_to_admin_group(conn_ldap, username, base_dn)
-            
+            add_user_to_admin_group(conn_ldap, domain_id, username, base_dn, user_dn)
+    return status
+
+def _add_user_ldap_pipelined(conn_ldap, domain_id, base_dn, user_dn, username, first_name, last_name, password,
+                             role_id, group_batch=None):
+    """
+    ASYNC bağlantıda LDAP akışı. Ön arama yapılmaz: aynı sAMAccountName veya DN varsa add
+    başarısız olur. Şifre ve userAccountControl tek modify ile atomik olarak değiştirilir;
+    bu modify ile Domain Admins değişikliği birbirine bağlı olmadığından birlikte gönderilir.
+    Birbirine bağlı istekler (add -> modify) RFC 4511 gereği yanıt beklenmeden gönderilmez.
+    Domain Admins DN'i önbellekte yoksa araması add ile birlikte gönderilir.
+
+    Returns:
+        str: Kullanıcının durumu; LDAP'e eklenemediyse None
+    """
+    # Varlık kontrolü add'in kendisidir; önbellek kaydına bakılmaz (dışarıda silinmiş bir
+    # hesabın eski kaydı eklemeyi TTL boyunca engellerdi)
+    admin_group_dn = None
+    message_ids = [conn_ldap.add(user_dn, attributes=_user_attributes(username, first_name, last_name))]
+    if role_id == 1 and group_batch is None:
+        cached = group_dn_cache.get(domain_id, DOMAIN_ADMINS)
+        if cached:
+            admin_group_dn = cached[0]
+        else:
+            message_ids.append(conn_ldap.search(base_dn, group_filter(DOMAIN_ADMINS), attributes=['distinguishedName']))
+    results = conn_ldap.wait_responses(*message_ids)
+    added = results[0]
+    if len(results) > 1 and results[1].get('entries'):
+        admin_group_dn = results[1]['entries'][0]['dn']
+        group_dn_cache.put(domain_id, DOMAIN_ADMINS, admin_group_dn)
+
+    if added['result'] != 0:
+        # 68 = entryAlreadyExists
+        if added['result'] == 68:
+            print(f"❌ Kullanıcı zaten var: {username}")
+        else:
+            print(f"❌ LDAP'e eklenemedi: {added}")
+        return None
+    print(f"✅ LDAP'e eklendi (devre dışı): {username}")
+
+    message_ids = [conn_ldap.modify(user_dn, {
+        'unicodePwd': [(MODIFY_REPLACE, [_password_value(password)])],
+        'userAccountControl': [(MODIFY_REPLACE, [512])]
+    })]
+    if role_id == 1 and group_batch is not None:
+        group_batch.add(DOMAIN_ADMINS, user_dn)
+    elif role_id == 1 and admin_group_dn:
+        message_ids.append(conn_ldap.modify(admin_group_dn, {'member': [(MODIFY_ADD, [user_dn])]}))
+    elif role_id == 1:
+        print(f"❌ {username} kullanıcısı Domain Admins grubuna eklenemedi: grup bulunamadı")
+    results = conn_ldap.wait_responses(*message_ids)
+
+    if results[0]['result'] == 0:
+        print(f"✅ Şifre ayarlandı, kullanıcı devrede: {username}")
+        status = 'devrede'
+    else:
+        print(f"⚠️ Şifre atanamadı, kullanıcı devre dışı kaldı: {results[0].get('message')}")
+        status = 'devre dışı'
+
+    if len(results) > 1:
+        if results[1]['result'] == 0 or results[1]['result'] in ALREADY_MEMBER_CODES:
+            print(f"✅ {username} kullanıcısı Domain Admins grubuna eklendi.")
+        else:
+            print(f"❌ {username} kullanıcısı Domain Admins grubuna eklenemedi: {results[1]}")
+    return status
+
+def add_user(domain_id, username, first_name, last_name, password, role_id=2, department_id=None , created_by=None, conn=None,
+             group_batch=None):
+    """
+    group_batch (ldap_groups.GroupMembershipBatch) verilirse grup üyeliği hemen yapılmaz,
+    toplu işlemin sonunda batch.flush ile grup başına tek modify'da uygulanır.
+    """
+    if LDAP_PIPELINE_ADD_USER:
+        conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id, conn=conn, client_strategy=ASYNC)
+        user_dn = f"CN={username},CN=Users,{base_dn}"
         try:
-            conn_db = get_db_connection()
+            status = _add_user_ldap_pipelined(conn_ldap, domain_id, base_dn, user_dn, username, first_name,
+                                              last_name, password, role_id, group_batch)
+        finally:
+            # ASYNC stratejisinin yanıt thread'i kapatılır
+            conn_ldap.unbind()
+    else:
+        conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id, conn=conn)
+        user_dn = f"CN={username},CN=Users,{base_dn}"
+        status = _add_user_ldap(conn_ldap, domain_id, base_dn, user_dn, username, first_name, last_name, password,
+                                role_id, group_batch)
+
+    if status is None:
+        return False, "devre dışı"
+    dn_cache.put(domain_id, username, user_dn, 512 if status == 'devrede' else 514)
+
+    try:
+        # Şifreyi güvenli bir şekilde hashle (bağlantı tutulmadan önce)
+        hashed_password = hash_password(password)
+
+        with db_session(conn) as conn_db:
             cursor = conn_db.cursor()
-            
-            # Şifreyi güvenli bir şekilde hashle
-            hashed_password = hash_password(password)
-            
             insert_query = """
                 INSERT INTO users (username, password, first_name, last_name, role_id, department_id, status, domain_id)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
@@ -115,46 +392,53 @@ def add_user(domain_id, username, first_name, last_name, password, role_id=2, de
                     department_id = EXCLUDED.department_id,
                     status = EXCLUDED.status,
                     domain_id = EXCLUDED.domain_id
+                RETURNING id
             """
             cursor.execute(insert_query, (username, hashed_password, first_name, last_name, role_id, department_id, status, domain_id))
-            conn_db.commit()
-            conn_db.close()
-            print(f"✅ Supabase'e eklendi: {username}")
-        except Exception as e:
-            print(f"❌ Supabase'e eklenemedi: {e}")
+            user_id = cursor.fetchone()[0]
+            after_commit(conn_db, user_index.upsert, (user_id, username, hashed_password, first_name, last_name,
+                                                      role_id, department_id, status, domain_id))
+        print(f"✅ Supabase'e eklendi: {username}")
+    except Exception as e:
+        print(f"❌ Supabase'e eklenemedi: {e}")
 
-        return True, status
-    
-    else:
-        print(f"❌ LDAP'e eklenemedi: {conn_ldap.result}")
-    return False, "devre dışı"
+    return True, status
 
-def disable_user(domain_id, username, enable=False):
-    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
-    conn_ldap.search(base_dn, f'(sAMAccountName={username})', attributes=['distinguishedName', 'userAccountControl'])
+def disable_user(domain_id, username, enable=False, conn=None):
+    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id, conn=conn)
+    resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username)
 
-    if not conn_ldap.entries:
+    if not resolved:
         print(f"❌ Kullanıcı bulunamadı: {username}")
         return False, None
 
-    user_dn = conn_ldap.entries[0].distinguishedName.value
-    current_status = int(conn_ldap.entries[0].userAccountControl.value)
+    user_dn, current_status = resolved
     new_status = 512 if enable else 514
     status_text = "devrede" if enable else "devre dışı"
     action = "aktifleştirildi" if enable else "devre dışı bırakıldı"
 
+    if current_status == new_status:
+        # Önbellekteki durum eski olabilir, "zaten" demeden önce LDAP'ten doğrula
+        resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username, use_cache=False)
+        if not resolved:
+            print(f"❌ Kullanıcı bulunamadı: {username}")
+            return False, None
+        user_dn, current_status = resolved
+
     if current_status == new_status:
         print(f"⚠️ Kullanıcı zaten {status_text}: {username}")
         return False, status_text
 
-    if conn_ldap.modify(user_dn, {'userAccountControl': [(MODIFY_REPLACE, [new_status])]}):
+    modified, user_dn = _modify_user(conn_ldap, domain_id, base_dn, username, user_dn,
+                                     {'userAccountControl': [(MODIFY_REPLACE, [new_status])]})
+    if modified:
+        dn_cache.set_uac(domain_id, username, new_status)
         print(f"✅ LDAP'te kullanıcı {action}: {username}")
         try:
-            conn_db = get_db_connection()
-            cursor = conn_db.cursor()
-            cursor.execute("UPDATE users SET status = %s WHERE username = %s AND domain_id = %s", (status_text, username, domain_id))
-            conn_db.commit()
-            conn_db.close()
+            with db_session(conn) as conn_db:
+                cursor = conn_db.cursor()
+                cursor.execute("UPDATE users SET status = %s WHERE username = %s AND domain_id = %s", (status_text, username, domain_id))
+                after_commit(conn_db, user_index.update_fields, domain_id, username, {"status": status_text})
             print(f"✅ Supabase'de de status güncellendi: {status_text}")
         except Exception as e:
             print(f"❌ Supabase güncelleme hatası: {e}")
@@ -163,52 +447,43 @@ def disable_user(domain_id, username, enable=False):
         print(f"❌ LDAP değiştirilemedi: {conn_ldap.result}")
         return False, status_text
 
-def delete_user(domain_id, username):
-    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
-    conn_ldap.search(base_dn, f'(sAMAccountName={username})', attributes=['distinguishedName'])
+def delete_user(domain_id, username, conn=None):
+    conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id, conn=conn)
+    resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username)
 
-    if not conn_ldap.entries:
+    if not resolved:
         print(f"❌ Kullanıcı bulunamadı: {username}")
         return False
 
-    user_dn = conn_ldap.entries[0].distinguishedName.value
-    
-    if conn_ldap.delete(user_dn):
+    user_dn = resolved[0]
+    deleted = conn_ldap.delete(user_dn)
+
+    # Önbellekteki DN eskimişse (noSuchObject) güncel DN ile bir kez daha dene
+    if not deleted and conn_ldap.result.get('result') == 32:
+        dn_cache.invalidate(domain_id, username)
+        resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username, use_cache=False)
+        if resolved:
+            user_dn = resolved[0]
+            deleted = conn_ldap.delete(user_dn)
+
+    if deleted:
+        dn_cache.invalidate(domain_id, username)
         print(f"✅ LDAP'ten silindi: {username}")
         try:
-            conn_db = get_db_connection()
-            if not conn_db:
-                print(f"❌ Veritabanı bağlantısı kurulamadı!")
-                return True
-                
-            cursor = conn_db.cursor()
-              # Önce kullanıcının veritabanında var olup olmadığını kontrol et (case-insensitive)
-            cursor.execute("SELECT id, username, domain_id FROM users WHERE LOWER(username) = LOWER(%s) AND domain_id = %s", (username, domain_id))
-            user_exists = cursor.fetchone()
+            with db_session(conn) as conn_db:
+                cursor = conn_db.cursor()
+                # Kullanıcıyı case-insensitive olarak tek sorguda sil ve silinen kayıtları döndür
+                cursor.execute(
+                    "DELETE FROM users WHERE LOWER(username) = LOWER(%s) AND domain_id = %s RETURNING id, username",
+                    (username, domain_id)
+                )
+                deleted_rows = cursor.fetchall()
+                after_commit(conn_db, user_index.remove, *[row[0] for row in deleted_rows])
             
-            if user_exists:
-                actual_username = user_exists[1]  # Veritabanındaki gerçek kullanıcı adı
-                print(f"🔍 Kullanıcı veritabanında bulundu: ID={user_exists[0]}, Username={actual_username}, Domain_ID={user_exists[2]}")
-                
-                # Silme işlemini gerçekleştir (gerçek kullanıcı adını kullan)
-                cursor.execute("DELETE FROM users WHERE LOWER(username) = LOWER(%s) AND domain_id = %s", (username, domain_id))
-                affected_rows = cursor.rowcount
-                conn_db.commit()
-                
-                print(f"✅ Supabase'den silindi: {username} (Etkilenen satır sayısı: {affected_rows})")
-                
-                # Silme işlemini doğrula
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username = %s AND domain_id = %s", (username, domain_id))
-                remaining_count = cursor.fetchone()[0]
-                
-                if remaining_count == 0:
-                    print(f"✅ Silme doğrulandı: {username} artık veritabanında yok")
-                else:
-                    print(f"⚠️ Silme başarısız: {username} hala veritabanında ({remaining_count} kayıt)")
+            if deleted_rows:
+                print(f"✅ Supabase'den silindi: {username} (Etkilenen satır sayısı: {len(deleted_rows)}, ID={deleted_rows[0][0]})")
             else:
                 print(f"⚠️ Kullanıcı Supabase'de bulunamadı: {username} (domain_id: {domain_id})")
-                
-            conn_db.close()
         except Exception as e:
             print(f"❌ Supabase silme hatası: {e}")
         return True
@@ -216,9 +491,15 @@ def delete_user(domain_id, username):
         print(f"❌ LDAP'ten silinemedi: {conn_ldap.result}")
         return False
 
-def update_user(domain_id, username, first_name=None, last_name=None, password=None, role_id=None, department_id=None):
+# update_user yanıtında dönen alanlar (UPDATE ... RETURNING)
+USER_UPDATE_RETURNING = ("id", "username", "first_name", "last_name", "role_id", "department_id", "status")
+
+def update_user(domain_id, username, first_name=None, last_name=None, password=None, role_id=None, department_id=None, conn=None):
     """
     Mevcut bir kullanıcının bilgilerini günceller.
+
+    LDAP'e sadece ad, soyad veya şifre değiştiğinde gidilir; rol ve departman sadece
+    veritabanındadır. Veritabanı tarafı tek bir UPDATE ... RETURNING ifadesidir.
     
     Args:
         domain_id (int): Domain ID
@@ -228,19 +509,12 @@ def update_user(domain_id, username, first_name=None, last_name=None, password=N
         password (str, optional): Kullanıcının yeni şifresi
         role_id (int, optional): Kullanıcının yeni rol ID'si
         department_id (int, optional): Kullanıcının yeni departman ID'si
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
     
     Returns:
-        tuple: (bool, str) - İşlem başarılı mı, durum mesajı
+        tuple: (bool, str, dict) - İşlem başarılı mı, durum mesajı, kullanıcının güncel hali
     """
     try:
-        conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id)
-        conn_ldap.search(base_dn, f'(sAMAccountName={username})', attributes=['distinguishedName'])
-        
-        if not conn_ldap.entries:
-            print(f"❌ Kullanıcı bulunamadı: {username}")
-            return False, "Kullanıcı bulunamadı"
-        
-        user_dn = conn_ldap.entries[0].distinguishedName.value
         ldap_changes = {}
         
         # LDAP'de güncellenecek alanlar
@@ -252,56 +526,214 @@ def update_user(domain_id, username, first_name=None, last_name=None, password=N
         
         # Şifre değişikliği varsa
         if password:
-            password_value = ('"%s"' % password).encode('utf-16-le')
-            ldap_changes['unicodePwd'] = [(MODIFY_REPLACE, [password_value])]
+            ldap_changes['unicodePwd'] = [(MODIFY_REPLACE, [_password_value(password)])]
         
-        # LDAP güncellemesi
-        if ldap_changes and not conn_ldap.modify(user_dn, ldap_changes):
-            print(f"❌ LDAP güncellemesi başarısız: {conn_ldap.result}")
-            return False, "LDAP güncellemesi başarısız"
+        # LDAP güncellemesi (LDAP hatasında veritabanına yazılmaz)
+        if ldap_changes:
+            conn_ldap, base_dn = get_ldap_connection_by_domain_id(domain_id, conn=conn)
+            resolved = resolve_user_dn(conn_ldap, domain_id, base_dn, username)
+
+            if not resolved:
+                print(f"❌ Kullanıcı bulunamadı: {username}")
+                return False, "Kullanıcı bulunamadı", None
+
+            if not _modify_user(conn_ldap, domain_id, base_dn, username, resolved[0], ldap_changes)[0]:
+                print(f"❌ LDAP güncellemesi başarısız: {conn_ldap.result}")
+                return False, "LDAP güncellemesi başarısız", None
         
         # Veritabanı güncellemesi
-        conn_db = get_db_connection()
-        cursor = conn_db.cursor()
-        
         db_changes = []
         params = []
+        index_changes = {}
         
         if first_name:
             db_changes.append("first_name = %s")
             params.append(first_name)
+            index_changes["first_name"] = first_name
         
         if last_name:
             db_changes.append("last_name = %s")
             params.append(last_name)
+            index_changes["last_name"] = last_name
         if password:
             db_changes.append("password = %s")
             # Şifreyi güvenli bir şekilde hashle
             hashed_password = hash_password(password)
             params.append(hashed_password)
+            index_changes["password"] = hashed_password
         
         if role_id:
             db_changes.append("role_id = %s")
             params.append(role_id)
+            index_changes["role_id"] = role_id
         
         if department_id:
             db_changes.append("department_id = %s")
             params.append(department_id)
+            index_changes["department_id"] = department_id
         
-        if db_changes:
-            query = f"UPDATE users SET {', '.join(db_changes)} WHERE username = %s AND domain_id = %s"
-            params.extend([username, domain_id])
-            cursor.execute(query, params)
-            conn_db.commit()
-        
-        conn_db.close()
+        returning = ", ".join(USER_UPDATE_RETURNING)
+        with db_session(conn) as conn_db:
+            cursor = conn_db.cursor()
+            if db_changes:
+                cursor.execute(
+                    f"UPDATE users SET {', '.join(db_changes)} WHERE username = %s AND domain_id = %s RETURNING {returning}",
+                    params + [username, domain_id]
+                )
+            else:
+                cursor.execute(f"SELECT {returning} FROM users WHERE username = %s AND domain_id = %s",
+                               (username, domain_id))
+            row = cursor.fetchone()
+            if row is None:
+                print(f"❌ Kullanıcı bulunamadı: {username}")
+                return False, "Kullanıcı bulunamadı", None
+            if db_changes:
+                after_commit(conn_db, user_index.update_fields, domain_id, username, index_changes)
         
-        return True, "✅ Kullanıcı bilgileri güncellendi"
+        return True, "✅ Kullanıcı bilgileri güncellendi", dict(zip(USER_UPDATE_RETURNING, row))
     except Exception as e:
         print(f"❌ Kullanıcı güncelleme hatası: {e}")
-        return False, f"Güncelleme hatası: {e}"
+        return False, f"Güncelleme hatası: {e}", None
+
+# Listeleme için izin verilen alanlar ve sıralama anahtarları
+USER_LIST_FIELDS = ("id", "username", "first_name", "last_name", "role_id", "department_id", "status", "domain_id")
+# COLLATE "C": kod noktası sırası; kullanıcı okuma modelinin (user_index.SORT_KEYS) Python
+# sıralamasıyla aynıdır, böylece cursor hangi yoldan üretildiyse diğerinde de aynı yeri gösterir
+USER_SORT_KEYS = {
+    "username": 'username COLLATE "C"',
+    "first_name": 'COALESCE(first_name, \'\') COLLATE "C"',
+    "last_name": 'COALESCE(last_name, \'\') COLLATE "C"',
+    "status": 'status COLLATE "C"',
+    "id": "id",
+}
+MAX_PAGE_SIZE = 500
+# fields verilmediğinde seçilen alanlar
+_DEFAULT_LIST_FIELDS = [f for f in USER_LIST_FIELDS if f != "domain_id"]
+
+def _encode_cursor(sort_value, user_id):
+    raw = json.dumps([sort_value, user_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_cursor(cursor):
+    try:
+        sort_value, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, int(user_id)
+    except Exception:
+        raise ValueError("Geçersiz cursor değeri")
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
 
-def get_users_by_domain(domain_id, status=None):
+def list_users_page(domain_id, status=None, limit=None, cursor=None, sort="username", order="asc",
+                    fields=None, search=None, as_rows=False, conn=None):
+    """
+    Domain kullanıcılarını keyset (cursor) sayfalama ile listeler.
+    Şifre hash'i hiçbir zaman döndürülmez.
+    
+    Args:
+        domain_id (int): Domain ID
+        status (str veya UserStatus, optional): "devrede" veya "devre dışı"
+        limit (int, optional): Sayfa boyutu (None ise tüm kullanıcılar, en fazla MAX_PAGE_SIZE)
+        cursor (str, optional): Bir önceki sayfanın next_cursor değeri
+        sort (str): Sıralama anahtarı (username, first_name, last_name, status, id)
+        order (str): "asc" veya "desc"
+        fields (list, optional): Döndürülecek alanlar (id her zaman döner)
+        search (str, optional): username/ad/soyad içinde aranacak metin
+        as_rows (bool): True ise dict oluşturulmaz, "columns" ve "rows" (tuple) döner
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
+        
+    Returns:
+        dict: {"users": [...], "next_cursor": str veya None, "has_more": bool}
+    """
+    if sort not in USER_SORT_KEYS:
+        raise ValueError(f"Geçersiz sıralama anahtarı: {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Geçersiz sıralama yönü: {order}")
+    if limit is not None and limit < 1:
+        raise ValueError("limit en az 1 olmalıdır")
+
+    if fields:
+        unknown = [f for f in fields if f not in USER_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Geçersiz alan(lar): {', '.join(unknown)}")
+        selected = ["id"] + [f for f in USER_LIST_FIELDS if f in fields and f != "id"]
+    else:
+        selected = list(_DEFAULT_LIST_FIELDS)
+
+    status_value = status.value if isinstance(status, UserStatus) else status
+    if status_value not in (UserStatus.ACTIVE.value, UserStatus.DISABLED.value):
+        status_value = None
+    after = _decode_cursor(cursor) if cursor else None
+    page_size = min(limit, MAX_PAGE_SIZE) if limit is not None else None
+
+    if user_index.available(conn):
+        rows = user_index.query_page(domain_id, selected, sort, order, status=status_value, search=search,
+                                     after=after, limit=page_size + 1 if page_size is not None else None)
+    else:
+        rows = _query_users_page(domain_id, selected, sort, order, status_value, search, after, page_size, conn)
+
+    has_more = page_size is not None and len(rows) > page_size
+    if has_more:
+        rows = rows[:page_size]
+
+    next_cursor = _encode_cursor(rows[-1][-1], rows[-1][0]) if has_more else None
+    if as_rows:
+        return {"columns": selected, "rows": [row[:-1] for row in rows],
+                "next_cursor": next_cursor, "has_more": has_more}
+
+    users = [dict(zip(selected, row[:-1])) for row in rows]
+    return {"users": users, "next_cursor": next_cursor, "has_more": has_more}
+
+def _query_users_page(domain_id, selected, sort, order, status_value, search, after, page_size, conn=None):
+    """list_users_page'in veritabanı sorgusu; satırların sonunda sıralama değeri bulunur"""
+    sort_expr = USER_SORT_KEYS[sort]
+    direction = "ASC" if order == "asc" else "DESC"
+    conditions = ["domain_id = %s"]
+    params = [domain_id]
+
+    if status_value:
+        conditions.append("status = %s")
+        params.append(status_value)
+
+    if search:
+        # ILIKE veritabanı locale'inin lower() eşlemesini kullanır; indeks yolu aynı eşlemeyi
+        # user_index.fold_case ile uygular
+        pattern = f"%{_escape_like(search)}%"
+        conditions.append("(username ILIKE %s OR first_name ILIKE %s OR last_name ILIKE %s)")
+        params.extend([pattern, pattern, pattern])
+
+    if after:
+        sort_value, last_id = after
+        comparison = ">" if order == "asc" else "<"
+        if sort == "id":
+            conditions.append(f"id {comparison} %s")
+            params.append(last_id)
+        else:
+            conditions.append(f"({sort_expr}, id) {comparison} (%s, %s)")
+            params.extend([sort_value, last_id])
+
+    query = f"""
+        SELECT {', '.join(selected)}, {sort_expr}
+        FROM users
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {sort_expr} {direction}, id {direction}
+    """
+    if page_size is not None:
+        query += " LIMIT %s"
+        params.append(page_size + 1)
+
+    with db_session(conn) as conn:
+        db_cursor = conn.cursor()
+        if selected == _DEFAULT_LIST_FIELDS and not search:
+            # Sık kullanılan biçimler (varsayılan alanlar, aramasız: sıralama x yön x durum x
+            # cursor x limit en fazla 80 sorgu) bağlantı başına bir kez hazırlanır. Alan seçimi ve
+            # arama kombinasyonları sınırsız sayıda biçim üreteceğinden hazırlanmadan çalıştırılır.
+            execute_prepared(db_cursor, register_query(None, query), params)
+        else:
+            db_cursor.execute(query, params)
+        return db_cursor.fetchall()
+
+def get_users_by_domain(domain_id, status=None, conn=None):
     """
     Belirli bir domain'deki kullanıcıları listeler.
     
@@ -314,75 +746,108 @@ def get_users_by_domain(domain_id, status=None):
         list: Kullanıcı bilgilerini içeren sözlük listesi
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        status_value = None
-        if isinstance(status, UserStatus):
-            status_value = status.value
-        elif status in [UserStatus.ACTIVE.value, UserStatus.DISABLED.value]:
-            status_value = status
-            
-        if status_value:
-            cursor.execute("""
-                SELECT id, username, first_name, last_name, role_id, department_id, status
-                FROM users 
-                WHERE domain_id = %s AND status = %s
-                ORDER BY username
-            """, (domain_id, status_value))
-        else:
-            cursor.execute("""
-                SELECT id, username, first_name, last_name, role_id, department_id, status
-                FROM users 
-                WHERE domain_id = %s
-                ORDER BY username
-            """, (domain_id,))
-            
-        users = cursor.fetchall()
-        conn.close()
-        
-        user_list = []
-        for u in users:
-            user_list.append({
-                "id": u[0],
-                "username": u[1],
-                "first_name": u[2],
-                "last_name": u[3],
-                "role_id": u[4],
-                "department_id": u[5],
-                "status": u[6]
-            })
-        
-        return user_list
+        return list_users_page(domain_id, status=status, conn=conn)["users"]
     except Exception as e:
         print(f"❌ Kullanıcı listeleme hatası: {e}")
         return []
 
-def authenticate_user(username, password, domain_id):
+def get_user(domain_id, username, conn=None):
     """
-    Kullanıcı girişini doğrular
+    Domain'deki tek bir kullanıcıyı getirir (düzenleme formu için tüm liste okunmaz).
+    Şifre hash'i döndürülmez.
+
+    Args:
+        domain_id (int): Domain ID
+        username (str): Kullanıcı adı
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
+
+    Returns:
+        dict veya None: Kullanıcı bilgileri (list_users_page'in varsayılan alanları)
+    """
+    if user_index.available(conn):
+        row = user_index.get_by_username(domain_id, username)
+        return {field: getattr(row, field) for field in _DEFAULT_LIST_FIELDS} if row else None
+
+    with db_session(conn) as conn_db:
+        cursor = conn_db.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join(_DEFAULT_LIST_FIELDS)}
+            FROM users
+            WHERE username = %s AND domain_id = %s
+        """, (username, domain_id))
+        row = cursor.fetchone()
+    return dict(zip(_DEFAULT_LIST_FIELDS, row)) if row else None
+
+def _rehash_password(user_id, domain_id, username, password, old_hash, conn=None):
+    """
+    Doğrulanmış şifreyi güncel cost ile yeniden hashler. Şifre arada değiştiyse
+    (hash artık old_hash değilse) dokunulmaz. Hata girişi engellemez.
+
+    Returns:
+        str: Veritabanındaki güncel hash
+    """
+    try:
+        new_hash = hash_password(password)
+        with db_session(conn) as conn_db:
+            cursor = conn_db.cursor()
+            cursor.execute(
+                "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                (new_hash, user_id, old_hash)
+            )
+            if cursor.rowcount == 0:
+                PASSWORD_REHASHES.labels("skipped").inc()
+                return old_hash
+            after_commit(conn_db, user_index.update_fields, domain_id, username, {"password": new_hash})
+        PASSWORD_REHASHES.labels("rehashed").inc()
+        print(f"🔐 {username} şifresi cost {bcrypt_cost(old_hash)} -> {bcrypt_cost(new_hash)} ile yeniden hashlendi")
+        return new_hash
+    except Exception as e:
+        PASSWORD_REHASHES.labels("failed").inc()
+        print(f"❌ Şifre yeniden hashleme hatası: {e}")
+        return old_hash
+
+def authenticate_user(username, password, domain_id, conn=None, client_ip=None):
+    """
+    Kullanıcı girişini doğrular.
+
+    Kısa süre önce doğrulanmış kimlikler bcrypt çalıştırılmadan kabul edilir; diğer
+    denemeler bcrypt'ten önce kullanıcı/IP bazında sınırlanır (auth_guard.py).
+    Cost'u güncel değerden farklı hash'ler başarılı girişte yeniden hashlenir.
     
     Args:
         username (str): Kullanıcı adı
         password (str): Şifre
         domain_id (int): Domain ID
+        conn (optional): İstek kapsamındaki veritabanı bağlantısı
+        client_ip (str, optional): İstemci IP'si (IP bazlı sınırlama için)
         
     Returns:
         tuple: (bool, str) - Giriş başarılı mı, durum mesajı
+
+    Raises:
+        LoginThrottled: Deneme sınırı aşıldıysa
     """
     try:
-        conn_db = get_db_connection()
-        cursor = conn_db.cursor()
-        
-        # Kullanıcıyı veritabanından bul
-        cursor.execute("""
-            SELECT id, username, password, status 
-            FROM users 
-            WHERE username = %s AND domain_id = %s
-        """, (username, domain_id))
-        
-        user = cursor.fetchone()
-        conn_db.close()
+        cache_key = credential_cache.key(domain_id, username, password)
+        cached_hash = credential_cache.get(cache_key)
+        if cached_hash is None:
+            check_rate_limit(domain_id, username, client_ip)
+
+        if user_index.available(conn):
+            row = user_index.get_by_username(domain_id, username)
+            user = (row.id, row.username, row.password, row.status) if row else None
+        else:
+            with db_session(conn) as conn_db:
+                cursor = conn_db.cursor()
+                
+                # Kullanıcıyı veritabanından bul
+                cursor.execute("""
+                    SELECT id, username, password, status 
+                    FROM users 
+                    WHERE username = %s AND domain_id = %s
+                """, (username, domain_id))
+                
+                user = cursor.fetchone()
         
         if not user:
             return False, "Kullanıcı bulunamadı"
@@ -395,50 +860,63 @@ def authenticate_user(username, password, domain_id):
         # Kullanıcı devre dışı ise giriş yapılamaz
         if status == UserStatus.DISABLED.value:
             return False, "Kullanıcı devre dışı"
+
+        # Önbellekteki doğrulama sadece hash değişmediyse geçerlidir
+        if cached_hash is not None:
+            if stored_password_hash and hmac.compare_digest(cached_hash.encode(), stored_password_hash.encode()):
+                return True, f"Hoş geldiniz, {stored_username}!"
+            credential_cache.discard(cache_key)
+            check_rate_limit(domain_id, username, client_ip)
         
         # Şifre doğrulama
         if verify_password(password, stored_password_hash):
+            if BCRYPT_REHASH_ON_LOGIN and needs_rehash(stored_password_hash):
+                stored_password_hash = _rehash_password(user_id, domain_id, stored_username, password,
+                                                        stored_password_hash, conn)
+            credential_cache.put(cache_key, stored_password_hash)
             return True, f"Hoş geldiniz, {stored_username}!"
         else:
             return False, "Şifre hatalı"
-            
+
+    except LoginThrottled:
+        raise
     except Exception as e:
         print(f"❌ Kullanıcı doğrulama hatası: {e}")
         return False, f"Doğrulama hatası: {e}"
 
-def migrate_passwords_to_hash():
+def migrate_passwords_to_hash(conn=None):
     """
     Veritabanındaki tüm şifreleri hashlere dönüştürür
     """
     try:
-        conn_db = get_db_connection()
-        cursor = conn_db.cursor()
-        
-        # Tüm kullanıcıları getir
-        cursor.execute("SELECT id, password FROM users")
-        users = cursor.fetchall()
-        
-        update_count = 0
-        
-        for user in users:
-            user_id = user[0]
-            plain_password = user[1]
+        with db_session(conn) as conn_db:
+            cursor = conn_db.cursor()
             
-            # Eğer şifre zaten hash değilse
-            try:
-                # Hash formatında şifre genellikle $2b$ ile başlar
-                if not plain_password.startswith('$2b$'):
-                    # Hashle
-                    hashed_password = hash_password(plain_password)
-                    
-                    # Veritabanına kaydet
-                    cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, user_id))
-                    update_count += 1
-            except Exception as e:
-                print(f"❌ ID {user_id} için şifre dönüştürme hatası: {e}")
-        
-        conn_db.commit()
-        conn_db.close()
+            # Tüm kullanıcıları getir
+            cursor.execute("SELECT id, password FROM users")
+            users = cursor.fetchall()
+            
+            update_count = 0
+            
+            for user in users:
+                user_id = user[0]
+                plain_password = user[1]
+                
+                # Eğer şifre zaten hash değilse
+                try:
+                    # Hash formatında şifre genellikle $2b$ ile başlar
+                    if not plain_password.startswith('$2b$'):
+                        # Hashle
+                        hashed_password = hash_password(plain_password)
+                        
+                        # Veritabanına kaydet
+                        cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, user_id))
+                        update_count += 1
+                except Exception as e:
+                    print(f"❌ ID {user_id} için şifre dönüştürme hatası: {e}")
+            
+            if update_count:
+                after_commit(conn_db, user_index.invalidate)
         
         print(f"✅ {update_count} kullanıcının şifresi güvenli hale getirildi")
         return True, f"{update_count} şifre güncellendi"
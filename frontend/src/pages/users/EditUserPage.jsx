@@ -39,6 +39,7 @@ function EditUserPage() {
     const loadData = async () => {
       try {
         setLoadingData(true);
+        setError(null);
 
         // Load departments for the specific domain
         if (domainId && user) {
@@ -52,20 +53,21 @@ function EditUserPage() {
           setDepartments([]);
         }
 
-        // Load user data from the domain
+        // Load only the user being edited
         if (domainId && username) {
-          const usersResponse = await DomainService.listUsersByDomain(
-            parseInt(domainId)
+          const userResponse = await DomainService.getUser(
+            parseInt(domainId),
+            username
           );
-          const users = usersResponse.users || [];
-          const currentUser = users.find((u) => u.username === username);
+          const currentUser = userResponse.user;
 
           if (currentUser) {
             setOriginalUser(currentUser);
             setFormData({
               first_name: currentUser.first_name || "",
               last_name: currentUser.last_name || "",
-              password: currentUser.password || "",
+              // Never prefilled; left blank the password is kept
+              password: "",
               role_id: currentUser.role_id || 2,
               department_id: currentUser.department_id || 0,
             });
@@ -73,8 +75,6 @@ function EditUserPage() {
             setError("User not found");
           }
         }
-
-        setError(null);
       } catch (err) {
         console.error("Error fetching data:", err);
         setError("Failed to load data. Please try again later.");
@@ -114,10 +114,13 @@ function EditUserPage() {
       const submitData = {
         first_name: formData.first_name,
         last_name: formData.last_name,
-        password: formData.password,
         role_id: formData.role_id,
         department_id: formData.department_id,
       };
+      // Only send a password when a new one was entered
+      if (formData.password) {
+        submitData.password = formData.password;
+      }
 
       await DomainService.updateUser(
         parseInt(domainId),
@@ -344,7 +347,7 @@ function EditUserPage() {
                 htmlFor="password"
                 className="block text-sm font-medium text-gray-700 mb-2"
               >
-                Password *
+                New Password
               </label>
               <input
                 type="password"
@@ -352,10 +355,13 @@ function EditUserPage() {
                 name="password"
                 value={formData.password}
                 onChange={handleInputChange}
-                required
+                autoComplete="new-password"
                 className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-odie focus:border-transparent"
                 placeholder="Enter new password"
               />
+              <p className="text-xs text-gray-500 mt-1">
+                Leave blank to keep the current password
+              </p>
             </div>
 
             {/* Role */}
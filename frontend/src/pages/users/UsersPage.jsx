@@ -3,16 +3,45 @@ import { useNavigate } from "react-router-dom";
 import { useAuth } from "../../context/AuthContext";
 import DomainService from "../../services/DomainService";
 
+// Users are loaded one keyset page at a time (next_cursor / has_more)
+const PAGE_SIZE = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+// Columns the backend can sort by; other columns only sort the loaded rows
+const SERVER_SORT_KEYS = ["username", "first_name", "last_name", "status"];
+
+// Fetch one page of a domain's users
+const fetchUsersPage = async (domainId, { cursor, search, sort } = {}) => {
+  const options = { limit: PAGE_SIZE, cursor, search };
+  if (sort && SERVER_SORT_KEYS.includes(sort.key)) {
+    options.sort = sort.key;
+    options.order = sort.direction;
+  }
+  const page = await DomainService.listUsersByDomain(domainId, options);
+  if (page.success === false) {
+    throw new Error(page.message);
+  }
+  return page;
+};
+
+const withDomain = (domain, users) =>
+  (users || []).map((user) => ({
+    ...user,
+    domainName: domain.domain_name,
+    domainId: domain.id,
+  }));
+
 function UsersPage() {
   const navigate = useNavigate();
   const [domains, setDomains] = useState([]);
-  const [filteredDomains, setFilteredDomains] = useState([]);
   const [searchTerm, setSearchTerm] = useState("");
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [expandedDomain, setExpandedDomain] = useState(null);
-  const [passwordVisibility, setPasswordVisibility] = useState({});
   const [searchResults, setSearchResults] = useState([]);
+  // Next page cursor per domain for the current search
+  const [searchCursors, setSearchCursors] = useState({});
+  const [searching, setSearching] = useState(false);
+  const [loadingMore, setLoadingMore] = useState({});
   const [departments, setDepartments] = useState([]);
   // Sorting states
   const [sortConfig, setSortConfig] = useState({ key: null, direction: null });
@@ -51,16 +80,18 @@ function UsersPage() {
       const domainsResponse = await DomainService.listDomains(user.id);
       const domainsData = domainsResponse.domains || [];
 
-      // Step 3: Fetch users for each domain
+      // Step 3: Fetch the first page of users for each domain
       const domainsWithUsers = await Promise.all(
         domainsData.map(async (domain) => {
           try {
-            const usersResponse = await DomainService.listUsersByDomain(
-              domain.id
-            );
+            const usersResponse = await fetchUsersPage(domain.id, {
+              sort: domainSortConfigs[domain.id],
+            });
             return {
               ...domain,
               users: usersResponse.users || [],
+              nextCursor: usersResponse.next_cursor,
+              hasMore: usersResponse.has_more,
             };
           } catch (err) {
             console.error(
@@ -70,6 +101,7 @@ function UsersPage() {
             return {
               ...domain,
               users: [],
+              hasMore: false,
               error: `Failed to load users for this domain: ${err.message}`,
             };
           }
@@ -77,16 +109,6 @@ function UsersPage() {
       );
 
       setDomains(domainsWithUsers);
-      setFilteredDomains(domainsWithUsers);
-
-      // Initialize password visibility state for all users
-      let initialVisibility = {};
-      domainsWithUsers.forEach((domain) => {
-        domain.users?.forEach((user) => {
-          initialVisibility[user.id] = false;
-        });
-      });
-      setPasswordVisibility(initialVisibility);
 
       setError(null);
     } catch (err) {
@@ -97,6 +119,40 @@ function UsersPage() {
     }
   };
 
+  // Replace or extend a domain's loaded users with a fetched page
+  const applyDomainPage = (domainId, page, append) => {
+    setDomains((prev) =>
+      prev.map((domain) =>
+        domain.id === domainId
+          ? {
+              ...domain,
+              users: append
+                ? [...domain.users, ...(page.users || [])]
+                : page.users || [],
+              nextCursor: page.next_cursor,
+              hasMore: page.has_more,
+            }
+          : domain
+      )
+    );
+  };
+
+  const loadMoreUsers = async (domain) => {
+    setLoadingMore((prev) => ({ ...prev, [domain.id]: true }));
+    try {
+      const page = await fetchUsersPage(domain.id, {
+        cursor: domain.nextCursor,
+        sort: domainSortConfigs[domain.id],
+      });
+      applyDomainPage(domain.id, page, true);
+    } catch (err) {
+      console.error(`Failed to load more users for domain ${domain.id}:`, err);
+      setError("Failed to load more users. Please try again later.");
+    } finally {
+      setLoadingMore((prev) => ({ ...prev, [domain.id]: false }));
+    }
+  };
+
   useEffect(() => {
     refreshData();
   }, [user]);
@@ -114,83 +170,95 @@ function UsersPage() {
     return () => window.removeEventListener("focus", handleFocus);
   }, [loading, user]);
 
-  // Filter domains and users based on search term
+  // Search users on the server (only loaded pages would be searched client-side)
   useEffect(() => {
-    if (!searchTerm.trim()) {
-      setFilteredDomains(domains);
+    const term = searchTerm.trim();
+    if (!term) {
       setSearchResults([]);
+      setSearchCursors({});
+      setSearching(false);
       return;
     }
 
-    const term = searchTerm.toLowerCase();
-
-    // For domain-based view (not used when searching)
-    const filteredDomainResults = domains
-      .map((domain) => {
-        // Filter users in each domain
-        const filteredUsers = domain.users.filter(
-          (user) =>
-            user.username.toLowerCase().includes(term) ||
-            (user.first_name && user.first_name.toLowerCase().includes(term)) ||
-            (user.last_name && user.last_name.toLowerCase().includes(term)) ||
-            (typeof user.department_id === "string" &&
-              user.department_id.toLowerCase().includes(term)) ||
-            getDepartmentName(user.department_id)
-              .toLowerCase()
-              .includes(term) ||
-            (typeof user.role_id === "string" &&
-              user.role_id.toLowerCase().includes(term))
-        );
+    let cancelled = false;
+    setSearching(true);
+    const timer = setTimeout(async () => {
+      const pages = await Promise.all(
+        domains.map(async (domain) => {
+          try {
+            return {
+              domain,
+              page: await fetchUsersPage(domain.id, { search: term }),
+            };
+          } catch (err) {
+            console.error(`Failed to search users in domain ${domain.id}:`, err);
+            return { domain, page: { users: [], has_more: false } };
+          }
+        })
+      );
+      if (cancelled) return;
 
-        // Return domain with filtered users
-        return {
-          ...domain,
-          users: filteredUsers,
-        };
-      })
-      .filter((domain) => domain.users.length > 0);
-
-    setFilteredDomains(filteredDomainResults);
-
-    // For flat search results table view (used when searching)
-    const allMatchingUsers = [];
-    domains.forEach((domain) => {
-      const matchingUsers = domain.users.filter(
-        (user) =>
-          user.username.toLowerCase().includes(term) ||
-          (user.first_name && user.first_name.toLowerCase().includes(term)) ||
-          (user.last_name && user.last_name.toLowerCase().includes(term)) ||
-          (typeof user.department_id === "string" &&
-            user.department_id.toLowerCase().includes(term)) ||
-          getDepartmentName(user.department_id).toLowerCase().includes(term) ||
-          (typeof user.role_id === "string" &&
-            user.role_id.toLowerCase().includes(term))
+      setSearchResults(
+        pages.flatMap(({ domain, page }) => withDomain(domain, page.users))
       );
+      setSearchCursors(
+        Object.fromEntries(
+          pages
+            .filter(({ page }) => page.has_more)
+            .map(({ domain, page }) => [domain.id, page.next_cursor])
+        )
+      );
+      setSearching(false);
+    }, SEARCH_DEBOUNCE_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, domains]);
 
-      // Add domain information to each matching user
-      matchingUsers.forEach((user) => {
-        allMatchingUsers.push({
-          ...user,
-          domainName: domain.domain_name,
-          domainId: domain.id,
+  const loadMoreSearchResults = async () => {
+    const term = searchTerm.trim();
+    setSearching(true);
+    try {
+      const pages = await Promise.all(
+        domains
+          .filter((domain) => searchCursors[domain.id])
+          .map(async (domain) => ({
+            domain,
+            page: await fetchUsersPage(domain.id, {
+              search: term,
+              cursor: searchCursors[domain.id],
+            }),
+          }))
+      );
+      setSearchResults((prev) => [
+        ...prev,
+        ...pages.flatMap(({ domain, page }) => withDomain(domain, page.users)),
+      ]);
+      setSearchCursors((prev) => {
+        const next = { ...prev };
+        pages.forEach(({ domain, page }) => {
+          if (page.has_more) {
+            next[domain.id] = page.next_cursor;
+          } else {
+            delete next[domain.id];
+          }
         });
+        return next;
       });
-    });
-
-    setSearchResults(allMatchingUsers);
-  }, [searchTerm, domains]);
+    } catch (err) {
+      console.error("Failed to load more search results:", err);
+      setError("Failed to load more users. Please try again later.");
+    } finally {
+      setSearching(false);
+    }
+  };
 
   const handleSearch = (e) => {
     setSearchTerm(e.target.value);
   };
 
-  const togglePasswordVisibility = (userId) => {
-    setPasswordVisibility((prev) => ({
-      ...prev,
-      [userId]: !prev[userId],
-    }));
-  };
-
   const toggleDomain = (domainId) => {
     if (expandedDomain === domainId) {
       setExpandedDomain(null);
@@ -224,7 +292,7 @@ function UsersPage() {
     setSortConfig({ key: column, direction });
   };
 
-  const handleDomainSort = (domainId, column) => {
+  const handleDomainSort = async (domainId, column) => {
     const currentConfig = domainSortConfigs[domainId] || {
       key: null,
       direction: null,
@@ -233,10 +301,39 @@ function UsersPage() {
     if (currentConfig.key === column && currentConfig.direction === "asc") {
       direction = "desc";
     }
+    const config = { key: column, direction };
     setDomainSortConfigs((prev) => ({
       ...prev,
-      [domainId]: { key: column, direction },
+      [domainId]: config,
     }));
+
+    // Pages are cut in the server's order, so reload from the first page
+    if (SERVER_SORT_KEYS.includes(column)) {
+      setLoadingMore((prev) => ({ ...prev, [domainId]: true }));
+      try {
+        applyDomainPage(
+          domainId,
+          await fetchUsersPage(domainId, { sort: config }),
+          false
+        );
+      } catch (err) {
+        console.error(`Failed to sort users for domain ${domainId}:`, err);
+        setError("Failed to load users. Please try again later.");
+      } finally {
+        setLoadingMore((prev) => ({ ...prev, [domainId]: false }));
+      }
+    }
+  };
+
+  // Rows of a domain in display order (server-sorted columns are already in order)
+  const sortDomainUsers = (domain) => {
+    const config = domainSortConfigs[domain.id] || {
+      key: null,
+      direction: null,
+    };
+    return SERVER_SORT_KEYS.includes(config.key)
+      ? domain.users
+      : sortData(domain.users, config);
   };
 
   const sortData = (data, config) => {
@@ -296,6 +393,19 @@ function UsersPage() {
     );
   };
 
+  const renderLoadMoreButton = (onClick, isLoading) => (
+    <div className="flex justify-center pt-4">
+      <button
+        onClick={onClick}
+        disabled={isLoading}
+        className="px-4 py-2 text-sm font-medium text-odie border border-gray-300 rounded-md hover:bg-gray-100 disabled:opacity-50 disabled:cursor-not-allowed flex items-center gap-2"
+      >
+        {isLoading && <i className="bi bi-arrow-repeat animate-spin"></i>}
+        {isLoading ? "Loading..." : "Load more"}
+      </button>
+    </div>
+  );
+
   // Render search results table when searching
   const renderSearchResultsTable = () => {
     const sortedSearchResults = sortData(searchResults, sortConfig);
@@ -305,7 +415,9 @@ function UsersPage() {
         <div className="p-4 bg-gray-50">
           <h2 className="text-lg font-semibold text-odie">Search Results</h2>
           <p className="text-sm text-gray-600">
-            Found {searchResults.length} users matching your search
+            {Object.keys(searchCursors).length > 0
+              ? `Showing the first ${searchResults.length} users matching your search`
+              : `Found ${searchResults.length} users matching your search`}
           </p>
         </div>
 
@@ -326,12 +438,6 @@ function UsersPage() {
                   sortConfig,
                   handleSort
                 )}
-                <th
-                  scope="col"
-                  className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider"
-                >
-                  Password
-                </th>
                 {renderSortableHeader(
                   "first_name",
                   "First Name",
@@ -379,30 +485,6 @@ function UsersPage() {
                   <td className="px-6 py-4 whitespace-nowrap text-sm font-medium text-odie">
                     {user.username}
                   </td>
-                  <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                    <div className="flex items-center">
-                      <span className="mr-2">
-                        {passwordVisibility[user.id]
-                          ? user.password
-                          : "••••••••"}
-                      </span>
-                      <button
-                        onClick={(e) => {
-                          e.stopPropagation();
-                          togglePasswordVisibility(user.id);
-                        }}
-                        className="text-odie"
-                      >
-                        <i
-                          className={`bi ${
-                            passwordVisibility[user.id]
-                              ? "bi-eye-slash"
-                              : "bi-eye"
-                          }`}
-                        ></i>
-                      </button>
-                    </div>
-                  </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
                     {user.first_name}
                   </td>
@@ -488,30 +570,6 @@ function UsersPage() {
                   <p className="text-gray-500 mb-1 font-medium">Role:</p>
                   <p className="font-medium truncate">{user.role_id}</p>
                 </div>
-
-                <div>
-                  <p className="text-gray-500 mb-1 font-medium">Password:</p>
-                  <div className="flex items-center">
-                    <p className="font-medium truncate mr-2 flex-1 min-w-0">
-                      {passwordVisibility[user.id] ? user.password : "••••••••"}
-                    </p>
-                    <button
-                      onClick={(e) => {
-                        e.stopPropagation();
-                        togglePasswordVisibility(user.id);
-                      }}
-                      className="text-odie flex-shrink-0"
-                    >
-                      <i
-                        className={`bi ${
-                          passwordVisibility[user.id]
-                            ? "bi-eye-slash"
-                            : "bi-eye"
-                        }`}
-                      ></i>
-                    </button>
-                  </div>
-                </div>
               </div>
 
               <div className="mt-4 pt-3 border-t border-gray-100">
@@ -530,13 +588,19 @@ function UsersPage() {
             </div>
           ))}
         </div>
+
+        {Object.keys(searchCursors).length > 0 && (
+          <div className="pb-4">
+            {renderLoadMoreButton(loadMoreSearchResults, searching)}
+          </div>
+        )}
       </div>
     );
   };
 
   // Render domain-based view (original view)
   const renderDomainView = () => {
-    return filteredDomains.map((domain) => (
+    return domains.map((domain) => (
       <div
         key={domain.id}
         className="bg-white rounded-lg shadow overflow-hidden m-6"
@@ -595,12 +659,6 @@ function UsersPage() {
                           },
                           (column) => handleDomainSort(domain.id, column)
                         )}
-                        <th
-                          scope="col"
-                          className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider"
-                        >
-                          Password
-                        </th>
                         {renderSortableHeader(
                           "first_name",
                           "First Name",
@@ -655,41 +713,11 @@ function UsersPage() {
                       </tr>
                     </thead>
                     <tbody className="bg-white divide-y divide-gray-200">
-                      {sortData(
-                        domain.users,
-                        domainSortConfigs[domain.id] || {
-                          key: null,
-                          direction: null,
-                        }
-                      ).map((user) => (
+                      {sortDomainUsers(domain).map((user) => (
                         <tr key={user.id}>
                           <td className="px-6 py-4 whitespace-nowrap text-sm font-medium text-odie">
                             {user.username}
                           </td>
-                          <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
-                            <div className="flex items-center">
-                              <span className="mr-2">
-                                {passwordVisibility[user.id]
-                                  ? user.password
-                                  : "••••••••"}
-                              </span>
-                              <button
-                                onClick={(e) => {
-                                  e.stopPropagation();
-                                  togglePasswordVisibility(user.id);
-                                }}
-                                className="text-odie"
-                              >
-                                <i
-                                  className={`bi ${
-                                    passwordVisibility[user.id]
-                                      ? "bi-eye-slash"
-                                      : "bi-eye"
-                                  }`}
-                                ></i>
-                              </button>
-                            </div>
-                          </td>
                           <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
                             {user.first_name}
                           </td>
@@ -732,7 +760,7 @@ function UsersPage() {
 
                 {/* Mobile card view - Only shown on mobile */}
                 <div className="md:hidden">
-                  {domain.users.map((user) => (
+                  {sortDomainUsers(domain).map((user) => (
                     <div
                       key={user.id}
                       className="border-b border-gray-200 p-4 first:border-t"
@@ -777,34 +805,6 @@ function UsersPage() {
                           </p>
                           <p className="font-medium truncate">{user.role_id}</p>
                         </div>
-
-                        <div>
-                          <p className="text-gray-500 mb-1 font-medium">
-                            Password:
-                          </p>
-                          <div className="flex items-center">
-                            <p className="font-medium truncate mr-2 flex-1 min-w-0">
-                              {passwordVisibility[user.id]
-                                ? user.password
-                                : "••••••••"}
-                            </p>
-                            <button
-                              onClick={(e) => {
-                                e.stopPropagation();
-                                togglePasswordVisibility(user.id);
-                              }}
-                              className="text-odie flex-shrink-0"
-                            >
-                              <i
-                                className={`bi ${
-                                  passwordVisibility[user.id]
-                                    ? "bi-eye-slash"
-                                    : "bi-eye"
-                                }`}
-                              ></i>
-                            </button>
-                          </div>
-                        </div>
                       </div>
 
                       <div className="mt-4 pt-3 border-t border-gray-100">
@@ -818,6 +818,12 @@ function UsersPage() {
                     </div>
                   ))}
                 </div>
+
+                {domain.hasMore &&
+                  renderLoadMoreButton(
+                    () => loadMoreUsers(domain),
+                    loadingMore[domain.id]
+                  )}
               </>
             ) : (
               <p className="text-center py-4 text-gray-500">
@@ -874,6 +880,8 @@ function UsersPage() {
         // Show search results table when searching
         searchResults.length > 0 ? (
           renderSearchResultsTable()
+        ) : searching ? (
+          <p className="text-center py-4 text-gray-500">Searching users...</p>
         ) : (
           <p className="text-center py-4 text-gray-500">
             No users found matching your search.
@@ -132,14 +132,24 @@ const DomainService = {
   },
 
   /**
-   * Get all users for a specific domain
+   * Get users for a specific domain (optionally one page at a time)
    * @param {string|number} domainId - The domain ID
-   * @returns {Promise} - API response with users data
+   * @param {Object} [options] - Optional paging/filter params
+   *   (limit, cursor, sort, order, fields, search, status)
+   * @returns {Promise} - API response with users data and next_cursor
    */
-  listUsersByDomain: async (domainId) => {
+  listUsersByDomain: async (domainId, options = {}) => {
     try {
+      const params = new URLSearchParams();
+      Object.entries(options).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== "") {
+          params.append(key, Array.isArray(value) ? value.join(",") : value);
+        }
+      });
+      const query = params.toString() ? `?${params.toString()}` : "";
+
       const response = await fetch(
-        `${API_BASE_URL}/list_users_by_domain/${domainId}`,
+        `${API_BASE_URL}/list_users_by_domain/${domainId}${query}`,
         {
           method: "GET",
           headers: {
@@ -159,6 +169,35 @@ const DomainService = {
     }
   },
 
+  /**
+   * Get a single user of a domain (password is never returned)
+   * @param {string|number} domainId - The domain ID
+   * @param {string} username - The username
+   * @returns {Promise} - API response with user data
+   */
+  getUser: async (domainId, username) => {
+    try {
+      const response = await fetch(
+        `${API_BASE_URL}/get_user/${domainId}/${encodeURIComponent(username)}`,
+        {
+          method: "GET",
+          headers: {
+            "Content-Type": "application/json",
+          },
+        }
+      );
+
+      if (!response.ok) {
+        throw new Error(`Error: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error(`Error fetching user ${username}:`, error);
+      throw error;
+    }
+  },
+
   /**
    * Get all available departments
    * @returns {Promise} - API response with departments data